@@ -0,0 +1,253 @@
+import heapq
+import time
+
+from src.core.state import SokobanState
+from src.algorithm.heuristic import INF
+from src.algorithm.vectorized import BatchExpander
+
+class _DeadlineReached(Exception):
+    pass
+
+class AnytimeSearch:
+    """Anytime repairing weighted A* (ARA*) over pushes, with a deadline.
+
+    A first, possibly long, solution comes from a greedy best-first search on the Hybrid
+    Heuristic cost, expanding `GREEDY_BATCH` states at a time, or from beam search when
+    `beam_width` is set; a beam that dies out is run again twice as wide. Weighted A*
+    then starts from that solution with the first of `weights`. Each later iteration
+    lowers the weight and keeps the push counts found so far: only states whose count
+    improved are expanded again, and states that cannot beat the best solution are
+    dropped. The last weight should be 1, so that the final iteration proves the
+    solution optimal.
+
+    The best solution can be read at any moment, from another thread too: `best`,
+    `pushes`, `moves()`. `lower_bound` is a proven lower bound on the pushes of any
+    solution, so `gap` bounds how far the best solution is from optimal. With macro
+    moves, the bound holds among the solutions made of macro moves.
+    """
+    CHECK_EVERY = 64  # expansions between two looks at the clock
+    GREEDY_BATCH = 64  # states expanded together by the first, greedy search
+
+    def __init__(self, solver, deadline_ms = 1000, weights = (5.0, 3.0, 2.0, 1.5, 1.0), beam_width = None, on_solution = None):
+        if not weights or min(weights) < 1:
+            raise ValueError("weights must be at least 1")
+        self.solver = solver
+        self.deadline_ms = deadline_ms
+        self.weights = tuple(weights)
+        self.beam_width = beam_width
+        self.on_solution = on_solution  # called as on_solution(search) on every improvement
+        self.best = None  # solved state of the best solution so far
+        self.pushes = INF
+        self.lower_bound = 0
+        self.weight = None  # weight of the running iteration
+        self.solutions = []  # (seconds since start, pushes) of every improvement
+        self._start = time.perf_counter()
+        self._deadline = self._start + deadline_ms / 1000
+
+    @property
+    def gap(self):
+        """Pushes the best solution may have above the optimum (INF without a solution)."""
+        return self.pushes - self.lower_bound if self.best is not None else INF
+
+    @property
+    def optimal(self):
+        return self.best is not None and self.pushes <= self.lower_bound
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def moves(self):
+        return self.solver.get_full_path(self.best)[1] if self.best is not None else []
+
+    def run(self):
+        """Searches until the deadline or a proof of optimality; returns the best solved state."""
+        solver = self.solver
+        solver.expanded = 0
+        self._start = time.perf_counter()
+        self._deadline = self._start + self.deadline_ms / 1000
+
+        start = solver.state
+        start_bound = solver.push_lower_bound(start)
+        if start_bound >= INF:
+            self.lower_bound = INF
+            return None
+        if solver.macros is None:
+            # Bounds proven earlier (see SokobanAlgorithm.lower_bound) count single pushes
+            start_bound = max(start_bound, solver.lower_bound)
+        self.lower_bound = start_bound
+        if start.is_solved():
+            self._improve(start, 0)
+            return start
+
+        try:
+            if self.beam_width:
+                self._beam(start)
+            else:
+                self._greedy(start)
+            self._repairing(start, start_bound)
+        except _DeadlineReached:
+            pass
+        return self.best
+
+    def _tick(self, open_size, visited_size):
+        solver = self.solver
+        solver._expanded(open_size, visited_size)
+        if solver.expanded % self.CHECK_EVERY == 0 and time.perf_counter() >= self._deadline:
+            raise _DeadlineReached()
+
+    def _improve(self, state: "SokobanState", pushes):
+        if pushes < self.pushes:
+            self.best, self.pushes = state, pushes
+            self.solutions.append((round(self.elapsed, 6), pushes))
+            if self.on_solution is not None:
+                self.on_solution(self)
+
+    def _greedy(self, start: "SokobanState"):
+        # Batched Hybrid Heuristic search (see SokobanAlgorithm.hybrid_heuristic): solutions
+        # are long, but found far sooner than by weighted A*. Most children are never popped,
+        # so the visited and deadlock checks, and the player flood behind them, wait until a
+        # state leaves the heap; the states expanded are the same.
+        solver = self.solver
+        detector = solver.deadlock_detector
+        expander = BatchExpander(start.level, solver.df, detector.pruned)
+        manhattan = solver.heuristic == "manhattan"
+        visited = set()
+        counter = 0
+        heap = [(solver.greedy_cost(start), counter, start)]
+
+        while heap:
+            batch = []
+            while heap and len(batch) < self.GREEDY_BATCH:
+                _, _, state = heapq.heappop(heap)
+                if state in visited:
+                    continue
+                visited.add(state)
+                if state is not start and detector.is_deadlock(state):
+                    continue
+                self._tick(len(heap), len(visited))
+                batch.append(state)
+
+            for child, cost in expander.expand(batch):
+                if child.is_solved():
+                    self._improve(child, len(solver.get_full_path(child)[1]))
+                    return
+                heuristic_value = cost if manhattan else solver.greedy_cost(child)
+                if heuristic_value < INF:
+                    counter += 1
+                    heapq.heappush(heap, (heuristic_value, counter, child))
+
+    def _beam(self, start: "SokobanState"):
+        # Layered search keeping the `beam_width` states with the smallest lower bound. States
+        # seen in earlier layers are skipped, so a narrow beam can die out: it then starts
+        # over twice as wide, until a solution or a beam that never had to drop a state.
+        solver = self.solver
+        width = self.beam_width
+        while True:
+            seen = {start}
+            layer = [(0, start)]
+            dropped = False
+            while layer:
+                children = []
+                for pushes, state in layer:
+                    self._tick(len(layer), len(seen))
+                    for child in solver.expand(state):
+                        if child in seen or solver.deadlock_detector.is_deadlock(child):
+                            continue
+                        seen.add(child)
+                        child_pushes = pushes + solver.push_count(child.prev_move)
+                        if child.is_solved():
+                            self._improve(child, child_pushes)
+                            return
+                        bound = solver.push_lower_bound(child)
+                        if bound < INF:
+                            children.append((bound, child_pushes, child))
+                dropped = dropped or len(children) > width
+                best = heapq.nsmallest(width, children, key=lambda entry: entry[:2])
+                layer = [(pushes, child) for _, pushes, child in best]
+            if not dropped:
+                return  # the beam held every state: there is no solution
+            width *= 2
+
+    def _repairing(self, start: "SokobanState", start_bound):
+        solver = self.solver
+        detector = solver.deadlock_detector
+        # nodes: state -> [pushes, state object on the cheapest known path, lower bound]
+        nodes = {start: [0, start, start_bound]}
+        dead = set()
+        opened = {start}  # states to expand in this iteration
+        incons = set()  # states whose pushes improved after they were expanded
+        frontier = (opened, incons)
+        counter = 0
+
+        try:
+            for weight in self.weights:
+                self.weight = weight
+                closed = set()
+                opened |= incons
+                incons.clear()
+                heap = []
+                for state in list(opened):
+                    pushes, _, bound = nodes[state]
+                    if pushes + bound >= self.pushes:
+                        opened.discard(state)
+                        continue
+                    counter += 1
+                    heap.append((pushes + weight * bound, bound, counter, state))
+                heapq.heapify(heap)
+
+                while heap and heap[0][0] < self.pushes:
+                    _, _, _, state = heapq.heappop(heap)
+                    if state not in opened:
+                        continue  # superseded by a cheaper entry
+                    pushes, current, bound = nodes[state]
+                    if pushes + bound < self.pushes:
+                        # Before the state leaves `opened`: a deadline here must leave it on
+                        # the frontier that `_settle` takes the bound from
+                        self._tick(len(heap), len(nodes))
+                    opened.discard(state)
+                    closed.add(state)
+                    if pushes + bound >= self.pushes:
+                        continue
+
+                    for child in solver.expand(current):
+                        child_pushes = pushes + solver.push_count(child.prev_move)
+                        entry = nodes.get(child)
+                        if entry is not None:
+                            if entry[0] <= child_pushes:
+                                continue
+                            bound = entry[2]
+                        else:
+                            if child in dead:
+                                continue
+                            if detector.is_deadlock(child):
+                                dead.add(child)
+                                continue
+                            bound = solver.push_lower_bound(child)
+                            if bound >= INF:
+                                dead.add(child)
+                                continue
+
+                        if child_pushes + bound >= self.pushes:
+                            continue
+                        nodes[child] = [child_pushes, child, bound]
+                        if child.is_solved():
+                            self._improve(child, child_pushes)
+                        elif child in closed:
+                            incons.add(child)
+                        else:
+                            opened.add(child)
+                            counter += 1
+                            heapq.heappush(heap, (child_pushes + weight * bound, bound, counter, child))
+
+                self._settle(nodes, frontier)
+                if not opened and not incons:
+                    break
+        finally:
+            self._settle(nodes, frontier)
+
+    def _settle(self, nodes, frontier):
+        # Some state of every better solution is still open or inconsistent, with its
+        # optimal push count (see Likhachev et al., ARA*)
+        bound = min((nodes[state][0] + nodes[state][2] for states in frontier for state in states), default=INF)
+        self.lower_bound = max(self.lower_bound, min(bound, self.pushes))
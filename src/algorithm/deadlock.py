@@ -1,55 +1,240 @@
-from collections import deque
+from collections import OrderedDict, deque
 
+from src.core.level import iter_bits
 from src.core.state import SokobanState
 
 class DeadlockDetector:
-    __MOVES = ((0,1),(1,0),(0,-1),(-1,0))
-    def __init__(self, init_state: "SokobanState"):
-        maxX, maxY = init_state.bound
-        self.free_squares = frozenset(((x,y) for x in range(maxX) for y in range(maxY))) - init_state.obstacles
-        box_reachable = set()
+    """Prunes states that can no longer be solved.
 
-        for target in init_state.targets:
-            box_reachable.add(target)
-            queue = deque([target])
+    Checks, cheapest first:
+    - dead squares: cells from which no crate can ever reach a target;
+    - 2x2 patterns: a 2x2 block filled with walls and crates, one of them off target
+      (this covers crate pairs side by side along a wall);
+    - frozen crates: crates that cannot move along either axis;
+    - corrals: an area the player cannot enter, fenced by crates that can only be pushed
+      into it, is proven dead by a small search on those crates alone.
 
-            while queue:
-                cur_pos = queue.popleft()
-                cx, cy = cur_pos
+    Only the crates around the last push are checked, since older deadlocks were already
+    pruned at the parent. Local results are memoized in a bounded LRU keyed by the pushed
+    crate and the crates around it. `pruned` counts the deadlocks found, by kind.
+
+    `known_dead` holds corral proofs from earlier searches, as (fence crate mask, player
+    region) pairs; they stay valid for any level with the same walls and targets.
+    """
+    KINDS = ("dead_square", "pattern", "freeze", "corral")
+
+    def __init__(self, init_state: "SokobanState", corral_nodes = 128, cache_size = 1 << 14):
+        level = init_state.level
+        tables = level.tables
+        self.level = level
+        self.target_mask = level.target_mask
+        self.dead = tables.dead
+        self.dead_mask = tables.dead_mask
+        self.dead_squares = level.positions(tables.dead_mask)
+        self.neighbors = tables.neighbors
+        self.behind = tables.behind
+        self.adjacent = tables.adjacent
+        up, down, left, right = tables.neighbors
+        self.vertical = tuple(zip(up, down))
+        self.horizontal = tuple(zip(left, right))
+
+        cells, index = level.cells, level.index
+
+        def around(x, y, radius):
+            return tuple(index[(x + dx, y + dy)]
+                         for dx in range(-radius, radius + 1) for dy in range(-radius, radius + 1)
+                         if (dx or dy) and (x + dx, y + dy) in index)
 
-                for dx, dy in self.__MOVES:
-                    prev_crate_pos = (cx + dx), (cy + dy)
-                    prev_player_pos = (cx + 2 * dx), (cy + 2 * dy)
+        def mask(ids):
+            return sum(1 << i for i in ids)
 
-                    if (prev_player_pos not in init_state.obstacles and prev_crate_pos not in box_reachable and prev_crate_pos not in init_state.obstacles):
-                        box_reachable.add(prev_crate_pos)
-                        queue.append(prev_crate_pos)
+        # 8-neighborhood, and the windows used for the memoization key
+        self.around = tuple(around(x, y, 1) for x, y in cells)
+        self.inner = tuple(mask(self.around[i]) | (1 << i) for i in range(len(cells)))
+        self.outer = tuple(mask(around(x, y, 2)) | (1 << i) for i, (x, y) in enumerate(cells))
 
-        self.dead_squares = frozenset(self.free_squares - box_reachable)
-    
-    def cannot_push(self, state: "SokobanState", crate: tuple[int, int], visited: set) -> bool:
+        # For every cell, the other three cells of each 2x2 block containing it (-1: wall)
+        self.blocks = tuple(
+            tuple(
+                tuple(index.get(pos, -1) for pos in ((bx, by), (bx + 1, by), (bx, by + 1), (bx + 1, by + 1)) if pos != (x, y))
+                for bx in (x - 1, x) for by in (y - 1, y)
+            )
+            for x, y in cells
+        )
+
+        self.corral_nodes = corral_nodes
+        self.cache_size = cache_size
+        self._local_cache = OrderedDict()
+        self._corral_cache = OrderedDict()
+        self.known_dead = set()
+        self.pruned = dict.fromkeys(self.KINDS, 0)
+
+    def cannot_push(self, crate_mask: int, crate: int, visited: set) -> bool:
         if (crate in visited):
             return True
-        
+
         visited.add(crate)
-        cx, cy = crate
-        right, down, left, up = (cx, cy + 1), (cx + 1, cy), (cx, cy - 1), (cx - 1, cy)
+        dead = self.dead
+        up, down = self.vertical[crate]
+        left, right = self.horizontal[crate]
 
-        return (((right in state.obstacles or left in state.obstacles) or 
-                        (right in self.dead_squares and left in self.dead_squares) or 
-                        ((right in state.crates and self.cannot_push(state,right, visited)) or (left in state.crates and self.cannot_push(state, left, visited))))
-                    and ((up in state.obstacles or down in state.obstacles) or 
-                        (up in self.dead_squares and down in self.dead_squares) or 
-                        ((up in state.crates and self.cannot_push(state, up, visited)) or (down in state.crates and self.cannot_push(state, down, visited)))))      
+        return (((right < 0 or left < 0) or
+                        (dead[right] and dead[left]) or
+                        ((crate_mask >> right & 1 and self.cannot_push(crate_mask, right, visited)) or (crate_mask >> left & 1 and self.cannot_push(crate_mask, left, visited))))
+                    and ((up < 0 or down < 0) or
+                        (dead[up] and dead[down]) or
+                        ((crate_mask >> up & 1 and self.cannot_push(crate_mask, up, visited)) or (crate_mask >> down & 1 and self.cannot_push(crate_mask, down, visited)))))
 
     def is_deadlock(self, state: "SokobanState"):
-        for crate in state.crates - state.targets:
-            if crate in self.dead_squares:
+        crate_mask = state.crate_mask
+        unplaced = crate_mask & ~self.target_mask
+        if unplaced & self.dead_mask:
+            self.pruned["dead_square"] += 1
+            return True
+
+        if state.prev_move is None:
+            if any(self.cannot_push(crate_mask, crate, set()) for crate in iter_bits(unplaced)):
+                self.pruned["freeze"] += 1
                 return True
-            
-            if (self.cannot_push(state, crate, set())):
+            return False
+
+        pushed = self.level.index[state.prev_move[2]]
+        kind = self.is_local_deadlock(crate_mask, pushed)
+        if kind:
+            self.pruned[kind] += 1
+            return True
+
+        if self.corral_nodes > 0 and self.is_corral_deadlock(state, pushed):
+            self.pruned["corral"] += 1
+            return True
+        return False
+
+    def is_local_deadlock(self, crate_mask, pushed):
+        """Returns the kind of deadlock around the pushed crate, or "" if there is none."""
+        key = (pushed, crate_mask & self.outer[pushed])
+        cached = self._local_cache.get(key)
+        if cached is not None:
+            self._local_cache.move_to_end(key)
+            return cached
+
+        deadlock, touched = self._local_deadlock(crate_mask, pushed)
+        # Cacheable only if every crate looked at lies within one cell of the pushed crate,
+        # so that everything read is covered by the key
+        if not touched & ~self.inner[pushed]:
+            self._remember(self._local_cache, key, deadlock)
+        return deadlock
+
+    def _local_deadlock(self, crate_mask, pushed):
+        target_mask = self.target_mask
+        touched = 1 << pushed
+
+        for others in self.blocks[pushed]:
+            if all(other < 0 or crate_mask >> other & 1 for other in others):
+                block = (1 << pushed) | sum(1 << other for other in others if other >= 0)
+                if block & ~target_mask:
+                    return "pattern", touched
+
+        # Freeze check on the pushed crate and the crates around it
+        for crate in (pushed,) + self.around[pushed]:
+            if crate_mask >> crate & 1 and not target_mask >> crate & 1:
+                visited = set()
+                frozen = self.cannot_push(crate_mask, crate, visited)
+                for other in visited:
+                    touched |= 1 << other
+                if frozen:
+                    return "freeze", touched
+
+        return "", touched
+
+    def is_corral_deadlock(self, state: "SokobanState", pushed):
+        crate_mask = state.crate_mask
+        reach = state.reachable_mask()
+        blocked = crate_mask | reach
+        seen = 0
+
+        for start in self.adjacent[pushed]:
+            if blocked >> start & 1 or seen >> start & 1:
+                continue
+
+            # Area next to the pushed crate that the player cannot enter
+            corral = 1 << start
+            queue = [start]
+            while queue:
+                for cell in self.adjacent[queue.pop()]:
+                    if not (blocked | corral) >> cell & 1:
+                        corral |= 1 << cell
+                        queue.append(cell)
+            seen |= corral
+
+            fence = 0
+            for cell in iter_bits(corral):
+                for other in self.adjacent[cell]:
+                    if crate_mask >> other & 1:
+                        fence |= 1 << other
+
+            if not fence & ~self.target_mask:
+                continue
+
+            if self._is_i_corral(crate_mask, reach, corral, fence) and self._corral_unsolvable(state, fence, corral):
                 return True
-            
-        
+
         return False
 
+    def _is_i_corral(self, crate_mask, reach, corral, fence):
+        # Every push the player can make on the fence must go into the corral
+        for crate in iter_bits(fence):
+            for near, ahead in zip(self.neighbors, self.behind):
+                k, j = near[crate], ahead[crate]
+                if k >= 0 and j >= 0 and reach >> k & 1 and not crate_mask >> j & 1 and not corral >> j & 1:
+                    return False
+        return True
+
+    def _corral_unsolvable(self, state: "SokobanState", fence, corral):
+        # Search the fence crates alone. Removing the other crates only makes the level
+        # easier, so if these crates cannot all reach targets, the state is dead.
+        root = SokobanState(self.level, state.player, fence)
+        key = root.canonical_key()
+        if key in self.known_dead:
+            return True
+        cached = self._corral_cache.get(key)
+        if cached is not None:
+            self._corral_cache.move_to_end(key)
+            return cached
+
+        target_mask = self.target_mask
+        visited = {root}
+        queue = deque([root])
+        unsolvable = True
+        while queue and unsolvable:
+            if len(visited) > self.corral_nodes:
+                unsolvable = False
+                break
+
+            current = queue.popleft()
+            for next_state in current.get_all_next_states():
+                if next_state in visited:
+                    continue
+
+                crates = next_state.crate_mask
+                if not crates & ~target_mask or next_state.reachable_mask() & corral & ~crates:
+                    # Crates placed, or the corral was opened: no proof of deadlock
+                    unsolvable = False
+                    break
+
+                if crates & ~target_mask & self.dead_mask or self.is_local_deadlock(crates, self.level.index[next_state.prev_move[2]]):
+                    continue
+
+                visited.add(next_state)
+                queue.append(next_state)
+
+        self._remember(self._corral_cache, key, unsolvable)
+        return unsolvable
+
+    def dead_patterns(self):
+        """Every corral proven dead so far, known beforehand or not."""
+        return self.known_dead.union(key for key, dead in self._corral_cache.items() if dead)
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
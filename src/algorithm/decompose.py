@@ -0,0 +1,238 @@
+import time
+
+from src.core.level import iter_bits, popcount
+from src.core.state import SokobanState
+from src.algorithm.solver import SokobanAlgorithm
+from src.algorithm.heuristic import INF, push_matching_cost
+
+def articulation_points(adjacent, size):
+    """Cells whose removal disconnects the free-cell graph (iterative Tarjan)."""
+    order = [-1] * size
+    low = [0] * size
+    points = set()
+    counter = 0
+    for root in range(size):
+        if order[root] >= 0:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        children = 0
+        stack = [(root, -1, iter(adjacent[root]))]
+        while stack:
+            cell, parent, neighbors = stack[-1]
+            for next_cell in neighbors:
+                if order[next_cell] < 0:
+                    order[next_cell] = low[next_cell] = counter
+                    counter += 1
+                    stack.append((next_cell, cell, iter(adjacent[next_cell])))
+                    if cell == root:
+                        children += 1
+                    break
+                if next_cell != parent:
+                    low[cell] = min(low[cell], order[next_cell])
+            else:
+                stack.pop()
+                if parent >= 0:
+                    low[parent] = min(low[parent], low[cell])
+                    if parent != root and low[cell] >= order[parent]:
+                        points.add(parent)
+        if children > 1:
+            points.add(root)
+    return points
+
+class Subproblem:
+    """Crates and targets of a group of rooms that can be solved on their own."""
+    __slots__ = ("cells", "crate_mask", "target_mask")
+
+    def __init__(self, cells, crate_mask, target_mask):
+        self.cells = cells
+        self.crate_mask = crate_mask
+        self.target_mask = target_mask
+
+    def __repr__(self):
+        return f"Subproblem(crates={popcount(self.crate_mask)}, cells={popcount(self.cells)})"
+
+class Decomposition:
+    """Rooms of a level and the weakly coupled subproblems they group into.
+
+    Rooms are the connected parts of the free cells once the articulation points are
+    removed; runs of articulation points (doors and corridors) are rooms of their own.
+    Rooms are then merged with their neighbors until every group holds as many crates
+    as targets, each crate able to reach a target of its group (push matching on the
+    empty level). Groups with crates off target are the subproblems. A group that stays
+    unbalanced once it has no neighbor left cannot be solved, and neither can the level.
+    """
+    def __init__(self, state: "SokobanState"):
+        level = state.level
+        tables = level.tables
+        size = len(level.cells)
+        self.articulation = articulation_points(tables.adjacent, size)
+
+        # Rooms: flood fill that never crosses between articulation and other cells
+        room_of = [-1] * size
+        rooms = []
+        for start in range(size):
+            if room_of[start] >= 0:
+                continue
+            door = start in self.articulation
+            room_of[start] = len(rooms)
+            mask = 1 << start
+            stack = [start]
+            while stack:
+                for next_cell in tables.adjacent[stack.pop()]:
+                    if room_of[next_cell] < 0 and (next_cell in self.articulation) == door:
+                        room_of[next_cell] = len(rooms)
+                        mask |= 1 << next_cell
+                        stack.append(next_cell)
+            rooms.append(mask)
+        self.rooms = rooms
+        self.room_of = room_of
+
+        # Groups of rooms, merged until balanced
+        target_mask = level.target_mask
+        self.solvable = True
+        groups = {room: mask for room, mask in enumerate(rooms)}
+        neighbors = {room: set() for room in groups}
+        for cell in range(size):
+            for next_cell in tables.adjacent[cell]:
+                if room_of[cell] != room_of[next_cell]:
+                    neighbors[room_of[cell]].add(room_of[next_cell])
+
+        def balanced(cells):
+            crates, targets = state.crate_mask & cells, target_mask & cells
+            if popcount(crates) != popcount(targets):
+                return False
+            return push_matching_cost(tables, crates, tuple(iter_bits(targets))) < INF
+
+        def imbalance(cells):
+            return abs(popcount(state.crate_mask & cells) - popcount(target_mask & cells))
+
+        while True:
+            group = next((g for g in groups if not balanced(groups[g])), None)
+            if group is None:
+                break
+            if not neighbors[group]:
+                self.solvable = False
+                break
+            # Merge with the neighbor leaving the smallest imbalance, the smallest first
+            other = min(neighbors[group], key=lambda g: (imbalance(groups[group] | groups[g]), popcount(groups[g])))
+            groups[group] |= groups.pop(other)
+            neighbors[group] |= neighbors.pop(other)
+            neighbors[group] -= {group, other}
+            for g in neighbors[group]:
+                neighbors[g].discard(other)
+                neighbors[g].add(group)
+
+        self.subproblems = [Subproblem(cells, state.crate_mask & cells, target_mask & cells)
+                            for cells in groups.values() if state.crate_mask & cells & ~target_mask]
+
+    def __len__(self):
+        return len(self.subproblems)
+
+class DecomposedSearch:
+    """Solves the subproblems of a `Decomposition` one at a time and joins their moves.
+
+    Each subproblem is searched with `algorithm` on a view of the level where every other
+    crate is fixed in place (`Level.fixing`), from the player position left by the previous
+    one, so that its moves stay legal in the full level. Subproblems that fail are retried
+    after the others; when none of the remaining ones can be solved, they are searched
+    together, and when that fails too, the whole level is searched from the start. An
+    unsolvable decomposition is not searched at all.
+
+    A time budget in the options (`deadline_ms`, or a `time_limit` in seconds) covers the
+    whole run: each attempt gets an even share of what is left among the pending
+    subproblems, and the search of the whole level only what remains after them.
+    """
+    BUDGETS = {"deadline_ms": 1000, "time_limit": 1}  # time budget options, in units per second
+
+    def __init__(self, solver: "SokobanAlgorithm", algorithm = "hybrid_heuristic", **options):
+        self.solver = solver
+        self.algorithm = algorithm
+        self.options = options  # passed on to every search, time budget shared out
+        self._deadline = None
+        self.decomposition = Decomposition(solver.state)
+        self.solved = 0  # subproblems solved separately
+        self.fell_back = False
+
+    def run(self):
+        """Returns the solved state of the full level, or None."""
+        solver = self.solver
+        if not self.decomposition.solvable:
+            solver.expanded = 0
+            return None
+        budget = next((name for name in self.BUDGETS if self.options.get(name) is not None), None)
+        if budget is not None:
+            self._deadline = time.perf_counter() + self.options[budget] / self.BUDGETS[budget]
+        if len(self.decomposition) <= 1:
+            return self._full_search()
+
+        current = solver.state
+        pending = list(self.decomposition.subproblems)
+        expanded = 0
+        while pending:
+            for subproblem in pending:
+                moves, sub_expanded = self._solve(current, subproblem, len(pending))
+                expanded += sub_expanded
+                if moves is not None:
+                    break
+            else:
+                # Nothing can go first: search the rest as one subproblem, then the whole level
+                if self.solved and len(pending) > 1:
+                    merged = Subproblem(sum(sub.cells for sub in pending), sum(sub.crate_mask for sub in pending),
+                                        sum(sub.target_mask for sub in pending))
+                    moves, sub_expanded = self._solve(current, merged, 1)
+                    expanded += sub_expanded
+                    if moves is not None:
+                        for move in moves:
+                            current = current._get_next_state(move)
+                        solver.expanded = expanded
+                        return current
+                solver.expanded = expanded
+                return self._full_search()
+
+            pending.remove(subproblem)
+            self.solved += 1
+            for move in moves:
+                current = current._get_next_state(move)
+
+        solver.expanded = expanded
+        return current if current.is_solved() else self._full_search()
+
+    def _options(self, shares = 1):
+        # The options with the time budget cut to one of `shares` equal parts of what is left
+        options = dict(self.options)
+        if self._deadline is not None:
+            left = max(self._deadline - time.perf_counter(), 0) / shares
+            for name, per_second in self.BUDGETS.items():
+                if options.get(name) is not None:
+                    options[name] = left * per_second
+        return options
+
+    def _solve(self, current: "SokobanState", subproblem: "Subproblem", shares):
+        # Moves solving `subproblem` from `current` with the other crates as walls, or None
+        crate_mask = current.crate_mask
+        crates = crate_mask & subproblem.cells
+        if crates == subproblem.target_mask:
+            return [], 0
+
+        # The full level with every other crate fixed: its numbering and push distances carry over
+        fixed = crate_mask & ~subproblem.cells
+        sub_level = current.level.fixing(fixed, subproblem.target_mask | fixed)
+        if (crates | subproblem.target_mask) & ~SokobanState(sub_level, current.player, 0).reachable_mask():
+            return None, 0  # a target or crate is walled off from the player for now
+        sub_state = SokobanState(sub_level, current.player, crate_mask)
+
+        # No pattern database for these short-lived levels: the matching bound stands in
+        heuristic = "matching" if self.solver.heuristic == "pdb" else self.solver.heuristic
+        sub_solver = SokobanAlgorithm(sub_state, heuristic=heuristic, macros=self.solver.macros is not None)
+        _, moves = getattr(sub_solver, self.algorithm)(**self._options(shares))
+        return (moves if moves else None), sub_solver.expanded
+
+    def _full_search(self):
+        self.fell_back = True
+        solver = self.solver
+        expanded = solver.expanded
+        # The undecorated search: stats, if on, are already recording this run
+        states, _ = getattr(type(solver), self.algorithm).__wrapped__(solver, **self._options())
+        solver.expanded += expanded
+        return states[-1] if states else None
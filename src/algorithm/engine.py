@@ -0,0 +1,318 @@
+import asyncio
+import heapq
+import os
+import pickle
+import threading
+import time
+from collections import deque
+
+from src.core.state import SokobanState
+from src.algorithm.heuristic import INF
+from src.algorithm.store import SetStore, TraceTable, VisitedStore
+
+class CancelToken:
+    """Thread-safe flag a caller sets to stop a running `SearchEngine`."""
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+class Progress:
+    """Snapshot of a `SearchEngine` after a step."""
+    __slots__ = ("status", "expanded", "frontier", "visited", "best_cost", "elapsed")
+
+    def __init__(self, status, expanded, frontier, visited, best_cost, elapsed):
+        self.status = status
+        self.expanded = expanded
+        self.frontier = frontier
+        self.visited = visited
+        self.best_cost = best_cost  # smallest greedy cost expanded so far (None for BFS)
+        self.elapsed = elapsed
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"Progress({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+class SearchEngine:
+    """BFS or Hybrid Heuristic search run a step at a time.
+
+    `step()` expands up to `step_nodes` states and returns a `Progress`; iterating over the
+    engine steps until the search ends, yielding one `Progress` per step. Between steps the
+    search can be paused, saved to disk with `save()` and resumed later, in this process or
+    another, with `SearchEngine.load()`.
+
+    The cancellation token and the node and time budgets are checked at every expansion.
+    Statuses: ready, running, paused, solved, exhausted (no solution), cancelled, budget.
+    Only state fingerprints, in `store` (default a `SetStore`), and (parent, move code)
+    back-pointers are kept, which is also what makes checkpoints small; the blocking
+    `bfs` and `hybrid_heuristic` run this engine to the end when given a store or a
+    `memory_limit`, and going over the limit raises `MemoryError` from `step()`.
+    """
+    ALGORITHMS = ("bfs", "hybrid_heuristic")
+    DONE = ("solved", "exhausted", "cancelled", "budget")
+    __CHECKPOINT_VERSION = 2
+
+    def __init__(self, solver, algorithm = "hybrid_heuristic", max_nodes = None, time_limit = None, token: "CancelToken" = None, step_nodes = 1000,
+                 store: "VisitedStore" = None, memory_limit = None):
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError(f"unknown algorithm: {algorithm}")
+        self.solver = solver
+        self.algorithm = algorithm
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit  # seconds of search, summed over resumes
+        self.token = token or CancelToken()
+        self.step_nodes = step_nodes
+        self.memory_limit = memory_limit  # bytes of visited store, back-pointers and open states
+        self.status = "ready"
+        self.expanded = 0
+        self.elapsed = 0.0
+        self.best_cost = None
+        self._pause = False
+        self._solved_node = None
+        self._counter = 0
+        self._layer_left = 0  # BFS: queued states of the layer being expanded
+        self._visited = SetStore() if store is None else store
+        self._trace = TraceTable()
+
+        state = solver.state
+        root = self._trace.add(-1, -1)
+        if algorithm == "bfs":
+            self._visited.add(state.fingerprint())
+            self._frontier = deque([(root, state)])
+        else:
+            # Best-first marks states when they are expanded
+            self._frontier = [(solver.greedy_cost(state), 0, root, state)]
+        self._entry_bytes = solver._entry_bytes(self._frontier[0])
+
+    @property
+    def done(self):
+        return self.status in self.DONE
+
+    def progress(self):
+        return Progress(self.status, self.expanded, len(self._frontier), len(self._visited), self.best_cost, round(self.elapsed, 6))
+
+    def pause(self):
+        """Stops the iteration after the current step; iterate again to resume. Thread-safe."""
+        self._pause = True
+
+    def cancel(self):
+        self.token.cancel()
+
+    def __iter__(self):
+        return self.run()
+
+    def run(self):
+        """Steps until the search ends or is paused, yielding a `Progress` after each step."""
+        self._pause = False
+        while not self.done:
+            if self._pause:
+                self.status = "paused"
+                return
+            yield self.step()
+
+    def step(self, nodes = None):
+        """Expands up to `nodes` states (default `step_nodes`) and returns the progress."""
+        if self.done:
+            return self.progress()
+
+        self.status = "running"
+        start = time.perf_counter()
+        try:
+            if self.algorithm == "bfs":
+                self._bfs_step(nodes or self.step_nodes, start)
+            else:
+                self._hybrid_step(nodes or self.step_nodes, start)
+        finally:
+            self.elapsed += time.perf_counter() - start
+            self.solver.expanded = self.expanded
+        return self.progress()
+
+    def _stopped(self, start):
+        # Cancellation and budgets, checked before every expansion
+        if self.token.cancelled:
+            self.status = "cancelled"
+        elif self.max_nodes is not None and self.expanded >= self.max_nodes:
+            self.status = "budget"
+        elif self.time_limit is not None and self.elapsed + time.perf_counter() - start >= self.time_limit:
+            self.status = "budget"
+        else:
+            return False
+        return True
+
+    def _bfs_step(self, nodes, start):
+        solver, queue, visited = self.solver, self._frontier, self._visited
+        for _ in range(nodes):
+            if not queue:
+                self.status = "exhausted"
+                return
+            if self._stopped(start):
+                return
+
+            if not self._layer_left:
+                # A new layer: layered stores (DiskStore) may spill the older ones
+                visited.next_layer()
+                self._layer_left = len(queue)
+            node, current = queue.popleft()
+            self._layer_left -= 1
+            if current.is_solved():
+                self._solved_node, self.status = node, "solved"
+                return
+
+            self.expanded += 1
+            solver._expanded(len(queue), len(visited))
+            for next_state in solver.expand(current):
+                if visited.add(next_state.fingerprint()):
+                    next_node = solver._trace_move(self._trace, node, next_state.prev_move)
+                    next_state.parent = next_state.prev_move = None
+                    queue.append((next_node, next_state))
+
+            if self.memory_limit is not None:
+                solver._check_memory(visited, self._trace, len(queue) * self._entry_bytes, self.memory_limit)
+
+    def _hybrid_step(self, nodes, start):
+        solver, heap, visited = self.solver, self._frontier, self._visited
+        detector = solver.deadlock_detector
+        expanded = 0
+        while expanded < nodes:
+            if not heap:
+                self.status = "exhausted"
+                return
+            if self._stopped(start):
+                return
+
+            cost, _, node, current = heapq.heappop(heap)
+            if not visited.add(current.fingerprint()):
+                continue
+
+            if current.is_solved():
+                self._solved_node, self.status = node, "solved"
+                return
+
+            expanded += 1
+            self.expanded += 1
+            if self.best_cost is None or cost < self.best_cost:
+                self.best_cost = cost
+            solver._expanded(len(heap), len(visited))
+            for next_state in solver.expand(current):
+                if next_state.fingerprint() not in visited and not detector.is_deadlock(next_state):
+                    heuristic_value = solver.greedy_cost(next_state)
+                    if heuristic_value >= INF:
+                        continue
+                    self._counter += 1
+                    next_node = solver._trace_move(self._trace, node, next_state.prev_move)
+                    next_state.parent = next_state.prev_move = None
+                    heapq.heappush(heap, (heuristic_value, self._counter, next_node, next_state))
+
+            if self.memory_limit is not None:
+                solver._check_memory(visited, self._trace, len(heap) * self._entry_bytes, self.memory_limit)
+
+    def result(self):
+        """(states, moves) of the solution, or ([], []) while there is none."""
+        return self.solver.get_traced_path(self._trace, self._solved_node)
+
+    def save(self, path):
+        """Writes a checkpoint; the file is replaced atomically."""
+        index = self.solver.state.level.index
+        if self.algorithm == "bfs":
+            frontier = [(node, state.crate_mask, index[state.player]) for node, state in self._frontier]
+        else:
+            frontier = [(cost, counter, node, state.crate_mask, index[state.player])
+                        for cost, counter, node, state in self._frontier]
+
+        data = {
+            "version": self.__CHECKPOINT_VERSION,
+            "level": self.solver.state.level.key,
+            "root": self.solver.state.canonical_key(),
+            "algorithm": self.algorithm,
+            "macros": self.solver.macros is not None,
+            "status": "paused" if self.status in ("running", "ready") else self.status,
+            "expanded": self.expanded,
+            "elapsed": self.elapsed,
+            "best_cost": self.best_cost,
+            "counter": self._counter,
+            "layer_left": self._layer_left,
+            "solved_node": self._solved_node,
+            "max_nodes": self.max_nodes,
+            "time_limit": self.time_limit,
+            "step_nodes": self.step_nodes,
+            "memory_limit": self.memory_limit,
+            "visited": self._visited,
+            "trace": self._trace,
+            "frontier": frontier,
+        }
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, solver, token: "CancelToken" = None):
+        """Resumes a checkpoint with `solver`, which must be set up for the same level and start."""
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != cls.__CHECKPOINT_VERSION:
+            raise ValueError(f"{path}: checkpoint version {data.get('version')}, expected {cls.__CHECKPOINT_VERSION}")
+        if data["level"] != solver.state.level.key or data["root"] != solver.state.canonical_key():
+            raise ValueError(f"{path}: checkpoint of a different level")
+        if data["macros"] != (solver.macros is not None):
+            raise ValueError(f"{path}: checkpoint was made with macros={data['macros']}")
+
+        engine = cls(solver, data["algorithm"], data["max_nodes"], data["time_limit"], token, data["step_nodes"],
+                     data["visited"], data["memory_limit"])
+        engine.status = data["status"]
+        engine.expanded = data["expanded"]
+        engine.elapsed = data["elapsed"]
+        engine.best_cost = data["best_cost"]
+        engine._counter = data["counter"]
+        engine._layer_left = data["layer_left"]
+        engine._solved_node = data["solved_node"]
+        engine._trace = data["trace"]
+
+        level = solver.state.level
+        cells = level.cells
+        if engine.algorithm == "bfs":
+            engine._frontier = deque((node, SokobanState(level, cells[player], crates)) for node, crates, player in data["frontier"])
+        else:
+            engine._frontier = [(cost, counter, node, SokobanState(level, cells[player], crates))
+                                for cost, counter, node, crates, player in data["frontier"]]
+        return engine
+
+async def progress_async(engine: "SearchEngine", executor = None):
+    """Async iterator over the progress of `engine`, without blocking the event loop.
+
+    Without an executor each step runs in the event loop, which then regains control
+    between steps (keep `step_nodes` small); with one, steps run in that executor.
+    Cancelling the awaiting task cancels the search.
+    """
+    loop = asyncio.get_running_loop()
+    engine._pause = False
+    try:
+        while not engine.done:
+            if engine._pause:
+                engine.status = "paused"
+                return
+            if executor is None:
+                progress = engine.step()
+                await asyncio.sleep(0)
+            else:
+                progress = await loop.run_in_executor(executor, engine.step)
+            yield progress
+    except asyncio.CancelledError:
+        engine.cancel()
+        if not engine.done:
+            engine.status = "cancelled"
+        raise
+
+async def solve_async(engine: "SearchEngine", executor = None, on_progress = None):
+    """Runs `engine` to the end from a coroutine; returns (states, moves)."""
+    async for progress in progress_async(engine, executor):
+        if on_progress is not None:
+            on_progress(progress)
+    return engine.result()
@@ -0,0 +1,157 @@
+from collections import OrderedDict
+
+from src.core.level import iter_bits
+from src.core.tables import LevelTables
+
+INF = LevelTables.UNREACHABLE
+
+def hungarian(costs):
+    """Minimum-cost assignment of every row of `costs` to a distinct column (rows <= columns).
+
+    Returns the total cost and, for each row, the column it was assigned to.
+    """
+    n = len(costs)
+    m = len(costs[0]) if n else 0
+    u = [0] * (n + 1)
+    v = [0] * (m + 1)
+    p = [0] * (m + 1)  # p[j]: row matched to column j, 1-based, 0 when free
+
+    for i in range(1, n + 1):
+        _augment(costs, u, v, p, i)
+
+    assignment = [0] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+
+    return sum(costs[i][assignment[i]] for i in range(n)), assignment
+
+def _augment(costs, u, v, p, i):
+    # One phase of the Hungarian algorithm: match row i along a shortest augmenting path.
+    # Requires u[r] + v[j] <= costs[r-1][j-1] for every row already matched and for row i.
+    m = len(p) - 1
+    way = [0] * (m + 1)
+    minv = [float("inf")] * (m + 1)
+    used = [False] * (m + 1)
+    p[0] = i
+    j0 = 0
+    while True:
+        used[j0] = True
+        i0 = p[j0]
+        row = costs[i0 - 1]
+        delta = float("inf")
+        j1 = 0
+        for j in range(1, m + 1):
+            if not used[j]:
+                cur = row[j - 1] - u[i0] - v[j]
+                if cur < minv[j]:
+                    minv[j] = cur
+                    way[j] = j0
+                if minv[j] < delta:
+                    delta = minv[j]
+                    j1 = j
+        for j in range(m + 1):
+            if used[j]:
+                u[p[j]] += delta
+                v[j] -= delta
+            else:
+                minv[j] -= delta
+        j0 = j1
+        if p[j0] == 0:
+            break
+    while j0:
+        j1 = way[j0]
+        p[j0] = p[j1]
+        j0 = j1
+
+def push_matching_cost(tables: "LevelTables", crate_mask, targets):
+    """Admissible lower bound on the pushes left: min-cost crate-to-target matching over push distances.
+
+    Returns `INF` when some crate cannot reach any free target.
+    """
+    size = tables.size
+    push_distance = tables.push_distance
+    costs = []
+    for crate in iter_bits(crate_mask):
+        row = crate * size
+        costs.append([push_distance[row + target] for target in targets])
+
+    if not costs:
+        return 0
+
+    total, _ = hungarian(costs)
+    return total if total < INF else INF
+
+class MatchingHeuristic:
+    """Push-distance matching bound with a bounded LRU cache keyed by crate placement.
+
+    When a state's parent placement is cached, only the row of the pushed crate
+    changes: it is unmatched and re-augmented from the parent's dual values, an
+    O(k^2) repair instead of the O(k^3) full solve. The repair needs as many crates
+    as targets; other placements are always solved in full.
+    """
+    def __init__(self, tables: "LevelTables", targets, cache_size = 1 << 15):
+        size = tables.size
+        push_distance = tables.push_distance
+        self.targets = tuple(targets)
+        self.rows = tuple(tuple(push_distance[cell * size + target] for target in self.targets) for cell in range(size))
+        self.cache_size = cache_size
+        self.full_solves = 0
+        self.incremental_solves = 0
+        # crate_mask -> (crates, u, v, p, cost)
+        self._cache = OrderedDict()
+
+    def estimate(self, state):
+        entry = self._cache.get(state.crate_mask)
+        if entry is not None:
+            self._cache.move_to_end(state.crate_mask)
+            return entry[4]
+
+        parent = state.parent
+        parent_entry = self._cache.get(parent.crate_mask) if parent is not None else None
+        # With fewer crates than targets a freed column may keep a negative dual, and the
+        # repaired matching would not be a minimum: those placements are solved in full
+        if parent_entry is not None and state.prev_move is not None and len(parent_entry[0]) == len(self.targets):
+            entry = self._repair(parent_entry, state)
+        else:
+            entry = self._solve(state.crate_mask)
+
+        self._cache[state.crate_mask] = entry
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return entry[4]
+
+    def _solve(self, crate_mask):
+        self.full_solves += 1
+        crates = tuple(iter_bits(crate_mask))
+        costs = [self.rows[crate] for crate in crates]
+        u = [0] * (len(crates) + 1)
+        v = [0] * (len(self.targets) + 1)
+        p = [0] * (len(self.targets) + 1)
+        for i in range(1, len(crates) + 1):
+            _augment(costs, u, v, p, i)
+        return crates, u, v, p, self._cost(costs, p)
+
+    def _repair(self, parent_entry, state):
+        self.incremental_solves += 1
+        crates, u, v, p, _ = parent_entry
+        level = state.level
+        _, old_crate, new_crate = state.prev_move
+        old_i, new_i = level.index[old_crate], level.index[new_crate]
+
+        row = crates.index(old_i)
+        crates = crates[:row] + (new_i,) + crates[row + 1:]
+        costs = [self.rows[crate] for crate in crates]
+        u, v, p = u[:], v[:], p[:]
+
+        # Free the moved crate's column; u = 0 keeps its new row feasible since v <= 0
+        p[p.index(row + 1, 1)] = 0
+        u[row + 1] = 0
+        _augment(costs, u, v, p, row + 1)
+        return crates, u, v, p, self._cost(costs, p)
+
+    def _cost(self, costs, p):
+        if not costs:
+            return 0
+        total = sum(costs[p[j] - 1][j - 1] for j in range(1, len(p)) if p[j])
+        return total if total < INF else INF
@@ -0,0 +1,176 @@
+from collections import deque
+
+from src.core.level import iter_bits, popcount
+from src.core.state import SokobanState, MacroMove
+
+class MacroGenerator:
+    """Turns single pushes into macro moves, using tables computed once from the walls.
+
+    - Tunnel macros: a crate pushed into a one-wide corridor, with the player following
+      it inside the corridor, keeps being pushed until it leaves the corridor, reaches a
+      target or is blocked.
+    - Goal-room macros: when every target lies in a room with a single entrance, a crate
+      pushed onto the entrance is carried straight to the next target of a fixed packing
+      order, provided the room holds exactly the crates placed so far in that order.
+    """
+    def __init__(self, level):
+        tables = level.tables
+        self.level = level
+        self.cells = level.cells
+        self.index = level.index
+        self.target_mask = level.target_mask
+        self.dead = tables.dead
+        self.neighbors = tables.neighbors
+        self.behind = tables.behind
+        self.adjacent = tables.adjacent
+
+        up, down, left, right = tables.neighbors
+        size = len(level.cells)
+        # tunnel[d][i]: cell i is one wide across push direction d
+        vertical = tuple(left[i] < 0 and right[i] < 0 for i in range(size))
+        horizontal = tuple(up[i] < 0 and down[i] < 0 for i in range(size))
+        self.tunnel = (vertical, vertical, horizontal, horizontal)
+
+        self.room_mask = 0
+        self.entrance = -1
+        self.packing = {}  # room crates placed so far -> {outside cell: pushes to the next target}
+        self._build_goal_room()
+
+    def expand(self, state: "SokobanState"):
+        """Successors of `state`, with macro moves in place of the pushes they extend."""
+        moves = state.get_all_moves()
+        if not moves:
+            return []
+
+        crate_mask = state.crate_mask
+        paths = self.packing.get(crate_mask & self.room_mask) if self.room_mask else None
+        index = self.index
+        next_states = []
+        for move in moves:
+            crate, new = index[move[1]], index[move[2]]
+            if paths is not None and new == self.entrance and crate in paths:
+                move = MacroMove((move,) + paths[crate])
+            else:
+                move = self._tunnel(crate_mask, move, crate, new)
+            next_states.append(state._get_next_state(move))
+        return next_states
+
+    def _tunnel(self, crate_mask, move, crate, new):
+        cells, tunnel = self.cells, None
+        near = self.index[move[0]]
+        for d, neighbor in enumerate(self.neighbors):
+            if neighbor[crate] == near:
+                tunnel = self.tunnel[d]
+                ahead = self.behind[d]
+                break
+
+        steps = [move]
+        others = crate_mask & ~(1 << crate)
+        while tunnel[crate] and tunnel[new] and not self.target_mask >> new & 1:
+            nxt = ahead[new]
+            if nxt < 0 or others >> nxt & 1 or self.dead[nxt]:
+                break
+            steps.append((cells[crate], cells[new], cells[nxt]))
+            crate, new = new, nxt
+
+        return MacroMove(steps) if len(steps) > 1 else move
+
+    def _build_goal_room(self):
+        # Smallest area holding every target that is cut off from the rest by one cell
+        size = len(self.cells)
+        targets = self.target_mask
+        if not targets:
+            return
+
+        start = (targets & -targets).bit_length() - 1
+        best = None
+        for entrance in range(size):
+            if targets >> entrance & 1:
+                continue
+            room = self._flood(start, 1 << entrance)
+            if room & targets != targets or popcount(room) + 1 >= size:
+                continue
+            if best is None or popcount(room) < popcount(best[1]):
+                best = (entrance, room)
+
+        if best is None:
+            return
+
+        entrance, room = best
+        outside = tuple(cell for cell in self.adjacent[entrance] if not room >> cell & 1)
+        order = self._packing_order(entrance, room, outside)
+        if order is None:
+            return
+
+        self.entrance, self.room_mask = entrance, room
+        placed = 0
+        for target in order:
+            self.packing[placed] = {
+                cell: path for cell in outside
+                if (path := self._push_path(entrance, room, cell, target, placed)) is not None
+            }
+            placed |= 1 << target
+
+    def _flood(self, start, blocked):
+        area = 1 << start
+        queue = [start]
+        while queue:
+            for cell in self.adjacent[queue.pop()]:
+                if not (area | blocked) >> cell & 1:
+                    area |= 1 << cell
+                    queue.append(cell)
+        return area
+
+    def _packing_order(self, entrance, room, outside):
+        # Empty the full room one crate at a time; filling it is the reverse. Taking a
+        # crate out only frees space, so any removable crate is a safe choice.
+        remaining = self.target_mask
+        removed = []
+        while remaining:
+            for target in iter_bits(remaining):
+                others = remaining & ~(1 << target)
+                if any(self._push_path(entrance, room, cell, target, others) is not None for cell in outside):
+                    removed.append(target)
+                    remaining = others
+                    break
+            else:
+                return None
+
+        removed.reverse()
+        return removed
+
+    def _push_path(self, entrance, room, player, target, crates):
+        """Pushes taking a crate from the entrance to `target`, the player starting at `player`.
+
+        The player may only use the room, the entrance and its starting cell, the one the
+        crate was pushed from, so the pushes stay valid whatever lies outside the room.
+        """
+        area = (room | (1 << entrance) | (1 << player)) & ~crates
+
+        def reach(crate, player):
+            return self._flood(player, ~area | (1 << crate))
+
+        start = (entrance, reach(entrance, player))
+        parents = {start: None}
+        queue = deque([start])
+        cells = self.cells
+        while queue:
+            node = queue.popleft()
+            crate, region = node
+            if crate == target:
+                steps = []
+                while parents[node] is not None:
+                    node, move = parents[node]
+                    steps.append(move)
+                steps.reverse()
+                return tuple(steps)
+
+            for near, ahead in zip(self.neighbors, self.behind):
+                k, j = near[crate], ahead[crate]
+                if k < 0 or j < 0 or not region >> k & 1 or not room >> j & 1 or crates >> j & 1:
+                    continue
+                child = (j, reach(j, crate))
+                if child not in parents:
+                    parents[child] = (node, (cells[k], cells[crate], cells[j]))
+                    queue.append(child)
+        return None
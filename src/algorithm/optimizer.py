@@ -0,0 +1,222 @@
+import time
+
+from src.core.state import SokobanState
+from src.algorithm.solver import SokobanAlgorithm
+
+class _BudgetReached(Exception):
+    pass
+
+class SolutionOptimizer:
+    """Shortens a solution: fewer pushes first, then less walking between pushes.
+
+    - Windows: the pushes between states k and k + `window` are searched again, with
+      bidirectional BFS (pushes forward from state k, pulls backward from state k +
+      `window`, same crates and player region); a shorter path replaces them unless
+      the player would then walk more than the pushes saved.
+    - Reordering: runs of pushes of one crate are swapped with the next run when both
+      orders are legal and the player then walks less. The crates end where they did,
+      so the rest of the solution stays legal.
+
+    Moves are single pushes as returned by `get_full_path`. `report` holds the push and
+    player-move counts (walking steps plus pushes, as `SokobanGame` replays them)
+    before and after. `time_limit` (seconds) and `max_nodes` (states per window search)
+    bound the work; the best solution so far is returned when the time runs out.
+    """
+    def __init__(self, state: "SokobanState", window = 10, time_limit = None, max_nodes = 20000):
+        if window < 2:
+            raise ValueError("window must be at least 2")
+        self.solver = SokobanAlgorithm(state)
+        self.state = state
+        self.window = window
+        self.time_limit = time_limit
+        self.max_nodes = max_nodes
+        self.report = {}
+        self._deadline = None
+
+    def optimize(self, moves):
+        """Returns the optimized moves; they solve the level whenever `moves` does."""
+        start = time.perf_counter()
+        self._deadline = start + self.time_limit if self.time_limit is not None else None
+        moves = [tuple(move) for move in moves]
+        states = self.replay(moves)
+        if states is None:
+            raise ValueError("moves are not legal from the start state")
+
+        self.report = {
+            "pushes_before": len(moves),
+            "moves_before": self.player_moves(moves, states),
+            "windows": 0,
+            "reorders": 0,
+            "complete": True,
+        }
+        try:
+            moves = self._shorten(moves)
+            moves = self._reorder(moves)
+        except _BudgetReached:
+            self.report["complete"] = False
+
+        moves = self._best
+        self.report.update({
+            "pushes_after": len(moves),
+            "moves_after": self.player_moves(moves),
+            "expanded": self.solver.expanded,
+            "time": round(time.perf_counter() - start, 4),
+        })
+        return moves
+
+    def replay(self, moves, state: "SokobanState" = None):
+        """States after each push, starting with `state` (default: the start); None if a push is illegal."""
+        current = self.state if state is None else state
+        index = current.level.index
+        states = [current]
+        for move in moves:
+            (nx, ny), (cx, cy), (tx, ty) = move
+            near, crate, new_crate = (index.get(pos) for pos in move)
+            if (near is None or crate is None or new_crate is None
+                    or abs(cx - nx) + abs(cy - ny) != 1 or (cx - nx, cy - ny) != (tx - cx, ty - cy)
+                    or not current.reachable_mask() >> near & 1
+                    or not current.crate_mask >> crate & 1 or current.crate_mask >> new_crate & 1):
+                return None
+            current = current._get_next_state(move)
+            states.append(current)
+        return states
+
+    def player_moves(self, moves, states = None):
+        """Walking steps plus pushes needed to play `moves`."""
+        states = self.replay(moves) if states is None else states
+        return len(moves) + self._walks(moves, states, self.state.level.index[self.state.player])
+
+    def _walk(self, crate_mask, start, goal):
+        # Player steps from `start` to `goal` around the crates (BFS)
+        if start == goal:
+            return 0
+        adjacent = self.state.level.tables.adjacent
+        seen = crate_mask | 1 << start
+        layer = [start]
+        steps = 0
+        while layer:
+            steps += 1
+            next_layer = []
+            for cell in layer:
+                for next_cell in adjacent[cell]:
+                    if next_cell == goal:
+                        return steps
+                    if not seen >> next_cell & 1:
+                        seen |= 1 << next_cell
+                        next_layer.append(next_cell)
+            layer = next_layer
+        raise ValueError("walk target cannot be reached")
+
+    def _check_time(self):
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise _BudgetReached()
+
+    def _shorten(self, moves):
+        # Slides the window over the solution, searching again each stretch of pushes
+        index = self.state.level.index
+        self._best = moves
+        states = self.replay(moves)
+        k = 0
+        while k < len(moves) - 1:
+            self._check_time()
+            end = min(k + self.window, len(moves))
+            shortcut = self._shortcut(states[k], states[end], end - k)
+            if shortcut is not None:
+                # Only the walks into the stretch and into the push after it can change
+                player = index[self.state.player] if k == 0 else index[moves[k - 1][1]]
+                after = shortcut + moves[end:end + 1]
+                if (len(shortcut) + self._walks(after, self.replay(after, states[k]), player)
+                        > end - k + self._walks(moves[k:end + 1], states[k:end + 2], player)):
+                    shortcut = None
+            if shortcut is None:
+                k += 1
+                continue
+
+            moves = moves[:k] + shortcut + moves[end:]
+            states = states[:k + 1] + self.replay(moves[k:], states[k])[1:]
+            self._best = moves
+            self.report["windows"] += 1
+        return moves
+
+    def _shortcut(self, start: "SokobanState", goal: "SokobanState", pushes):
+        # Pushes from `start` to `goal` (same crates and player region), if fewer than `pushes`
+        solver = self.solver
+        start_key, goal_key = start.canonical_key(), goal.canonical_key()
+        if start_key == goal_key:
+            return []
+
+        forward = {start_key: (None, None, 0)}
+        backward = {goal_key: (None, None, 0)}
+        forward_layer = [SokobanState(start.level, start.player, start.crate_mask)]
+        backward_layer = [SokobanState(goal.level, goal.player, goal.crate_mask)]
+        depth = 0
+        meeting = None
+        # A path of `depth` pushes is found once both sides have grown `depth` layers in all
+        while forward_layer and backward_layer and meeting is None and depth < pushes - 1:
+            if len(forward) + len(backward) > self.max_nodes:
+                return None
+            self._check_time()
+            if len(forward_layer) <= len(backward_layer):
+                forward_layer, meeting = solver._bidirectional_layer(forward_layer, forward, backward, solver._push_states)
+            else:
+                backward_layer, meeting = solver._bidirectional_layer(backward_layer, backward, forward, solver._pull_states)
+            depth += 1
+
+        if meeting is None or forward[meeting][2] + backward[meeting][2] >= pushes:
+            return None
+
+        shortcut = []
+        key = meeting
+        while forward[key][0] is not None:
+            key, move, _ = forward[key]
+            shortcut.append(move)
+        shortcut.reverse()
+        key = meeting
+        while backward[key][0] is not None:
+            key, move, _ = backward[key]
+            shortcut.append(move)
+        return shortcut
+
+    def _runs(self, moves):
+        # (start, end) of each maximal run of pushes that keep moving one crate
+        runs = []
+        start = 0
+        for i in range(1, len(moves) + 1):
+            if i == len(moves) or moves[i][1] != moves[i - 1][2]:
+                runs.append((start, i))
+                start = i
+        return runs
+
+    def _reorder(self, moves):
+        # Swaps neighboring runs while that cuts walking; a pass repeats after any swap
+        index = self.state.level.index
+        improved = True
+        while improved:
+            improved = False
+            states = self.replay(moves)
+            runs = self._runs(moves)
+            for (a, b), (_, c) in zip(runs, runs[1:]):
+                self._check_time()
+                # The walks into both runs and into the push after them may change
+                before = moves[a:c + 1]
+                after = moves[b:c] + moves[a:b] + moves[c:c + 1]
+                swapped = self.replay(after, states[a])
+                if swapped is None:
+                    continue
+                player = index[self.state.player] if a == 0 else index[moves[a - 1][1]]
+                if self._walks(after, swapped, player) < self._walks(before, states[a:c + 2], player):
+                    moves = moves[:a] + moves[b:c] + moves[a:b] + moves[c:]
+                    self._best = moves
+                    self.report["reorders"] += 1
+                    improved = True
+                    break
+        return moves
+
+    def _walks(self, moves, states, player):
+        # Walking steps before each push, the player starting on cell `player`
+        index = self.state.level.index
+        total = 0
+        for state, (near, crate, _) in zip(states, moves):
+            total += self._walk(state.crate_mask, player, index[near])
+            player = index[crate]
+        return total
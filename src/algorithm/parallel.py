@@ -0,0 +1,220 @@
+import heapq
+import multiprocessing
+import time
+from queue import Empty
+
+from src.core.state import SokobanState
+from src.algorithm.solver import SokobanAlgorithm
+from src.algorithm.heuristic import INF
+
+_POLL = 0.02
+
+class ParallelSearch:
+    """Hash-distributed best-first search over several worker processes.
+
+    Worker k owns the states whose hash is k modulo the number of workers and
+    keeps its own open list and visited set. Successors owned by another worker
+    are sent to it in batches. Each worker stores only a back-pointer
+    (owner, local id) and the move for every state, and the coordinator follows
+    these back-pointers to rebuild the solution.
+    """
+    def __init__(self, solver: "SokobanAlgorithm", workers = None, batch_size = 64):
+        self.solver = solver
+        self.workers = workers or multiprocessing.cpu_count()
+        self.batch_size = batch_size
+
+    def run(self):
+        n = self.workers
+        state = self.solver.state
+        inboxes = [multiprocessing.Queue() for _ in range(n)]
+        results = multiprocessing.Queue()
+        done = multiprocessing.Event()
+        sent = multiprocessing.Array("q", n, lock=False)
+        received = multiprocessing.Array("q", n, lock=False)
+        idle = multiprocessing.Array("b", n, lock=False)
+
+        processes = [
+            multiprocessing.Process(
+                target=_worker,
+                args=(k, n, state, self.solver.heuristic, self.solver.macros is not None, self.batch_size, inboxes, results, done, sent, received, idle),
+                daemon=True,
+            )
+            for k in range(n)
+        ]
+        for process in processes:
+            process.start()
+
+        try:
+            goal = self._wait_for_goal(results, done, sent, received, idle)
+            moves = self._trace(goal, inboxes, results) if goal else []
+        finally:
+            done.set()
+            for inbox in inboxes:
+                inbox.put(("stop",))
+            self.solver.expanded = self._collect_expanded(results, n)
+            for process in processes:
+                process.join(timeout=1)
+                if process.is_alive():
+                    process.kill()
+
+        if not goal:
+            return self.solver.get_full_path(None)
+
+        current = state
+        for move in moves:
+            current = current._get_next_state(move)
+        return self.solver.get_full_path(current)
+
+    def _wait_for_goal(self, results, done, sent, received, idle):
+        previous = None
+        while True:
+            try:
+                message = results.get(timeout=_POLL)
+            except Empty:
+                # Exhausted once every worker is idle and no batch is in flight, twice in a row
+                snapshot = (all(idle), sum(sent), sum(received))
+                if snapshot[0] and snapshot[1] == snapshot[2] and snapshot == previous:
+                    done.set()
+                    return None
+                previous = snapshot
+                continue
+
+            if message[0] == "solved":
+                done.set()
+                return message[1], message[2]
+
+    def _trace(self, ref, inboxes, results):
+        moves = []
+        while ref is not None:
+            inboxes[ref[0]].put(("trace", ref[1]))
+            while True:
+                message = results.get()
+                if message[0] == "node":
+                    break
+            _, ref, move = message
+            if move is not None:
+                moves.append(move)
+
+        moves.reverse()
+        return moves
+
+    def _collect_expanded(self, results, n):
+        expanded = 0
+        remaining = n
+        deadline = time.time() + 5
+        while remaining and time.time() < deadline:
+            try:
+                message = results.get(timeout=_POLL)
+            except Empty:
+                continue
+            if message[0] == "stats":
+                expanded += message[1]
+                remaining -= 1
+        return expanded
+
+def _worker(k, n, init_state, heuristic, macros, batch_size, inboxes, results, done, sent, received, idle):
+    solver = SokobanAlgorithm(init_state, heuristic=heuristic, macros=macros)
+    level = init_state.level
+    deadlock_detector = solver.deadlock_detector
+    inbox = inboxes[k]
+
+    nodes = []  # local id -> (parent ref, move)
+    visited = set()  # canonical keys owned by this worker
+    heap = []  # (heuristic_value, counter, local id, crate_mask, crate_key, player, reach)
+    buffers = [[] for _ in range(n)]
+    expanded = 0
+    counter = 0
+
+    def insert(entry):
+        nonlocal counter
+        crate_mask, crate_key, player, reach, heuristic_value, parent_ref, move = entry
+        state = SokobanState(level, player, crate_mask, crate_key=crate_key)
+        state._reach = reach
+        key = state.canonical_key()
+        if key in visited:
+            return
+        visited.add(key)
+        nodes.append((parent_ref, move))
+        counter += 1
+        heapq.heappush(heap, (heuristic_value, counter, len(nodes) - 1, crate_mask, crate_key, player, reach))
+
+    def flush(owner):
+        batch = buffers[owner]
+        if batch:
+            sent[k] += len(batch)
+            inboxes[owner].put(("nodes", batch))
+            buffers[owner] = []
+
+    if hash(init_state) % n == k:
+        insert((init_state.crate_mask, init_state.crate_key, init_state.player, init_state.reachable_mask(), 0, None, None))
+
+    def answer(message):
+        # Returns False once the coordinator asked this worker to stop
+        if message[0] == "trace":
+            parent_ref, move = nodes[message[1]]
+            results.put(("node", parent_ref, move))
+        return message[0] != "stop"
+
+    running = True
+    while running and not done.is_set():
+        message = None
+        try:
+            message = inbox.get_nowait() if heap else inbox.get(timeout=_POLL)
+        except Empty:
+            pass
+
+        if message is not None:
+            if message[0] == "nodes":
+                idle[k] = 0
+                for entry in message[1]:
+                    insert(entry)
+                received[k] += len(message[1])
+            else:
+                running = answer(message)
+            continue
+
+        if not heap:
+            for owner in range(n):
+                flush(owner)
+            idle[k] = 1
+            continue
+
+        idle[k] = 0
+        _, _, local_id, crate_mask, crate_key, player, reach = heapq.heappop(heap)
+        current = SokobanState(level, player, crate_mask, crate_key=crate_key)
+        current._reach = reach
+        if current.is_solved():
+            done.set()
+            results.put(("solved", k, local_id))
+            break
+
+        expanded += 1
+        for next_state in solver.expand(current):
+            if deadlock_detector.is_deadlock(next_state):
+                continue
+
+            heuristic_value = solver.greedy_cost(next_state)
+            if heuristic_value >= INF:
+                continue
+
+            entry = (next_state.crate_mask, next_state.crate_key, next_state.player, next_state.reachable_mask(), heuristic_value, (k, local_id), next_state.prev_move)
+            owner = hash(next_state) % n
+            if owner == k:
+                insert(entry)
+            else:
+                buffers[owner].append(entry)
+                if len(buffers[owner]) >= batch_size:
+                    flush(owner)
+
+        # Keep the other workers fed even while our own open list is busy
+        if expanded % batch_size == 0:
+            for owner in range(n):
+                flush(owner)
+
+    # Serve back-pointer lookups until the coordinator stops us
+    while running:
+        running = answer(inbox.get())
+
+    results.put(("stats", expanded))
+    for queue in inboxes:
+        queue.cancel_join_thread()
@@ -0,0 +1,341 @@
+import argparse
+import json
+import os
+import time
+from collections import OrderedDict
+from itertools import combinations
+from math import comb
+
+import numpy as np
+
+from src.core.level import iter_bits
+from src.core.state import SokobanState
+from src.algorithm.heuristic import INF
+
+PDB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "utils", "levels", "pdb")
+
+def _assignments(n, sizes):
+    # Every split of crates 0..n-1 into groups of `sizes`, ascending within each group
+    if not sizes:
+        yield ()
+        return
+    first, rest = sizes[0], sizes[1:]
+    for group in combinations(range(n), first):
+        others = [i for i in range(n) if i not in group]
+        for tail in _assignments(len(others), rest):
+            yield (group,) + tuple(tuple(others[i] for i in sub) for sub in tail)
+
+class PatternDatabase:
+    """Exact push costs of small groups of crates, built offline and memory-mapped at solve time.
+
+    The targets are split into groups of at most `group_size`, in one or more partitions.
+    For each group a retrograde search pulls crates away from the group's targets, with
+    no other crate on the board, and records the pulls needed for every placement of as
+    many crates as the group has targets and for every player cell: the pushes that
+    placement needs to fill the group's targets.
+
+    A state's bound is, per partition, the cheapest way to hand its crates out to the
+    groups, summing the groups' costs; partitions combine by max. Other crates only get
+    in the way, so the bound is admissible. The player is looked up at its region id,
+    which keeps the bound a function of the canonical state.
+
+    All groups share one uint8 array of rows (placement index) by columns (player cell):
+    254 caps long costs, which keeps them lower bounds, and 255 marks a placement that
+    cannot fill the group. Placements are ranked over the level's live (non dead) cells
+    in the combinatorial number system.
+    """
+    UNSOLVED = 255
+    MAX_COST = 254
+    MAX_ASSIGNMENTS = 1 << 14  # above this the groups are minimized independently
+    __VERSION = 1
+
+    def __init__(self, level, meta, table, cache_size = 1 << 15):
+        if meta.get("version") != self.__VERSION or meta.get("key") != level.key:
+            raise ValueError("pattern database does not match this level")
+        if table.shape != (meta["rows"], len(level.cells)):
+            raise ValueError("pattern database table has the wrong shape")
+
+        self.level = level
+        self.meta = meta
+        self.table = table
+        self.groups = tuple(tuple(group) for group in meta["groups"])
+        self.offsets = tuple(meta["offsets"])
+        self.partitions = tuple(tuple(partition) for partition in meta["partitions"])
+        self.live = tuple(meta["live"])
+
+        rank = np.full(len(level.cells), -1, dtype=np.int64)
+        rank[list(self.live)] = np.arange(len(self.live))
+        self.rank = rank
+        width = max((len(group) for group in self.groups), default=0)
+        self.binom = np.array([[comb(r, j) for j in range(width + 1)] for r in range(len(self.live))], dtype=np.int64)
+
+        # Flat view of the table, and stored cost -> bound (UNSOLVED -> INF)
+        self._flat = table.reshape(-1)
+        self._weights = np.arange(self.UNSOLVED + 1, dtype=np.int64)
+        self._weights[self.UNSOLVED] = INF
+
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # canonical key -> bound
+        self._plans = self._plan(len(level.targets))
+
+    def _plan(self, n):
+        # The costs of a state are laid out as one vector: for each group size, for each
+        # group of that size, one entry per crate subset of that size. A partition is then a
+        # (group, hand-out) matrix of positions in that vector, or None when there are too
+        # many hand-outs and its groups are minimized independently.
+        sizes = sorted({len(group) for group in self.groups})
+        subsets = {k: list(combinations(range(n), k)) for k in sizes}
+        self._subsets = []  # (crate subsets, combinadic columns, table row offsets) per size
+        base = {}  # group -> start of its entries
+        block = {}  # group -> position of its entries among the groups
+        starts = []
+        for k in sizes:
+            groups = [g for g, group in enumerate(self.groups) if len(group) == k]
+            offsets = np.array([self.offsets[g] for g in groups], dtype=np.int64)
+            self._subsets.append((np.array(subsets[k], dtype=np.intp).reshape(-1, k), np.arange(1, k + 1), offsets[:, None]))
+            for g in groups:
+                base[g], block[g] = sum(len(subsets[len(self.groups[h])]) for h in base), len(starts)
+                starts.append(base[g])
+        self._starts = np.array(starts, dtype=np.intp)
+
+        plans = []
+        for partition in self.partitions:
+            counts = [len(self.groups[g]) for g in partition]
+            total, left = 1, n
+            for k in counts:
+                total *= comb(left, k)
+                left -= k
+            if left or total > self.MAX_ASSIGNMENTS:
+                plans.append((None, np.array([block[g] for g in partition], dtype=np.intp)))
+                continue
+            position = {k: {subset: i for i, subset in enumerate(subsets[k])} for k in sizes}
+            split = list(_assignments(n, counts))
+            plans.append((np.array([[base[g] + position[k][a[i]] for a in split] for i, (g, k) in enumerate(zip(partition, counts))],
+                                   dtype=np.intp), None))
+        return plans
+
+    @classmethod
+    def build(cls, level, group_size = 3, partitions = 2):
+        """Runs the retrograde searches for every group of every partition."""
+        tables = level.tables
+        targets = tuple(iter_bits(level.target_mask))
+        live = [i for i, dead in enumerate(tables.dead) if not dead]
+
+        groups = []
+        chosen = []
+        for partition in cls._partitions(level, targets, group_size, partitions):
+            ids = []
+            for group in partition:
+                if group not in groups:
+                    groups.append(group)
+                ids.append(groups.index(group))
+            chosen.append(ids)
+
+        rank = {cell: r for r, cell in enumerate(live)}
+        offsets, blocks, rows = [], [], 0
+        for group in groups:
+            block = cls._retrograde(level, group, rank)
+            offsets.append(rows)
+            blocks.append(block)
+            rows += len(block)
+
+        table = np.concatenate(blocks) if blocks else np.zeros((0, len(level.cells)), dtype=np.uint8)
+        meta = {
+            "version": cls.__VERSION,
+            "key": level.key,
+            "group_size": group_size,
+            "live": live,
+            "groups": [list(group) for group in groups],
+            "offsets": offsets,
+            "partitions": chosen,
+            "rows": rows,
+        }
+        return cls(level, meta, table)
+
+    @staticmethod
+    def _partitions(level, targets, group_size, count):
+        # Greedy clusters of nearby targets, seeded in row-major order, then in reverse
+        # order and so on; identical partitions are kept once
+        cells = level.cells
+
+        def distance(a, b):
+            (ax, ay), (bx, by) = cells[a], cells[b]
+            return abs(ax - bx) + abs(ay - by)
+
+        found = []
+        orders = [targets, targets[::-1], tuple(sorted(targets, key=lambda t: cells[t][::-1]))]
+        orders.append(orders[2][::-1])
+        for order in orders[:max(count, 1)]:
+            left = list(order)
+            partition = []
+            while left:
+                seed = left.pop(0)
+                left.sort(key=lambda t: distance(seed, t))
+                partition.append(tuple(sorted((seed, *left[:group_size - 1]))))
+                del left[:group_size - 1]
+            partition = tuple(sorted(partition))
+            if partition not in found:
+                found.append(partition)
+        return found
+
+    @classmethod
+    def _retrograde(cls, level, group, rank):
+        # Breadth-first pulls from the group's crates on its targets, the player starting in
+        # each region left free around them (as SokobanAlgorithm._goal_states)
+        near, cells = level.tables.neighbors, level.cells
+        size, k = len(cells), len(group)
+        binom = [[comb(r, j) for j in range(k + 1)] for r in range(len(rank))]
+
+        def row(mask):
+            return sum(binom[rank[cell]][j] for j, cell in enumerate(iter_bits(mask), 1))
+
+        block = np.full((comb(len(rank), k), size), cls.UNSOLVED, dtype=np.uint8)
+        goal = sum(1 << t for t in group)
+        layer = []
+        seen = set()
+        free = (1 << size) - 1 & ~goal
+        while free:
+            cell = (free & -free).bit_length() - 1
+            state = SokobanState(level, cells[cell], goal, crate_key=0)
+            free &= ~state.reachable_mask()
+            seen.add((goal, cell))
+            layer.append(state)
+
+        depth = 0
+        while layer:
+            cost = min(depth, cls.MAX_COST)
+            next_layer = []
+            for state in layer:
+                crate_mask = state.crate_mask
+                reach = state.reachable_mask()
+                block[row(crate_mask), list(iter_bits(reach))] = cost
+                for j in iter_bits(crate_mask):
+                    for nb in near:
+                        i = nb[j]
+                        if i < 0 or not reach >> i & 1:
+                            continue
+                        back = nb[i]
+                        if back < 0 or crate_mask >> back & 1:
+                            continue
+                        previous = SokobanState(level, cells[back], crate_mask ^ (1 << j) ^ (1 << i), crate_key=0)
+                        key = previous.canonical_key()
+                        if key not in seen:
+                            seen.add(key)
+                            next_layer.append(previous)
+            layer = next_layer
+            depth += 1
+        return block
+
+    @staticmethod
+    def _paths(level, directory):
+        base = os.path.join(directory, level.key)
+        return f"{base}.npy", f"{base}.json"
+
+    def save(self, directory = PDB_DIR):
+        os.makedirs(directory, exist_ok=True)
+        table_path, meta_path = self._paths(self.level, directory)
+        # The table first: the metadata, written last, is what makes the pair loadable
+        for path, write in ((table_path, lambda f: np.save(f, np.ascontiguousarray(self.table))),
+                            (meta_path, lambda f: f.write(json.dumps(self.meta).encode("utf-8")))):
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                write(f)
+            os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, level, directory = PDB_DIR):
+        """Opens the database of `level`; the table is memory-mapped, not read."""
+        table_path, meta_path = cls._paths(level, directory)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(level, meta, np.load(table_path, mmap_mode="r"))
+
+    @classmethod
+    def cached(cls, level, directory = PDB_DIR, group_size = 3, partitions = 2):
+        try:
+            return cls.load(level, directory)
+        except (OSError, ValueError, KeyError):
+            database = cls.build(level, group_size, partitions)
+            database.save(directory)
+            return database
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    def estimate(self, state):
+        """Lower bound on the pushes left, `INF` when no hand-out of the crates can work."""
+        key = state.canonical_key()
+        bound = self._cache.get(key)
+        if bound is not None:
+            self._cache.move_to_end(key)
+            return bound
+
+        bound = self._estimate(state.crate_mask, key[1])
+        self._cache[key] = bound
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return bound
+
+    def _estimate(self, crate_mask, player):
+        ranks = self.rank[list(iter_bits(crate_mask))]
+        if len(ranks) != len(self.level.targets) or not self._plans:
+            return 0
+        if (ranks < 0).any():
+            return INF  # a crate on a dead square
+
+        size = len(self.level.cells)
+        cells = [((self.binom[ranks[subsets], columns].sum(axis=1) + offsets) * size + player).ravel()
+                 for subsets, columns, offsets in self._subsets]
+        costs = self._weights.take(self._flat.take(np.concatenate(cells) if len(cells) > 1 else cells[0]))
+
+        best = 0
+        minima = None
+        for handouts, blocks in self._plans:
+            if handouts is not None:
+                bound = int(costs.take(handouts).sum(axis=0).min())
+            else:
+                if minima is None:
+                    minima = np.minimum.reduceat(costs, self._starts)
+                bound = int(minima.take(blocks).sum())
+            if bound >= INF:
+                return INF
+            best = max(best, bound)
+        return best
+
+def main(argv = None):
+    # Imported here: only the command line needs the level index
+    from src.utils.level_store import LevelStore
+    from src.utils.generator import Generator
+
+    parser = argparse.ArgumentParser(description="Build the pattern databases of levels ahead of solving them.")
+    parser.add_argument("--sets", nargs="+", default=["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"])
+    parser.add_argument("--levels", nargs="+", help="restrict to these level names")
+    parser.add_argument("--group-size", type=int, default=3, help="targets per group")
+    parser.add_argument("--partitions", type=int, default=2, help="target partitions, combined by max")
+    parser.add_argument("--output", default=PDB_DIR)
+    parser.add_argument("--force", action="store_true", help="rebuild databases that already exist")
+    args = parser.parse_args(argv)
+
+    store = LevelStore.default()
+    for game_set in args.sets:
+        for game_level in sorted(level.game_level for level in store.levels(game_set)):
+            if args.levels and game_level not in args.levels:
+                continue
+            level = Generator(game_set, game_level, store).gen_state().level
+            if not args.force:
+                try:
+                    PatternDatabase.load(level, args.output)
+                    print(f"{game_set}, {game_level}: up to date")
+                    continue
+                except (OSError, ValueError, KeyError):
+                    pass
+
+            stime = time.time()
+            database = PatternDatabase.build(level, args.group_size, args.partitions)
+            database.save(args.output)
+            print(f"{game_set}, {game_level}: {len(database.groups)} groups, "
+                  f"{database.nbytes / 1024:.1f} KiB, {time.time() - stime:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,80 @@
+import functools
 import heapq
+import os
+import sys
 from collections import deque
 
-from src.core.state import SokobanState
+from src.core.level import iter_bits, popcount
+from src.core.state import SokobanState, MacroMove
+from src.core.tables import LevelTables, TABLES_DIR
 from src.algorithm.deadlock import DeadlockDetector
+from src.algorithm.heuristic import INF, MatchingHeuristic
+from src.algorithm.macro import MacroGenerator
+from src.algorithm.stats import SearchStats
+from src.algorithm.vectorized import BatchExpander
+from src.algorithm.anytime import AnytimeSearch
+from src.algorithm.pdb import PatternDatabase
+from src.algorithm.store import VisitedStore, FingerprintTable, encode_move, decode_move
+from src.algorithm.engine import SearchEngine
+
+def search(method):
+    # Public search entry points: record a stats run around the call when stats are on
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.stats is None:
+            return method(self, *args, **kwargs)
+
+        self.stats.start(self, method.__name__)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.stats.stop(self)
+    return wrapper
 
 class SokobanAlgorithm:
-    def __init__(self, state: "SokobanState"):
+    ENGINE_STEP = 4096  # expansions per step when a blocking search runs the step engine
+
+    def __init__(self, state: "SokobanState", tables: "LevelTables" = None, heuristic = "manhattan", macros = False, stats = None, pdb = None):
         self.state = state
+        # Static tables are built once here and shared by every state of the search; a
+        # directory (True: the default one) loads them from disk, saving them on first use
+        if tables is True or isinstance(tables, (str, os.PathLike)):
+            tables = LevelTables.cached(state.level, TABLES_DIR if tables is True else tables)
+        if tables is not None:
+            state.level.tables = tables
+        self.tables = state.level.tables
         self.deadlock_detector = DeadlockDetector(state)
         self.df = max(state.bound)
+        self.target_cells = tuple(iter_bits(state.level.target_mask))
+        self.matching = MatchingHeuristic(self.tables, self.target_cells)
+        if heuristic not in ("manhattan", "matching", "pdb"):
+            raise ValueError(f"unknown heuristic: {heuristic}")
+        self.heuristic = heuristic
+        # Pattern database: raises the push lower bound of the informed searches; True or
+        # heuristic="pdb" opens the level's database from disk, building it if missing
+        if pdb is True or (pdb is None and heuristic == "pdb"):
+            pdb = PatternDatabase.cached(state.level)
+        self.pdb = pdb or None
+        # Tunnel and goal-room macros: fewer, longer steps (BFS then counts steps, not pushes)
+        self.macros = MacroGenerator(state.level) if macros else None
+        # Search instrumentation: None (off), True or a SearchStats instance
+        self.stats = SearchStats() if stats is True else stats or None
+        # Proven lower bound on the pushes of a solution; IDA* starts from it and raises it
+        self.lower_bound = 0
+        self.expanded = 0
+
+    def _expanded(self, open_size, visited_size):
+        self.expanded += 1
+        if self.stats is not None:
+            self.stats.expand(open_size, visited_size)
+
+    def expand(self, state: "SokobanState"):
+        if self.macros is not None:
+            return self.macros.expand(state)
+        return state.get_all_next_states()
+
+    def push_count(self, move):
+        return len(move.steps) if type(move) is MacroMove else 1
 
     def get_full_path(self, solved_state: "SokobanState"):
         if solved_state:
@@ -21,13 +87,58 @@ class SokobanAlgorithm:
                     return_moves_path = [current.prev_move] + return_moves_path
                 current = current.parent
 
+            if any(type(move) is MacroMove for move in return_moves_path):
+                # Expand macros into single pushes, with one state after each push
+                return_moves_path = [step for move in return_moves_path for step in getattr(move, "steps", (move,))]
+                current = return_states_path[0]
+                return_states_path = [current]
+                for move in return_moves_path:
+                    current = current._get_next_state(move)
+                    return_states_path.append(current)
+
             return return_states_path, return_moves_path
         else:
             return [], []
-        
-    def bfs(self):
+
+    def get_traced_path(self, trace: "TraceTable", node):
+        # Rebuilds the state chain of a compact search by replaying its move codes
+        if node is None:
+            return self.get_full_path(None)
+
+        level = self.state.level
+        current = self.state
+        for code in trace.path(node):
+            current = current._get_next_state(decode_move(level, code))
+        return self.get_full_path(current)
+
+    def _trace_move(self, trace: "TraceTable", node, move):
+        # A macro is stored as a chain of single pushes
+        level = self.state.level
+        for step in getattr(move, "steps", (move,)):
+            node = trace.add(node, encode_move(level, step))
+        return node
+
+    def _entry_bytes(self, entry):
+        # Approximate size of one frontier entry: the list slot, the tuple and its integers,
+        # the state and its integers (the level and the player's cell tuple are shared)
+        state = entry[-1]
+        values = (*entry[:-1], state.crate_mask, state.crate_key, state.reachable_mask())
+        return 8 + sys.getsizeof(entry) + sys.getsizeof(state) + sum(sys.getsizeof(value) for value in values)
+
+    def _check_memory(self, store: "VisitedStore", trace: "TraceTable", frontier_bytes, memory_limit):
+        if memory_limit is not None and store.nbytes + trace.nbytes + frontier_bytes > memory_limit:
+            raise MemoryError(f"search exceeded the memory limit of {memory_limit} bytes")
+
+    @search
+    def bfs(self, store: "VisitedStore" = None, memory_limit = None, batch_size = None):
+        if store is not None or memory_limit is not None:
+            return self._compact_bfs(FingerprintTable() if store is None else store, memory_limit)
+        if batch_size:
+            return self._batched_bfs(batch_size)
+
         solved_state = None
-        visited = set()
+        self.expanded = 0
+        visited = {self.state}
         queue = deque([self.state])
 
         while queue:
@@ -36,28 +147,175 @@ class SokobanAlgorithm:
                 solved_state = current
                 break
 
-            for next_state in current.get_all_next_states():
+            self._expanded(len(queue), len(visited))
+            for next_state in self.expand(current):
                 if next_state not in visited:
                     visited.add(next_state)
                     queue.append(next_state)
         
         return self.get_full_path(solved_state)
         
+    def _batched_bfs(self, batch_size):
+        # Layered BFS expanding `batch_size` states at a time (single pushes only). Pushes onto
+        # dead squares or into 2x2 patterns are dropped, which never removes a solution.
+        self.expanded = 0
+        if self.state.is_solved():
+            return self.get_full_path(self.state)
+
+        expander = BatchExpander(self.state.level, self.df, self.deadlock_detector.pruned)
+        visited = {self.state}
+        layer = [self.state]
+
+        while layer:
+            next_layer = []
+            for start in range(0, len(layer), batch_size):
+                batch = layer[start:start + batch_size]
+                for _ in batch:
+                    self._expanded(len(layer) - start + len(next_layer), len(visited))
+
+                for next_state, _ in expander.expand(batch):
+                    if next_state in visited:
+                        continue
+                    if next_state.is_solved():
+                        return self.get_full_path(next_state)
+                    visited.add(next_state)
+                    next_layer.append(next_state)
+            layer = next_layer
+
+        return self.get_full_path(None)
+
+    @search
+    def bidirectional_bfs(self):
+        # Forward push search from the start and backward pull search from every goal
+        # placement (one root per player region), each growing its smaller frontier a layer at a time
+        self.expanded = 0
+        if self.state.is_solved():
+            return self.get_full_path(self.state)
+
+        # key -> (key of the neighbor toward its root, push between them, depth)
+        forward = {self.state.canonical_key(): (None, None, 0)}
+        backward = {}
+        forward_layer = [self.state]
+        backward_layer = []
+        for goal in self._goal_states():
+            backward[goal.canonical_key()] = (None, None, 0)
+            backward_layer.append(goal)
+
+        meeting = None
+        while forward_layer and backward_layer and meeting is None:
+            if len(forward_layer) <= len(backward_layer):
+                forward_layer, meeting = self._bidirectional_layer(forward_layer, forward, backward, self._push_states)
+            else:
+                backward_layer, meeting = self._bidirectional_layer(backward_layer, backward, forward, self._pull_states)
+
+        if meeting is None:
+            return self.get_full_path(None)
+
+        moves = []
+        key = meeting
+        while forward[key][0] is not None:
+            key, move, _ = forward[key]
+            moves.append(move)
+        moves.reverse()
+
+        key = meeting
+        while backward[key][0] is not None:
+            key, move, _ = backward[key]
+            moves.append(move)
+
+        current = self.state
+        for move in moves:
+            current = current._get_next_state(move)
+        return self.get_full_path(current)
+
+    def _bidirectional_layer(self, layer, own, other, successors):
+        # Expands a whole layer and returns the meeting key of the shortest joined path, if any
+        best, meeting = INF, None
+        next_layer = []
+        for current in layer:
+            key = current.canonical_key()
+            depth = own[key][2] + 1
+            self._expanded(len(layer) + len(next_layer), len(own) + len(other))
+            for next_state, move in successors(current):
+                next_key = next_state.canonical_key()
+                if next_key in own:
+                    continue
+
+                own[next_key] = (key, move, depth)
+                next_layer.append(next_state)
+                if next_key in other and depth + other[next_key][2] < best:
+                    best, meeting = depth + other[next_key][2], next_key
+
+        return next_layer, meeting
+
+    def _push_states(self, state: "SokobanState"):
+        for next_state in state.get_all_next_states():
+            if not self.deadlock_detector.is_deadlock(next_state):
+                move = next_state.prev_move
+                next_state.parent = next_state.prev_move = None
+                yield next_state, move
+
+    def _pull_states(self, state: "SokobanState"):
+        # Predecessors of `state`, each with the push leading back to it. States reached
+        # by pulls from the goal are solvable, so no deadlock check is needed here.
+        level = state.level
+        cells, keys = level.cells, level.crate_keys
+        crate_mask = state.crate_mask
+        reach = state.reachable_mask()
+        for j in iter_bits(crate_mask):
+            for near in self.tables.neighbors:
+                i = near[j]
+                if i < 0 or not reach >> i & 1:
+                    continue
+                k = near[i]
+                if k < 0 or crate_mask >> k & 1:
+                    continue
+                previous = SokobanState(level, cells[k], crate_mask ^ (1 << j) ^ (1 << i),
+                                        crate_key=state.crate_key ^ keys[j] ^ keys[i])
+                yield previous, (cells[k], cells[i], cells[j])
+
+    def _goal_states(self):
+        # Crates on every target, the player in each region left free around them
+        level = self.state.level
+        target_mask = level.target_mask
+        free = (1 << len(level.cells)) - 1 & ~target_mask
+        while free:
+            cell = (free & -free).bit_length() - 1
+            goal = SokobanState(level, level.cells[cell], target_mask)
+            free &= ~goal.reachable_mask()
+            yield goal
+
     def greedy_cost(self, state: "SokobanState"):
         if state.is_solved():
             return -self.df * len(state.targets)
 
-        crate_to_target_cost = 0
-        for crate in state.crates - state.targets:
-            min_dist = min(abs(crate[0] - target[0]) + abs(crate[1] - target[1]) 
-                            for target in state.targets)
-            crate_to_target_cost += min_dist
+        unplaced = state.crate_mask & ~state.level.target_mask
+        if self.heuristic != "manhattan":
+            crate_to_target_cost = self.push_lower_bound(state) if self.heuristic == "pdb" else self.matching.estimate(state)
+            if crate_to_target_cost >= INF:
+                return INF
+        else:
+            nearest = self.tables.nearest_manhattan
+            crate_to_target_cost = 0
+            for i in iter_bits(unplaced):
+                crate_to_target_cost += nearest[i]
         
-        return crate_to_target_cost + self.df * (len(state.crates - state.targets) - len(state.crates & state.targets))
+        return crate_to_target_cost + self.df * (popcount(unplaced) - popcount(state.crate_mask & state.level.target_mask))
     
     
-    def hybrid_heuristic(self):
+    def _compact_bfs(self, store: "VisitedStore", memory_limit):
+        # Layered BFS keeping only fingerprints and (parent, move code) back-pointers
+        return self._run_engine("bfs", store, memory_limit)
+
+    @search
+    def hybrid_heuristic(self, store: "VisitedStore" = None, memory_limit = None, batch_size = None):
+        if store is not None or memory_limit is not None:
+            return self._compact_hybrid_heuristic(FingerprintTable() if store is None else store, memory_limit)
+        if batch_size:
+            return self._batched_hybrid_heuristic(batch_size)
+
         solved_state = None
+        self.expanded = 0
         visited = set()
         # heap: (heuristic_value, counter, state)
         counter = 0  # Tie-breaker counter
@@ -77,12 +335,182 @@ class SokobanAlgorithm:
                 solved_state = current
                 break
 
+            self._expanded(len(heap), len(visited))
             # Generate all possible next states and add to heap
-            for next_state in current.get_all_next_states():
+            for next_state in self.expand(current):
                 # Check visited and deadlock before adding to heap (more efficient)
                 if next_state not in visited and not self.deadlock_detector.is_deadlock(next_state):
                     counter += 1
                     heuristic_value = self.greedy_cost(next_state)
+                    if heuristic_value >= INF:
+                        continue
                     heapq.heappush(heap, (heuristic_value, counter, next_state))
 
-        return self.get_full_path(solved_state)
\ No newline at end of file
+        return self.get_full_path(solved_state)
+
+    def _compact_hybrid_heuristic(self, store: "VisitedStore", memory_limit):
+        return self._run_engine("hybrid_heuristic", store, memory_limit)
+
+    def _run_engine(self, algorithm, store: "VisitedStore", memory_limit):
+        # The step engine holds the one copy of the compact searches: run it to the end
+        self.expanded = 0
+        engine = SearchEngine(self, algorithm, store=store, memory_limit=memory_limit, step_nodes=self.ENGINE_STEP)
+        for _ in engine:
+            pass
+        return engine.result()
+
+    def _batched_hybrid_heuristic(self, batch_size):
+        # Expands the `batch_size` best states of the open list together (single pushes only)
+        solved_state = None
+        self.expanded = 0
+        expander = BatchExpander(self.state.level, self.df, self.deadlock_detector.pruned)
+        manhattan = self.heuristic == "manhattan"
+        visited = set()
+        counter = 0  # Tie-breaker counter
+        heap = [(self.greedy_cost(self.state), counter, self.state)]
+
+        while heap and solved_state is None:
+            batch = []
+            while heap and len(batch) < batch_size:
+                _, _, current = heapq.heappop(heap)
+                if current in visited:
+                    continue
+
+                visited.add(current)
+                if current.is_solved():
+                    solved_state = current
+                    break
+
+                self._expanded(len(heap), len(visited))
+                batch.append(current)
+
+            if solved_state is not None:
+                break
+
+            for next_state, cost in expander.expand(batch):
+                if next_state not in visited and not self.deadlock_detector.is_deadlock(next_state):
+                    heuristic_value = cost if manhattan else self.greedy_cost(next_state)
+                    if heuristic_value >= INF:
+                        continue
+                    counter += 1
+                    heapq.heappush(heap, (heuristic_value, counter, next_state))
+
+        return self.get_full_path(solved_state)
+
+    @search
+    def parallel_hybrid_heuristic(self, workers = None, batch_size = 64):
+        # Imported here: the parallel workers build their own SokobanAlgorithm
+        from src.algorithm.parallel import ParallelSearch
+        return ParallelSearch(self, workers, batch_size).run()
+
+    @search
+    def decomposed(self, algorithm = "hybrid_heuristic", **options):
+        # Imported here: the decomposition builds its own SokobanAlgorithm per subproblem
+        from src.algorithm.decompose import DecomposedSearch
+        return self.get_full_path(DecomposedSearch(self, algorithm, **options).run())
+
+    def push_lower_bound(self, state: "SokobanState"):
+        bound = self.matching.estimate(state)
+        if self.pdb is not None and bound < INF:
+            bound = max(bound, self.pdb.estimate(state))
+        return bound
+
+    @search
+    def astar(self):
+        solved_state = None
+        self.expanded = 0
+        start_cost = self.push_lower_bound(self.state)
+        if start_cost >= INF:
+            return self.get_full_path(solved_state)
+
+        # best_pushes: cheapest known push count for each (canonical) state
+        best_pushes = {self.state: 0}
+        # heap: (pushes + lower_bound, -pushes, counter, pushes, state)
+        counter = 0  # Tie-breaker counter
+        heap = [(start_cost, 0, counter, 0, self.state)]
+
+        while heap:
+            _, _, _, pushes, current = heapq.heappop(heap)
+
+            # Skip entries superseded by a cheaper path to the same state
+            if best_pushes[current] < pushes:
+                continue
+
+            if current.is_solved():
+                solved_state = current
+                break
+
+            self._expanded(len(heap), len(best_pushes))
+            for next_state in self.expand(current):
+                next_pushes = pushes + self.push_count(next_state.prev_move)
+                if next_pushes >= best_pushes.get(next_state, INF) or self.deadlock_detector.is_deadlock(next_state):
+                    continue
+
+                lower_bound = self.push_lower_bound(next_state)
+                if lower_bound >= INF:
+                    continue
+
+                best_pushes[next_state] = next_pushes
+                counter += 1
+                heapq.heappush(heap, (next_pushes + lower_bound, -next_pushes, counter, next_pushes, next_state))
+
+        return self.get_full_path(solved_state)
+
+    @search
+    def anytime(self, deadline_ms = 1000, weights = (5.0, 3.0, 2.0, 1.5, 1.0), beam_width = None, on_solution = None):
+        # Best solution found within the deadline; see AnytimeSearch for reading it out live
+        anytime = AnytimeSearch(self, deadline_ms, weights, beam_width, on_solution)
+        solved_state = anytime.run()
+        if self.macros is None and anytime.lower_bound < INF:
+            self.lower_bound = max(self.lower_bound, anytime.lower_bound)
+        return self.get_full_path(solved_state)
+
+    @search
+    def ida_star(self, table_size = 1 << 16):
+        # Only the current path is kept, plus a bounded table of (state key -> pushes)
+        self.expanded = 0
+        bound = max(self.push_lower_bound(self.state), self.lower_bound)
+        path = {self.state.canonical_key()}
+
+        while bound < INF:
+            # No solution is shorter: `bound` is a lower bound, or the last iteration failed
+            self.lower_bound = bound
+            table = {}
+            solved_state, next_bound = self._ida_search(self.state, 0, bound, path, table, table_size)
+            if solved_state:
+                return self.get_full_path(solved_state)
+            bound = next_bound
+
+        return self.get_full_path(None)
+
+    def _ida_search(self, state: "SokobanState", pushes, bound, path, table, table_size):
+        cost = pushes + self.push_lower_bound(state)
+        if cost > bound:
+            return None, cost
+
+        if state.is_solved():
+            return state, cost
+
+        self._expanded(len(path), len(table))
+        minimum = INF
+        for next_state in self.expand(state):
+            next_pushes = pushes + self.push_count(next_state.prev_move)
+            key = next_state.canonical_key()
+            if key in path or table.get(key, INF) <= next_pushes:
+                continue
+
+            if self.deadlock_detector.is_deadlock(next_state):
+                continue
+
+            if len(table) < table_size:
+                table[key] = next_pushes
+
+            path.add(key)
+            solved_state, next_cost = self._ida_search(next_state, next_pushes, bound, path, table, table_size)
+            path.remove(key)
+
+            if solved_state:
+                return solved_state, next_cost
+            minimum = min(minimum, next_cost)
+
+        return None, minimum
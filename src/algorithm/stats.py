@@ -0,0 +1,204 @@
+import json
+import time
+
+from src.algorithm.heuristic import INF
+
+class SearchStats:
+    """Counters and phase timers for the searches of one `SokobanAlgorithm`.
+
+    Pass an instance as `SokobanAlgorithm(state, stats=SearchStats())`; without it the
+    solver does no bookkeeping beyond `expanded`. While a search runs, the solver's
+    successor, heuristic and deadlock calls are wrapped to count and time them. Phases:
+
+    - successors: generating the pushes and building the child states
+    - reach: player flood fills of the child states
+    - deadlock: `DeadlockDetector.is_deadlock`
+    - heuristic: `greedy_cost` / `push_lower_bound`
+    - other: the rest, mostly visited-set hashing and open-list upkeep
+
+    `duplicates` counts generated states that were neither pruned, expanded nor left
+    open at the end: states already seen, plus IDA* bound cut-offs. Bidirectional BFS
+    does not count generated states, and the parallel search only reports `expanded`.
+    """
+    PHASES = ("successors", "reach", "deadlock", "heuristic", "other")
+
+    def __init__(self, timing = True, progress = None, interval = 1.0):
+        self.timing = timing
+        self.progress = progress  # called as progress(stats) every `interval` seconds
+        self.interval = interval
+        self.runs = []
+        self._run_samples = []
+        self._reset(None)
+
+    def _reset(self, algorithm):
+        self.algorithm = algorithm
+        self.expanded = 0
+        self.generated = 0
+        self.duplicates = 0
+        self.pruned = {}
+        self.peak_open = 0
+        self.peak_visited = 0
+        self.phases = dict.fromkeys(self.PHASES, 0.0)
+        self.samples = []  # (seconds since start, expanded, generated, open, visited)
+        self.elapsed = 0.0
+        self._open = 0
+        self._visited = 0
+        self._start = time.perf_counter()
+        self._next_sample = self._start + self.interval
+
+    def start(self, solver, algorithm):
+        self._reset(algorithm)
+        self._pruned_before = dict(solver.deadlock_detector.pruned)
+        self._unreachable = 0
+        self._attach(solver)
+
+    def stop(self, solver):
+        self._detach(solver)
+        now = time.perf_counter()
+        self.elapsed = now - self._start
+        self.expanded = solver.expanded
+        self.pruned = {
+            kind: count - self._pruned_before.get(kind, 0)
+            for kind, count in solver.deadlock_detector.pruned.items()
+        }
+        self.pruned["unreachable"] = self._unreachable
+        if self.generated:
+            self.duplicates = max(0, self.generated - sum(self.pruned.values()) - self.expanded - self._open)
+        if self.timing:
+            self.phases["other"] = max(0.0, self.elapsed - sum(self.phases.values()))
+        self._sample(now)
+        self.runs.append(self.to_dict())
+        self._run_samples.append(self.samples)
+
+    def expand(self, open_size, visited_size):
+        """Called by the solver once per expanded state."""
+        self.expanded += 1
+        self._open = open_size
+        self._visited = visited_size
+        if open_size > self.peak_open:
+            self.peak_open = open_size
+        if visited_size > self.peak_visited:
+            self.peak_visited = visited_size
+
+        if self.progress is not None or self.timing:
+            now = time.perf_counter()
+            if now >= self._next_sample:
+                self._next_sample = now + self.interval
+                self._sample(now)
+                if self.progress is not None:
+                    self.progress(self)
+
+    def _sample(self, now):
+        self.samples.append((now - self._start, self.expanded, self.generated, self._open, self._visited))
+
+    @property
+    def rate(self):
+        """Expanded states per second."""
+        return self.expanded / self.elapsed if self.elapsed else 0.0
+
+    def _attach(self, solver):
+        expand, detector = solver.expand, solver.deadlock_detector
+        is_deadlock = detector.is_deadlock
+        greedy_cost, push_lower_bound = solver.greedy_cost, solver.push_lower_bound
+        phases = self.phases
+        clock = time.perf_counter
+
+        if self.timing:
+            def timed_expand(state):
+                t0 = clock()
+                children = expand(state)
+                t1 = clock()
+                # Every search hashes the children right away, which needs their floods
+                for child in children:
+                    child.reachable_mask()
+                t2 = clock()
+                phases["successors"] += t1 - t0
+                phases["reach"] += t2 - t1
+                self.generated += len(children)
+                return children
+
+            def timed(method, phase, counts_unreachable = False):
+                def wrapper(state):
+                    t0 = clock()
+                    value = method(state)
+                    phases[phase] += clock() - t0
+                    if counts_unreachable and value >= INF:
+                        self._unreachable += 1
+                    return value
+                return wrapper
+
+            solver.expand = timed_expand
+            detector.is_deadlock = timed(is_deadlock, "deadlock")
+            solver.greedy_cost = timed(greedy_cost, "heuristic", True)
+            solver.push_lower_bound = timed(push_lower_bound, "heuristic", True)
+        else:
+            def counted_expand(state):
+                children = expand(state)
+                self.generated += len(children)
+                return children
+
+            def counted(method):
+                def wrapper(state):
+                    value = method(state)
+                    if value >= INF:
+                        self._unreachable += 1
+                    return value
+                return wrapper
+
+            solver.expand = counted_expand
+            solver.greedy_cost = counted(greedy_cost)
+            solver.push_lower_bound = counted(push_lower_bound)
+
+    def _detach(self, solver):
+        # Drop the instance wrappers so the class methods are visible again
+        for name in ("expand", "greedy_cost", "push_lower_bound"):
+            solver.__dict__.pop(name, None)
+        solver.deadlock_detector.__dict__.pop("is_deadlock", None)
+
+    def to_dict(self):
+        return {
+            "algorithm": self.algorithm,
+            "time": round(self.elapsed, 6),
+            "expanded": self.expanded,
+            "generated": self.generated,
+            "duplicates": self.duplicates,
+            "pruned": dict(self.pruned),
+            "peak_open": self.peak_open,
+            "peak_visited": self.peak_visited,
+            "rate": round(self.rate, 1),
+            "phases": {phase: round(seconds, 6) for phase, seconds in self.phases.items()} if self.timing else {},
+        }
+
+    def to_json(self, path = None):
+        """Every finished run, as a JSON string, also written to `path` if given."""
+        text = json.dumps(self.runs, indent=2)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def to_chrome_trace(self, path):
+        """Writes the runs in Chrome trace format (chrome://tracing, Perfetto, speedscope).
+
+        Each run is a span holding one span per phase, laid end to end with its total
+        time, plus counter tracks for the sampled node counts.
+        """
+        events = []
+        offset = 0.0
+        for run, samples in zip(self.runs, self._run_samples):
+            start = offset
+            events.append({"name": run["algorithm"], "ph": "X", "pid": 1, "tid": 1,
+                           "ts": start, "dur": run["time"] * 1e6, "args": run})
+            for phase, seconds in run["phases"].items():
+                events.append({"name": phase, "ph": "X", "pid": 1, "tid": 1, "ts": offset, "dur": seconds * 1e6})
+                offset += seconds * 1e6
+            for t, expanded, generated, open_size, visited_size in samples:
+                ts = start + t * 1e6
+                events.append({"name": "nodes", "ph": "C", "pid": 1, "ts": ts,
+                               "args": {"expanded": expanded, "generated": generated}})
+                events.append({"name": "memory", "ph": "C", "pid": 1, "ts": ts,
+                               "args": {"open": open_size, "visited": visited_size}})
+            offset = start + run["time"] * 1e6
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,256 @@
+import os
+import shutil
+import sys
+import tempfile
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from src.core.tables import LevelTables
+
+def encode_move(level, move):
+    """Packs a (player, crate, new_crate) push into crate cell * 4 + direction."""
+    near_pos, crate_pos, _ = move
+    direction = LevelTables.DIRECTIONS.index((near_pos[0] - crate_pos[0], near_pos[1] - crate_pos[1]))
+    return level.index[crate_pos] * 4 + direction
+
+def decode_move(level, code):
+    tables = level.tables
+    crate, direction = code >> 2, code & 3
+    cells = level.cells
+    return cells[tables.neighbors[direction][crate]], cells[crate], cells[tables.behind[direction][crate]]
+
+class VisitedStore(ABC):
+    """Set of 64-bit state fingerprints (see `SokobanState.fingerprint`).
+
+    Two different states share a fingerprint with probability about n^2 / 2^65,
+    which is negligible at the sizes searched here.
+    """
+    @abstractmethod
+    def add(self, fingerprint):
+        """Inserts the fingerprint; returns False if it was already present."""
+
+    @abstractmethod
+    def __contains__(self, fingerprint):
+        pass
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+    @property
+    @abstractmethod
+    def nbytes(self):
+        pass
+
+    def next_layer(self):
+        """Called by layered searches (BFS) when the search depth increases."""
+
+    def close(self):
+        pass
+
+class SetStore(VisitedStore):
+    """Plain Python set of fingerprints."""
+    def __init__(self):
+        self._items = set()
+
+    def add(self, fingerprint):
+        if fingerprint in self._items:
+            return False
+        self._items.add(fingerprint)
+        return True
+
+    def __contains__(self, fingerprint):
+        return fingerprint in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def nbytes(self):
+        # Set table plus one boxed int per entry
+        return sys.getsizeof(self._items) + 36 * len(self._items)
+
+class FingerprintTable(VisitedStore):
+    """Open-addressing hash table of fingerprints in a NumPy uint64 array (linear probing).
+
+    8 bytes per slot and a load factor of at most 1/2. Raises MemoryError when
+    growing would exceed `max_bytes`.
+    """
+    __EMPTY = 0
+
+    def __init__(self, capacity = 1 << 16, max_bytes = None):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.max_bytes = max_bytes
+        self._table = np.zeros(size, dtype=np.uint64)
+        self._mask = size - 1
+        self._count = 0
+
+    def _slot(self, fingerprint):
+        table, mask = self._table, self._mask
+        slot = fingerprint & mask
+        while True:
+            value = int(table[slot])
+            if value == fingerprint or value == self.__EMPTY:
+                return slot, value
+            slot = (slot + 1) & mask
+
+    def add(self, fingerprint):
+        fingerprint = fingerprint or 1  # 0 marks an empty slot
+        slot, value = self._slot(fingerprint)
+        if value == fingerprint:
+            return False
+
+        self._table[slot] = fingerprint
+        self._count += 1
+        if 2 * self._count > len(self._table):
+            self._grow()
+        return True
+
+    def __contains__(self, fingerprint):
+        fingerprint = fingerprint or 1
+        return self._slot(fingerprint)[1] == fingerprint
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        return self._table.nbytes
+
+    def _grow(self):
+        if self.max_bytes is not None and 2 * self._table.nbytes > self.max_bytes:
+            raise MemoryError(f"fingerprint table would exceed {self.max_bytes} bytes")
+
+        old = self._table[self._table != self.__EMPTY]
+        self._table = np.zeros(2 * len(self._table), dtype=np.uint64)
+        self._mask = len(self._table) - 1
+        for fingerprint in old.tolist():
+            slot, _ = self._slot(fingerprint)
+            self._table[slot] = fingerprint
+
+class DiskStore(VisitedStore):
+    """Keeps the newest layers in memory and spills older ones to sorted memory-mapped files.
+
+    A layer is spilled when the search moves `keep_layers` layers past it, or
+    early when the in-memory layers grow beyond `max_bytes`. Lookups in spilled
+    layers are binary searches over the mapped arrays, which are merged into one
+    file once there are more than `max_files` of them.
+    """
+    def __init__(self, directory = None, keep_layers = 2, max_bytes = 64 * 1024 * 1024, max_files = 8):
+        self._owns_directory = directory is None
+        self.directory = tempfile.mkdtemp(prefix="sokoban-visited-") if directory is None else directory
+        os.makedirs(self.directory, exist_ok=True)
+        self.keep_layers = keep_layers
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._layers = [set()]
+        self._spilled = []
+        self._files = 0
+        self._count = 0
+
+    def add(self, fingerprint):
+        if fingerprint in self:
+            return False
+
+        self._layers[-1].add(fingerprint)
+        self._count += 1
+        if self._memory_bytes() > self.max_bytes:
+            while self._layers:
+                self._spill(self._layers.pop(0))
+            self._layers.append(set())
+        return True
+
+    def __contains__(self, fingerprint):
+        for layer in reversed(self._layers):
+            if fingerprint in layer:
+                return True
+
+        key = np.uint64(fingerprint)
+        for spilled in self._spilled:
+            i = np.searchsorted(spilled, key)
+            if i < len(spilled) and spilled[i] == key:
+                return True
+        return False
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        # Spilled layers live in the page cache, not in the process heap
+        return self._memory_bytes()
+
+    def next_layer(self):
+        self._layers.append(set())
+        while len(self._layers) > self.keep_layers:
+            self._spill(self._layers.pop(0))
+
+    def _memory_bytes(self):
+        return sum(sys.getsizeof(layer) + 36 * len(layer) for layer in self._layers)
+
+    def _spill(self, layer):
+        if not layer:
+            return
+
+        values = np.fromiter(layer, dtype=np.uint64, count=len(layer))
+        values.sort()
+        self._spilled.append(self._write(values))
+
+        if len(self._spilled) > self.max_files:
+            merged = np.concatenate(self._spilled)
+            merged.sort()
+            paths = [spilled.filename for spilled in self._spilled]
+            self._spilled = [self._write(merged)]
+            for path in paths:
+                os.remove(path)
+
+    def _write(self, values):
+        path = os.path.join(self.directory, f"layer_{self._files:06d}.bin")
+        self._files += 1
+        mapped = np.memmap(path, dtype=np.uint64, mode="w+", shape=values.shape)
+        mapped[:] = values
+        mapped.flush()
+        del mapped
+        return np.memmap(path, dtype=np.uint64, mode="r", shape=values.shape)
+
+    def close(self):
+        self._spilled = []
+        self._layers = [set()]
+        if self._owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+class TraceTable:
+    """Compact back-pointers for path reconstruction: parent index and move code per node."""
+    def __init__(self, capacity = 1 << 12):
+        self._parents = np.empty(capacity, dtype=np.int64)
+        self._moves = np.empty(capacity, dtype=np.int32)
+        self._count = 0
+
+    def add(self, parent, move_code):
+        if self._count == len(self._parents):
+            self._parents = np.resize(self._parents, 2 * len(self._parents))
+            self._moves = np.resize(self._moves, 2 * len(self._moves))
+
+        self._parents[self._count] = parent
+        self._moves[self._count] = move_code
+        self._count += 1
+        return self._count - 1
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        return self._parents.nbytes + self._moves.nbytes
+
+    def path(self, node):
+        """Move codes from the root to `node`."""
+        codes = []
+        while node >= 0 and self._parents[node] >= 0:
+            codes.append(int(self._moves[node]))
+            node = int(self._parents[node])
+        codes.reverse()
+        return codes
@@ -0,0 +1,103 @@
+import numpy as np
+
+from src.core.state import SokobanState
+
+class BatchExpander:
+    """Generates the pushes of many states at once with NumPy.
+
+    Crate and reach masks of a batch are unpacked into boolean arrays, every
+    (crate, direction) pair is tested in one pass over the neighbor tables, and
+    pushes onto dead squares or into a 2x2 deadlock pattern are dropped before
+    any child state is built. The greedy cost of each child is the parent's plus
+    the change made by the pushed crate, computed for the whole batch at once.
+
+    Freeze and corral checks and the matching bound still run per surviving
+    child: they follow chains of crates or solve an assignment, which does not
+    map onto fixed-shape arrays. `pruned` counts the pushes dropped, by kind; the
+    solver passes its DeadlockDetector's counters.
+    """
+    def __init__(self, level, df, pruned = None):
+        tables = level.tables
+        size = len(level.cells)
+        self.level = level
+        self.size = size
+        self.nbytes = (size + 7) // 8
+
+        # Cell `size` is a sentinel wall, so that missing neighbors can be looked up safely
+        self.near = np.array([[size if i < 0 else i for i in nb] for nb in tables.neighbors], dtype=np.intp)
+        self.ahead = np.array([[size if i < 0 else i for i in nb] for nb in tables.behind], dtype=np.intp)
+        self.open = np.array([not dead for dead in tables.dead] + [False])
+
+        # For every cell, the other three cells of each 2x2 block containing it (see DeadlockDetector)
+        index = level.index
+        self.blocks = np.array([
+            [[index.get(pos, size) for pos in ((bx, by), (bx + 1, by), (bx, by + 1), (bx + 1, by + 1)) if pos != (x, y)]
+             for bx in (x - 1, x) for by in (y - 1, y)]
+            for x, y in level.cells
+        ], dtype=np.intp).reshape(size, 4, 3)
+
+        # Greedy cost of a crate on each cell (see SokobanAlgorithm.greedy_cost)
+        self.target = target = np.array([level.target_mask >> i & 1 for i in range(size)] + [0], dtype=bool)
+        nearest = np.array(list(tables.nearest_manhattan) + [0], dtype=np.int64)
+        self.term = np.where(target, -df, nearest + df)
+        self.pruned = {"dead_square": 0, "pattern": 0} if pruned is None else pruned
+
+    def unpack(self, masks):
+        """Bit masks to a (len(masks), size + 1) boolean array; the sentinel column is False."""
+        data = b"".join(mask.to_bytes(self.nbytes, "little") for mask in masks)
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8).reshape(len(masks), self.nbytes), axis=1, bitorder="little")
+        out = np.zeros((len(masks), self.size + 1), dtype=bool)
+        out[:, :self.size] = bits[:, :self.size]
+        return out
+
+    def expand(self, states):
+        """Yields (child, greedy cost) for every push of `states` that is not a dead square or 2x2 deadlock."""
+        if not states:
+            return
+
+        crates = self.unpack([state.crate_mask for state in states])
+        reach = self.unpack([state.reachable_mask() for state in states])
+        rows, cells = np.nonzero(crates[:, :self.size])
+
+        near = self.near[:, cells]
+        ahead = self.ahead[:, cells]
+        legal = reach[rows, near] & ~crates[rows, ahead]
+        alive = legal & self.open[ahead]
+        self.pruned["dead_square"] += int(np.count_nonzero(legal)) - int(np.count_nonzero(alive))
+        directions, pushes = np.nonzero(alive)
+        if not len(pushes):
+            return
+
+        parents = rows[pushes]
+        moved = cells[pushes]
+        dests = ahead[directions, pushes]
+
+        # 2x2 patterns around the pushed crate: every other cell of a block is a wall or a
+        # crate of the child, and some crate of the block is off target
+        others = self.blocks[dests]
+        crate_others = crates[parents[:, None, None], others] & (others != moved[:, None, None])
+        full = (crate_others | (others == self.size)).all(axis=2)
+        loose = ~self.target[dests][:, None] | (crate_others & ~self.target[others]).any(axis=2)
+        pattern = (full & loose).any(axis=1)
+        if pattern.any():
+            self.pruned["pattern"] += int(np.count_nonzero(pattern))
+            keep = ~pattern
+            parents, moved, dests = parents[keep], moved[keep], dests[keep]
+            directions, pushes = directions[keep], pushes[keep]
+
+        nears = near[directions, pushes]
+        costs = (crates * self.term).sum(axis=1)[parents] - self.term[moved] + self.term[dests]
+
+        level = self.level
+        positions, keys = level.cells, level.crate_keys
+        for p, i, k, j, cost in zip(parents.tolist(), moved.tolist(), nears.tolist(), dests.tolist(), costs.tolist()):
+            parent = states[p]
+            child = SokobanState(
+                level=level,
+                player=positions[i],
+                crate_mask=parent.crate_mask ^ (1 << i) ^ (1 << j),
+                parent=parent,
+                prev_move=(positions[k], positions[i], positions[j]),
+                crate_key=parent.crate_key ^ keys[i] ^ keys[j],
+            )
+            yield child, cost
@@ -4,45 +4,63 @@ os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
 import pygame
 from collections import deque
 
+try:
+    from PIL import Image
+except ImportError:  # Pillow is only needed for animated (GIF/WebP) export
+    Image = None
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "assets", "images")
+
 class SokobanGame:
     __MOVES = ((-1, 0), (1, 0), (0, -1), (0, 1))
     __TILE_SIZE = 64
+    # Tile kind -> image; a player on a target is drawn as the player
+    __IMAGES = {
+        "space": "space.png",
+        "wall": "wall.png",
+        "box": "box.png",
+        "box_on_target": "box_on_target.png",
+        "player": "player.png",
+        "target": "target.png",
+    }
+
     def __init__(self, player, crates, obstacles, targets, bound):
         self.player = player
         self.crates = crates
         self.obstacles = obstacles
         self.targets = targets
         self.bound = bound
-        
+        self._tiles = {}  # tile size -> {kind: pre-scaled surface}
+
     def find_path(self, tpos):
         ppos = self.player
 
         if ppos == tpos:
             return []
-        
-        queue = deque([(ppos, [ppos])])
-        visited = {ppos}
 
-        def is_valid_pos(pos):
-            if pos in self.obstacles or pos in self.crates:
-                return False
-            
-            return True
+        # BFS with parent pointers; the path is rebuilt once the target is reached
+        parents = {ppos: None}
+        queue = deque([ppos])
 
         while queue:
-            cpos, path = queue.popleft()
-            cx, cy = cpos
+            cx, cy = queue.popleft()
 
             for dx, dy in self.__MOVES:
                 next_pos = (cx + dx, cy + dy)
-                if (next_pos not in visited and is_valid_pos(next_pos)):
-                    new_path = path + [next_pos]
-                    if next_pos == tpos:
-                        return new_path[1:]
-                    
-                    visited.add(next_pos)
-                    queue.append((next_pos, new_path))
-        
+                if next_pos in parents or next_pos in self.obstacles or next_pos in self.crates:
+                    continue
+
+                parents[next_pos] = (cx, cy)
+                if next_pos == tpos:
+                    path = []
+                    while next_pos != ppos:
+                        path.append(next_pos)
+                        next_pos = parents[next_pos]
+                    path.reverse()
+                    return path
+
+                queue.append(next_pos)
+
         return []  # No path found
 
     def perform_move(self, pmove, cmove = None):
@@ -51,97 +69,188 @@ class SokobanGame:
             self.crates.remove(pmove)
             self.crates.add(cmove)
 
-    def _get_object_count(self, pos):
-        return int(pos == self.player) + int(pos in self.crates) + int(pos in self.obstacles) + int(pos in self.targets)
-    
-    def _load_image(self, filename):
-        asset_path = os.path.join("assets", "images", filename)
-        return pygame.transform.scale(pygame.image.load(asset_path).convert(), (self.__TILE_SIZE, self.__TILE_SIZE))
+    def steps(self, moves):
+        """Plays `moves` one player step at a time, yielding the cells each step changed.
+
+        Raises ValueError when a push cannot be made: its cell is out of the player's
+        reach, or the crate or the cell behind it is not where the push needs them.
+        """
+        for move in moves:
+            # Move format: (player_pos_before_push, crate_current_pos, crate_new_pos)
+            tppos, nppos, ncpos = move
+            walk = self.find_path(tppos)
+            if self.player != tppos and not walk:
+                raise ValueError(f"push {move}: {tppos} cannot be reached")
+            if (nppos not in self.crates or ncpos in self.crates or ncpos in self.obstacles
+                    or (nppos[0] - tppos[0], nppos[1] - tppos[1]) != (ncpos[0] - nppos[0], ncpos[1] - nppos[1])):
+                raise ValueError(f"push {move} is not legal")
+
+            for mmove in walk:
+                old = self.player
+                self.perform_move(mmove)
+                yield old, mmove
+
+            old = self.player
+            self.perform_move(nppos, ncpos)
+            yield old, nppos, ncpos
+
+    def is_solved(self):
+        return self.crates <= self.targets and len(self.crates) == len(self.targets)
+
+    def _tile_kind(self, pos):
+        if pos in self.obstacles:
+            return "wall"
+        if pos in self.crates:
+            return "box_on_target" if pos in self.targets else "box"
+        if pos == self.player:
+            return "player"
+        if pos in self.targets:
+            return "target"
+        return "space"
+
+    def _load_image(self, filename, tile_size = __TILE_SIZE):
+        image = pygame.image.load(os.path.join(ASSETS_DIR, filename))
+        if pygame.display.get_surface() is not None:
+            image = image.convert()
+        return pygame.transform.scale(image, (tile_size, tile_size))
+
+    def _load_tiles(self, tile_size):
+        # Every tile kind is loaded and scaled once per size, then only blitted
+        tiles = self._tiles.get(tile_size)
+        if tiles is None:
+            tiles = {kind: self._load_image(filename, tile_size) for kind, filename in self.__IMAGES.items()}
+            self._tiles[tile_size] = tiles
+        return tiles
+
+    def _draw(self, surface, tiles, tile_size, cells):
+        """Redraws `cells` on `surface`; returns the rectangles drawn."""
+        rects = []
+        for r, c in cells:
+            rect = pygame.Rect(c * tile_size, r * tile_size, tile_size, tile_size)
+            surface.blit(tiles[self._tile_kind((r, c))], rect)
+            rects.append(rect)
+        return rects
 
-    def rendering(self, moves):
+    def _draw_all(self, surface, tiles, tile_size):
+        maxX, maxY = self.bound
+        surface.fill((0, 0, 0))
+        self._draw(surface, tiles, tile_size, ((r, c) for r in range(maxX) for c in range(maxY)))
+
+    def rendering(self, moves, step_delay = 200):
         pygame.init()
         pygame.display.set_caption("Sokoban Game")
 
-        # Fix bounds: bound is (maxX, maxY)
+        # bound is (maxX, maxY)
         maxX, maxY = self.bound
-        gamew = maxY * self.__TILE_SIZE
-        gameh = maxX * self.__TILE_SIZE
+        tile_size = self.__TILE_SIZE
+        gamew = maxY * tile_size
+        gameh = maxX * tile_size
 
         gameSurface = pygame.Surface((gamew, gameh))
 
         info = pygame.display.Info()
         width, height = info.current_w, info.current_h
         screen = pygame.display.set_mode((width, height))
+        offsetX, offsetY = (width - gamew) // 2, (height - gameh) // 2
 
-        wall_img = self._load_image("wall.png") 
-        box_img = self._load_image("box.png")
-        player_img = self._load_image("player.png")
-        box_on_target_img = self._load_image("box_on_target.png")
-        target_img = self._load_image("target.png")
-        space_img = self._load_image("space.png")
+        tiles = self._load_tiles(tile_size)
+        self._draw_all(gameSurface, tiles, tile_size)
+        screen.fill((0, 0, 0))
+        screen.blit(gameSurface, (offsetX, offsetY))
+        pygame.display.flip()
 
         pygame.time.wait(2000)
 
-        for move in moves:
-            # Fix move format: (player_pos_before_push, crate_current_pos, crate_new_pos)
-            tppos, nppos, ncpos = move
+        for cells in self.steps(moves):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    return
+
+            # Only the tiles of this step are redrawn and sent to the display
+            rects = self._draw(gameSurface, tiles, tile_size, cells)
+            for rect in rects:
+                screen.blit(gameSurface, rect.move(offsetX, offsetY), rect)
+            pygame.display.update([rect.move(offsetX, offsetY) for rect in rects])
+            pygame.time.wait(step_delay)
 
-            # Player needs to move to tppos to push the crate
-            must_move = self.find_path(tppos) + [nppos]
-
-            for mmove in must_move:
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        pygame.quit()
-                        return
-
-                if mmove is not None:
-                    if mmove != nppos:
-                        self.perform_move(mmove)
-                    else:
-                        self.perform_move(mmove, ncpos)
-
-                gameSurface.fill((0,0,0))
-                
-                # Fix coordinate loops: use actual grid bounds
-                for r in range(maxX):
-                    for c in range(maxY):
-                        pos = (r, c)
-                        # Convert grid to screen coordinates
-                        screen_x = c * self.__TILE_SIZE
-                        screen_y = r * self.__TILE_SIZE
-                        game_pos = (screen_x, screen_y)
-
-                        obj_cnt = self._get_object_count(pos)
-
-                        # Draw space case
-                        if obj_cnt == 0:
-                            gameSurface.blit(space_img, game_pos)
-
-                        # Single object case
-                        elif obj_cnt == 1:
-                            if pos in self.obstacles:
-                                gameSurface.blit(wall_img, game_pos)
-                            elif pos in self.crates:
-                                gameSurface.blit(box_img, game_pos)
-                            elif pos == self.player:
-                                gameSurface.blit(player_img, game_pos)
-                            elif pos in self.targets:
-                                gameSurface.blit(target_img, game_pos)
-                        
-                        elif obj_cnt == 2:
-                            if pos in self.crates and pos in self.targets:
-                                gameSurface.blit(box_on_target_img, game_pos)
-                            elif pos == self.player and pos in self.targets:
-                                gameSurface.blit(player_img, game_pos)
-                
-                screen.fill((0,0,0))
-                offsetX, offsetY = (width - gamew) // 2, (height - gameh) // 2
-
-                screen.blit(gameSurface, (offsetX, offsetY))
-
-                pygame.display.flip()
-                pygame.time.wait(200)
-        
         pygame.time.wait(2000)
-        pygame.quit()
\ No newline at end of file
+        pygame.quit()
+
+    def frames(self, moves, tile_size = __TILE_SIZE, frame_every = 1):
+        """Replays `moves` off screen, yielding the board surface every `frame_every` steps.
+
+        The first and last boards are always yielded. The same surface is updated in
+        place, so copy it to keep a frame. Needs no display: the SDL dummy video driver is
+        used when none is open.
+        """
+        if not pygame.display.get_init():
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            pygame.display.init()
+
+        maxX, maxY = self.bound
+        surface = pygame.Surface((maxY * tile_size, maxX * tile_size))
+        tiles = self._load_tiles(tile_size)
+        self._draw_all(surface, tiles, tile_size)
+        yield surface
+
+        step = 0
+        for cells in self.steps(moves):
+            self._draw(surface, tiles, tile_size, cells)
+            step += 1
+            if step % frame_every == 0:
+                yield surface
+        if step % frame_every:
+            yield surface
+
+    def _palette(self, tile_size):
+        # One GIF palette for every frame, taken from a strip holding each tile once
+        tiles = list(self._load_tiles(tile_size).values())
+        strip = pygame.Surface((tile_size * len(tiles), tile_size))
+        for i, tile in enumerate(tiles):
+            strip.blit(tile, (i * tile_size, 0))
+        return Image.frombytes("RGB", strip.get_size(), pygame.image.tobytes(strip, "RGB")).quantize(colors=255)
+
+    def export(self, moves, output, tile_size = __TILE_SIZE, frame_every = 1, frame_ms = 100):
+        """Renders `moves` without a display; returns the number of frames written.
+
+        `output` ending in .gif or .webp gets an animation (needs Pillow), .png gets the
+        final board, and anything else is a directory of numbered PNG frames. The game is
+        left in its initial position.
+        """
+        ext = os.path.splitext(output)[1].lower()
+        if ext in (".gif", ".webp") and Image is None:
+            raise ImportError("animated export needs Pillow (pip install pillow)")
+
+        player, crates = self.player, set(self.crates)
+        count = 0
+        images = []
+        try:
+            if ext not in (".gif", ".webp", ".png"):
+                os.makedirs(output, exist_ok=True)
+            if ext == ".gif":
+                palette = self._palette(tile_size)
+
+            for surface in self.frames(moves, tile_size, frame_every):
+                if ext in (".gif", ".webp"):
+                    image = Image.frombytes("RGB", surface.get_size(), pygame.image.tobytes(surface, "RGB"))
+                    if ext == ".gif":
+                        image = image.quantize(palette=palette, dither=Image.Dither.NONE)
+                    images.append(image)
+                elif ext == ".png":
+                    last = surface
+                else:
+                    pygame.image.save(surface, os.path.join(output, f"frame_{count:05d}.png"))
+                count += 1
+
+            if images:
+                # Frames share one palette, so Pillow has nothing left to optimize
+                images[0].save(output, save_all=True, append_images=images[1:], duration=frame_ms, loop=0, optimize=False)
+            elif ext == ".png":
+                pygame.image.save(last, output)
+                count = 1
+        finally:
+            self.player = player
+            self.crates.clear()
+            self.crates.update(crates)
+        return count
@@ -0,0 +1,102 @@
+import hashlib
+import random
+from collections import deque
+
+from src.core.tables import LevelTables
+
+def iter_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def popcount(mask):
+    return bin(mask).count("1")
+
+class Level:
+    """Static part of a level (walls, targets, cell numbering), shared by every state."""
+    __MOVES = ((-1, 0), (1, 0), (0, -1), (0, 1))
+    __ZOBRIST_SEED = 0x50C0BA9
+    __slots__ = ("obstacles", "targets", "bound", "cells", "index", "target_mask", "crate_keys", "player_keys", "key", "_tables")
+
+    def __init__(self, obstacles, targets, bound, player):
+        self.obstacles = frozenset(obstacles)
+        self.targets = frozenset(targets)
+        self.bound = bound
+
+        # Dense row-major numbering of the non-wall interior reachable from the player
+        maxX, maxY = bound
+        interior = {player}
+        queue = deque([player])
+        while queue:
+            cx, cy = queue.popleft()
+            for dx, dy in self.__MOVES:
+                next_pos = (cx + dx, cy + dy)
+                if (next_pos not in interior and next_pos not in self.obstacles
+                        and 0 <= next_pos[0] < maxX and 0 <= next_pos[1] < maxY):
+                    interior.add(next_pos)
+                    queue.append(next_pos)
+
+        self.cells = tuple(sorted(interior))
+        self.index = {pos: i for i, pos in enumerate(self.cells)}
+        self.target_mask = self.mask_of(self.targets)
+
+        # Fixed seed so that hashes agree between processes and runs
+        rng = random.Random(self.__ZOBRIST_SEED)
+        self.crate_keys = tuple(rng.getrandbits(64) for _ in self.cells)
+        self.player_keys = tuple(rng.getrandbits(64) for _ in self.cells)
+
+        # Digest of the static layout, used to match serialized tables to the level
+        layout = repr((self.bound, self.cells, sorted(self.targets)))
+        self.key = hashlib.sha1(layout.encode("utf-8")).hexdigest()
+        self._tables = None
+
+    @property
+    def tables(self):
+        if self._tables is None:
+            self._tables = LevelTables(self)
+        return self._tables
+
+    @tables.setter
+    def tables(self, tables: "LevelTables"):
+        if tables.key != self.key:
+            raise ValueError("tables were built for a different level")
+        self._tables = tables
+
+    def fixing(self, fixed, target_mask):
+        """This level with the crates of mask `fixed` immovable and the targets of `target_mask`.
+
+        The cell numbering and Zobrist keys are shared, so that masks and moves carry over
+        between the two levels, and the tables are derived from this level's rather than
+        built again (see `LevelTables.fixing`).
+        """
+        level = Level.__new__(Level)
+        level.obstacles = self.obstacles
+        level.targets = self.positions(target_mask)
+        level.bound = self.bound
+        level.cells, level.index = self.cells, self.index
+        level.target_mask = target_mask
+        level.crate_keys, level.player_keys = self.crate_keys, self.player_keys
+        level.key = hashlib.sha1(repr((self.key, fixed, target_mask)).encode("utf-8")).hexdigest()
+        level._tables = self.tables.fixing(level, fixed)
+        return level
+
+    def __len__(self):
+        return len(self.cells)
+
+    def mask_of(self, positions):
+        mask = 0
+        for pos in positions:
+            mask |= 1 << self.index[pos]
+        return mask
+
+    def positions(self, mask):
+        cells = self.cells
+        return frozenset(cells[i] for i in iter_bits(mask))
+
+    def crate_hash(self, mask):
+        keys = self.crate_keys
+        key = 0
+        for i in iter_bits(mask):
+            key ^= keys[i]
+        return key
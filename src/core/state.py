@@ -1,78 +1,203 @@
-from collections import deque
+from src.core.level import Level, iter_bits
+
+class MacroMove(tuple):
+    """Several pushes of one crate taken as a single search step.
+
+    Unpacks like a push, as (player, crate, final_crate); `steps` holds the primitive pushes.
+    """
+    def __new__(cls, steps):
+        steps = tuple(steps)
+        move = super().__new__(cls, (steps[0][0], steps[0][1], steps[-1][2]))
+        move.steps = steps
+        return move
+
+    def __getnewargs__(self):
+        return (self.steps,)
 
 class SokobanState:
-    __MOVES = ((-1, 0), (1, 0), (0, -1), (0, 1))
+    __slots__ = ("level", "player", "crate_mask", "crate_key", "parent", "prev_move", "_reach")
 
-    def __init__(self, player, crates, obstacles, targets, bound, parent: "SokobanState" = None, prev_move = None):
+    def __init__(self, level: "Level", player, crate_mask, parent: "SokobanState" = None, prev_move = None, crate_key = None):
         self.parent = parent
         self.prev_move = prev_move
-        
+
+        self.level = level
         self.player = player
-        self.crates = crates
-        self.obstacles = obstacles
-        self.targets = targets
-        self.bound = bound
+        self.crate_mask = crate_mask
+        # Zobrist key of the crate placement, updated incrementally by _get_next_state
+        self.crate_key = level.crate_hash(crate_mask) if crate_key is None else crate_key
+        self._reach = None
+
+    @property
+    def crates(self):
+        return self.level.positions(self.crate_mask)
+
+    @property
+    def obstacles(self):
+        return self.level.obstacles
+
+    @property
+    def targets(self):
+        return self.level.targets
+
+    @property
+    def bound(self):
+        return self.level.bound
 
     def __eq__(self, value):
+        # States are equal when the crates match and the player is in the same region
         if type(value) is SokobanState:
-            return self.player == value.player and self.crates == value.crates and self.obstacles == value.obstacles and self.targets == value.targets
-        else:
-            return self == value
-        
+            return self.crate_mask == value.crate_mask and self.level is value.level and self.normalized_player() == value.normalized_player()
+        return NotImplemented
+
     def __hash__(self):
-        return hash((self.player, frozenset(self.crates), frozenset(self.obstacles), frozenset(self.targets)))
-    
+        return self.fingerprint()
+
+    def fingerprint(self):
+        # 64-bit Zobrist key of the canonical state
+        return self.crate_key ^ self.level.player_keys[self.normalized_player()]
+
+    def canonical_key(self):
+        return self.crate_mask, self.normalized_player()
+
+    def normalized_player(self):
+        # Region id: the top-left reachable cell, the index numbering being row-major
+        reach = self.reachable_mask()
+        return (reach & -reach).bit_length() - 1
+
     def is_deadlock(self):
         return False
-    
+
+    def reachable_mask(self):
+        if self._reach is not None:
+            return self._reach
+
+        parent = self.parent
+        if parent is not None and parent._reach is not None and type(self.prev_move) is not MacroMove:
+            reach = self._repair_reach(parent._reach)
+        else:
+            reach = self._flood(self.level.index[self.player], 0)
+
+        self._reach = reach
+        return reach
+
+    def _flood(self, start, reach):
+        # Extends `reach` with every free cell connected to `start`
+        adjacent = self.level.tables.adjacent
+        reach |= 1 << start
+        blocked = self.crate_mask | reach
+        stack = [start]
+
+        while stack:
+            for next_cell in adjacent[stack.pop()]:
+                if not blocked >> next_cell & 1:
+                    blocked |= 1 << next_cell
+                    reach |= 1 << next_cell
+                    stack.append(next_cell)
+
+        return reach
+
+    def _repair_reach(self, parent_reach):
+        # Only two cells changed since the parent: the crate left `old`, where the player now
+        # stands, and took `new`. Freeing `old` can only merge areas into the parent's region.
+        # Taking `new` can cut parts off it, unless the cells around `new` still connect its
+        # neighbors; otherwise each neighbor is searched until it meets the player.
+        index = self.level.index
+        _, old_crate_pos, new_crate_pos = self.prev_move
+        old_i, new_i = index[old_crate_pos], index[new_crate_pos]
+
+        reach = parent_reach
+        if reach >> new_i & 1:
+            reach &= ~(1 << new_i)
+            if not self._ring_connected(new_i):
+                # Drop the parts of the region that `new` was the only way into
+                for cell in self.level.tables.adjacent[new_i]:
+                    if cell != old_i and reach >> cell & 1:
+                        reach &= ~self._sealed_part(cell, old_i, reach)
+
+        return self._flood(old_i, reach)
+
+    def _sealed_part(self, start, player, reach):
+        # Cells of `reach` connected to `start`, or 0 as soon as the search meets the player
+        adjacent = self.level.tables.adjacent
+        part = 1 << start
+        queue = [start]
+        for cell in queue:
+            for next_cell in adjacent[cell]:
+                if next_cell == player:
+                    return 0
+                if reach >> next_cell & 1 and not part >> next_cell & 1:
+                    part |= 1 << next_cell
+                    queue.append(next_cell)
+        return part
+
+    def _ring_connected(self, cell):
+        # True if the free direct neighbors of `cell` all lie on one run of free cells
+        # of the 8 around it, i.e. they stay connected without going through `cell`
+        tables = self.level.tables
+        key = (cell, self.crate_mask & tables.ring_mask[cell])
+        connected = tables.ring_connected.get(key)
+        if connected is None:
+            connected = tables.ring_connected[key] = self._ring_runs(tables.ring[cell], key[1]) <= 1
+        return connected
+
+    @staticmethod
+    def _ring_runs(ring, crate_mask):
+        free = [c >= 0 and not crate_mask >> c & 1 for c in ring]
+        if all(free):
+            return 1
+
+        start = free.index(False)
+        runs = 0
+        direct = False
+        for step in range(1, 9):
+            k = (start + step) & 7
+            if free[k]:
+                direct = direct or not k & 1
+            elif direct:
+                runs += 1
+                direct = False
+        return runs
+
     def get_reachable(self):
-        visited = set()
-        queue = deque([self.player])
-        visited.add(self.player)  # Mark the starting position as visited
-        
-        while queue:
-            cx, cy = queue.popleft()
-            for dx, dy in self.__MOVES:
-                next_pos = (cx + dx, cy + dy)
-                if next_pos not in visited and next_pos not in self.obstacles and next_pos not in self.crates:
-                    queue.append(next_pos)
-                    visited.add(next_pos)
-        
-        return frozenset(visited)
+        return self.level.positions(self.reachable_mask())
 
     def get_all_moves(self):
         moves = []
-        reachable = self.get_reachable()
-        for crate_pos in self.crates:
-            cx, cy = crate_pos
-            for dx, dy in self.__MOVES:
-                near_pos = (cx + dx, cy + dy)
-                if near_pos in reachable:
-                    ncpos = (cx - dx, cy - dy)
-                    if ncpos not in self.obstacles and ncpos not in self.crates:
-                        moves.append((near_pos, crate_pos, ncpos))
-        
+        cells = self.level.cells
+        tables = self.level.tables
+        crate_mask = self.crate_mask
+        reachable = self.reachable_mask()
+        for i in iter_bits(crate_mask):
+            for near, ahead in zip(tables.neighbors, tables.behind):
+                k = near[i]
+                j = ahead[i]
+                if k >= 0 and j >= 0 and reachable >> k & 1 and not crate_mask >> j & 1:
+                    moves.append((cells[k], cells[i], cells[j]))
+
         return moves
 
     def _get_next_state(self, move):
         _, old_crate_pos, new_crate_pos = move
-        
-        # Create new crate set efficiently
-        new_crates = frozenset((self.crates - {old_crate_pos}) | {new_crate_pos})
-        
+        level = self.level
+        old_i = level.index[old_crate_pos]
+        new_i = level.index[new_crate_pos]
+
+        # After a macro the player stands where the crate was before its last push
+        player = move.steps[-1][1] if type(move) is MacroMove else old_crate_pos
+
         return SokobanState(
-            player=old_crate_pos,
-            crates=new_crates,
-            obstacles=self.obstacles,
-            targets=self.targets,    
+            level=level,
+            player=player,
+            crate_mask=self.crate_mask ^ (1 << old_i) ^ (1 << new_i),
             parent=self,
             prev_move=move,
-            bound=self.bound
+            crate_key=self.crate_key ^ level.crate_keys[old_i] ^ level.crate_keys[new_i]
         )
-    
+
     def get_all_next_states(self):
         moves = self.get_all_moves()
         return [self._get_next_state(move) for move in moves]
 
     def is_solved(self):
-        return self.crates == self.targets
\ No newline at end of file
+        return self.crate_mask == self.level.target_mask
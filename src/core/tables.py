@@ -0,0 +1,180 @@
+import copy
+import os
+import pickle
+from collections import deque
+
+TABLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "utils", "levels", "tables")
+
+class LevelTables:
+    """One-time precomputation over the static level, shared read-only by every state.
+
+    Cells use the dense numbering of `Level.cells`. Directions follow `DIRECTIONS`
+    and `OPPOSITE[d]` is the reverse of direction `d`; a missing neighbor is -1.
+    """
+    DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+    OPPOSITE = (1, 0, 3, 2)
+    # The 8 cells around a cell in cyclic order, so that consecutive cells are adjacent;
+    # even positions are the 4 direct neighbors
+    RING = ((-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1))
+    UNREACHABLE = 1 << 16
+    __VERSION = 1
+
+    def __init__(self, level, data = None):
+        self.key = level.key
+        self.size = len(level.cells)
+
+        if data is None:
+            data = self._build(level)
+
+        self.neighbors = data["neighbors"]
+        self.behind = tuple(self.neighbors[d] for d in self.OPPOSITE)
+        self.adjacent = tuple(tuple(n for n in (nb[i] for nb in self.neighbors) if n >= 0) for i in range(self.size))
+        self.ring = tuple(tuple(level.index.get((x + dx, y + dy), -1) for dx, dy in self.RING) for x, y in level.cells)
+        self.ring_mask = tuple(sum(1 << c for c in ring if c >= 0) for ring in self.ring)
+        self.ring_connected = {}  # (cell, crates around it) -> bool, filled by SokobanState
+        self.dead = data["dead"]
+        self.dead_mask = sum(1 << i for i, is_dead in enumerate(self.dead) if is_dead)
+        self.push_distance = data["push_distance"]
+        self.target_distance = data["target_distance"]
+        self.nearest_manhattan = data["nearest_manhattan"]
+
+    def _build(self, level):
+        cells, index, size = level.cells, level.index, len(level.cells)
+        targets = [index[t] for t in level.targets]
+
+        neighbors = tuple(
+            [index.get((x + dx, y + dy), -1) for x, y in cells]
+            for dx, dy in self.DIRECTIONS
+        )
+
+        dead = self._dead(neighbors, targets, size)
+
+        # Pushes needed to move a lone crate from a to b, the player standing behind it
+        push_distance = [self.UNREACHABLE] * (size * size)
+        for src in range(size):
+            row = src * size
+            push_distance[row + src] = 0
+            queue = deque([src])
+            while queue:
+                cur = queue.popleft()
+                dist = push_distance[row + cur] + 1
+                for d, nb in enumerate(neighbors):
+                    dest = nb[cur]
+                    if dest < 0 or push_distance[row + dest] <= dist:
+                        continue
+                    if neighbors[self.OPPOSITE[d]][cur] >= 0:
+                        push_distance[row + dest] = dist
+                        queue.append(dest)
+
+        target_distance = [
+            min((push_distance[i * size + t] for t in targets), default=self.UNREACHABLE)
+            for i in range(size)
+        ]
+        nearest_manhattan = [
+            min((abs(x - tx) + abs(y - ty) for tx, ty in level.targets), default=0)
+            for x, y in cells
+        ]
+
+        return {
+            "neighbors": neighbors,
+            "dead": dead,
+            "push_distance": push_distance,
+            "target_distance": target_distance,
+            "nearest_manhattan": nearest_manhattan,
+        }
+
+    @staticmethod
+    def _dead(neighbors, targets, size):
+        # Backward "pull" reachability from the targets: anything else is a dead square
+        box_reachable = set(targets)
+        queue = deque(targets)
+        while queue:
+            cur = queue.popleft()
+            for nb in neighbors:
+                prev_crate = nb[cur]
+                if prev_crate < 0 or prev_crate in box_reachable:
+                    continue
+                if nb[prev_crate] >= 0:
+                    box_reachable.add(prev_crate)
+                    queue.append(prev_crate)
+
+        return [i not in box_reachable for i in range(size)]
+
+    def fixing(self, level, fixed):
+        """Tables for `level`, this level with the crates of mask `fixed` made immovable.
+
+        Fixed cells are cut out of the cell graph, so that no push moves their crates or
+        ends on them; the cell numbering is unchanged. Push distances and the rings are
+        shared: distances ignore the fixed crates, and so stay lower bounds, and rings see
+        them as the crates they remain. Dead squares and target distances are rebuilt for
+        the other targets of `level`.
+        """
+        size = self.size
+        neighbors = tuple(
+            [-1 if fixed >> i & 1 or n >= 0 and fixed >> n & 1 else n for i, n in enumerate(nb)]
+            for nb in self.neighbors
+        )
+        targets = [i for i in (level.index[t] for t in level.targets) if not fixed >> i & 1]
+        push_distance = self.push_distance
+
+        tables = copy.copy(self)
+        tables.key = level.key
+        tables.neighbors = neighbors
+        tables.behind = tuple(neighbors[d] for d in self.OPPOSITE)
+        tables.adjacent = tuple(tuple(n for n in (nb[i] for nb in neighbors) if n >= 0) for i in range(size))
+        # Fixed cells stay live: their crates already sit on targets of `level`
+        tables.dead = self._dead(neighbors, targets + [i for i in range(size) if fixed >> i & 1], size)
+        tables.dead_mask = sum(1 << i for i, is_dead in enumerate(tables.dead) if is_dead)
+        tables.target_distance = [min((push_distance[i * size + t] for t in targets), default=self.UNREACHABLE) for i in range(size)]
+        tables.nearest_manhattan = [
+            min((abs(x - level.cells[t][0]) + abs(y - level.cells[t][1]) for t in targets), default=0)
+            for x, y in level.cells
+        ]
+        return tables
+
+    def distance(self, src, dest):
+        return self.push_distance[src * self.size + dest]
+
+    def save(self, filepath):
+        data = {
+            "version": self.__VERSION,
+            "key": self.key,
+            "neighbors": self.neighbors,
+            "dead": self.dead,
+            "push_distance": self.push_distance,
+            "target_distance": self.target_distance,
+            "nearest_manhattan": self.nearest_manhattan,
+        }
+        # Written aside and renamed, so that a reader never sees half a file
+        directory = os.path.dirname(filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{filepath}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, filepath)
+
+    @classmethod
+    def load(cls, level, filepath):
+        with open(filepath, "rb") as f:
+            data = pickle.load(f)
+
+        if data.get("version") != cls.__VERSION or data.get("key") != level.key:
+            raise ValueError(f"tables in {filepath} do not match this level")
+
+        return cls(level, data)
+
+    @staticmethod
+    def path(level, directory = TABLES_DIR):
+        return os.path.join(directory, f"{level.key}.pkl")
+
+    @classmethod
+    def cached(cls, level, directory = TABLES_DIR):
+        """Tables of `level` from `directory`, built and saved there when missing or stale."""
+        filepath = cls.path(level, directory)
+        try:
+            return cls.load(level, filepath)
+        except (OSError, EOFError, KeyError, ValueError, pickle.UnpicklingError):
+            tables = cls(level)
+            tables.save(filepath)
+            return tables
@@ -1,14 +1,15 @@
-import json
 import random
+from src.core.level import Level
 from src.core.state import SokobanState
 from src.core.game import SokobanGame
+from src.utils.level_store import LevelStore, WALL, TARGET, CRATE, PLAYER
 
 game_sets = ["microCosmos", "miniCosmos"]
 
 class Generator:
-    def __init__(self, game_set = None, game_level = None):
-        with open("src/utils/levels/game.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
+    def __init__(self, game_set = None, game_level = None, store: "LevelStore" = None):
+        # Levels come from the memory-mapped index of game.json unless another store is given
+        store = store or LevelStore.default()
 
         if not game_set:
             game_set = random.choice(game_sets)  
@@ -16,9 +17,7 @@ class Generator:
 
         self.game_set = game_set
 
-        _game_set = data.get(game_set, None)
-        
-        if not _game_set:
+        if game_set not in store.sets():
             raise Exception("Level set not found")
         else:
             if not game_level:
@@ -29,11 +28,11 @@ class Generator:
                 game_level = random_level()
                 print(f"Randomly selected game level: {game_level}")
 
-            level_str = _game_set.get(game_level, None)
+            stored = store.get(game_set, game_level)
 
             self.game_level = game_level
 
-            if not level_str:
+            if not stored:
                 raise Exception("Level not found")
             else:
                 self.player = None
@@ -41,37 +40,27 @@ class Generator:
                 self.obstacles = set()
                 self.targets = set()
 
-                lines = level_str.splitlines()
-
-                maxX = len(lines)
-                maxY = 0
-
-                for r, line in enumerate(lines):
-                    maxY = max(maxY, len(line))
-                    for c, ch in enumerate(line):
-                        pos = (r,c)
-                        if ch == '#':
+                cols = stored.cols
+                for i, cell in enumerate(stored.grid):
+                    if cell:
+                        pos = divmod(i, cols)
+                        if cell & WALL:
                             self.obstacles.add(pos)
-                        if ch == '$':
+                        if cell & CRATE:
                             self.crates.add(pos)
-                        if ch == '.':
+                        if cell & TARGET:
                             self.targets.add(pos)
-                        if ch == '@':
-                            self.player = pos
-                        if ch == '+':
+                        if cell & PLAYER:
                             self.player = pos
-                            self.targets.add(pos)    
-                        if ch == '*':
-                            self.crates.add(pos)
-                            self.targets.add(pos)
                 
-                self.bound = maxX, maxY
+                self.bound = stored.bound
     
     def gen_state(self):
-        return SokobanState(self.player, frozenset(self.crates), frozenset(self.obstacles), frozenset(self.targets), self.bound)
+        level = Level(self.obstacles, self.targets, self.bound, self.player)
+        return SokobanState(level, self.player, level.mask_of(self.crates))
     
     def gen_game(self):
         return SokobanGame(self.player, self.crates, self.obstacles, self.targets, self.bound)
     
     def get_info(self):
-        return self.game_set, self.game_level
\ No newline at end of file
+        return self.game_set, self.game_level
@@ -0,0 +1,241 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+
+LEVELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels")
+GAME_JSON = os.path.join(LEVELS_DIR, "game.json")
+GAME_INDEX = os.path.join(LEVELS_DIR, "game.idx")
+
+# Cell flags of the stored grids; 0 is floor (or outside a short row)
+WALL, TARGET, CRATE, PLAYER = 1, 2, 4, 8
+
+CELL_FLAGS = {
+    "#": WALL, " ": 0, "-": 0, "_": 0,
+    ".": TARGET, "$": CRATE, "b": CRATE, "*": CRATE | TARGET, "B": CRATE | TARGET,
+    "@": PLAYER, "p": PLAYER, "+": PLAYER | TARGET, "P": PLAYER | TARGET,
+}
+
+_BOARD_LINE = re.compile(r"[#@+$*.\-_pPbB |0-9]*#[#@+$*.\-_pPbB |0-9]*")
+_RUN = re.compile(r"(\d+)(.)")
+
+def parse_xsb(lines):
+    """Levels of an XSB / .sok stream, as lists of rows, one level at a time.
+
+    Boards are runs of lines made only of board characters; titles, comments and other
+    text between them are skipped. Run-length encoded rows ("4#") and "|" row
+    separators are expanded.
+    """
+    rows = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line.strip() and _BOARD_LINE.fullmatch(line):
+            line = _RUN.sub(lambda m: m.group(2) * int(m.group(1)), line)
+            rows.extend(line.split("|"))
+        elif rows:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+def read_levels(path, game_set = None):
+    """Yields (game_set, game_level, rows) from a game.json file or an XSB / .sok file.
+
+    Levels of an XSB file are named level_01, level_02... in file order, in the set named
+    after the file unless `game_set` is given. XSB files are read line by line.
+    """
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for set_name, levels in data.items():
+            if game_set and set_name != game_set:
+                continue
+            for level_name, level_str in levels.items():
+                yield set_name, level_name, level_str.splitlines()
+    else:
+        set_name = game_set or os.path.splitext(os.path.basename(path))[0]
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for n, rows in enumerate(parse_xsb(f), 1):
+                yield set_name, f"level_{n:02d}", rows
+
+def encode_grid(rows):
+    """Rows of board characters to (rows, cols, one flag byte per cell, row-major)."""
+    cols = max((len(row) for row in rows), default=0)
+    grid = bytearray(len(rows) * cols)
+    for r, row in enumerate(rows):
+        base = r * cols
+        for c, ch in enumerate(row):
+            grid[base + c] = CELL_FLAGS.get(ch, 0)
+    return len(rows), cols, bytes(grid)
+
+def _name_hash(game_set, game_level):
+    name = f"{game_set}\0{game_level}".encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(name, digest_size=8).digest(), "little")
+
+class StoredLevel:
+    """One level of a `LevelStore`: its size and a flag byte per cell."""
+    __slots__ = ("game_set", "game_level", "rows", "cols", "grid")
+
+    def __init__(self, game_set, game_level, rows, cols, grid):
+        self.game_set = game_set
+        self.game_level = game_level
+        self.rows = rows
+        self.cols = cols
+        self.grid = grid
+
+    @property
+    def bound(self):
+        return self.rows, self.cols
+
+    def positions(self, flag):
+        cols = self.cols
+        return {divmod(i, cols) for i, cell in enumerate(self.grid) if cell & flag}
+
+class LevelStore:
+    """Read-only level index, memory-mapped and looked up by (set, level) in O(1).
+
+    File layout, little endian:
+    - header: magic, version, level count, table offset, table slots, sets offset;
+    - records: name length, rows, cols, "set\\0level" and one flag byte per cell;
+    - hash table: (name hash, record offset) slots, open addressing, 0 = empty;
+    - sets: JSON {set: level count}.
+
+    `compile` writes the records as the sources are read, so only 16 bytes per level are
+    kept in memory however large the collection.
+    """
+    MAGIC = b"SOKIDX\0\0"
+    __VERSION = 1
+    __HEADER = struct.Struct("<8sIIQQQ")
+    __RECORD = struct.Struct("<HHH")
+    __SLOT = struct.Struct("<QQ")
+
+    _default = None
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, table, slots, sets = self.__HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC or version != self.__VERSION:
+            self._map.close()
+            raise ValueError(f"{path}: not a level index of version {self.__VERSION}")
+        self.count = count
+        self._table = table
+        self._slots = slots
+        self._sets = json.loads(self._map[sets:].decode("utf-8"))
+
+    @classmethod
+    def compile(cls, sources, path):
+        """Builds an index at `path` from game.json / XSB files, or (game_set, file) pairs."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        offsets = {}
+        sets = {}
+        with open(tmp, "wb") as f:
+            f.write(bytes(cls.__HEADER.size))
+            for source in sources:
+                game_set, source = source if isinstance(source, tuple) else (None, source)
+                for set_name, level_name, rows in read_levels(source, game_set):
+                    rows, cols, grid = encode_grid(rows)
+                    name = f"{set_name}\0{level_name}".encode("utf-8")
+                    key = _name_hash(set_name, level_name)
+                    if key not in offsets:
+                        sets[set_name] = sets.get(set_name, 0) + 1
+                    offsets[key] = f.tell()
+                    f.write(cls.__RECORD.pack(len(name), rows, cols) + name + grid)
+
+            slots = 2
+            while slots < 2 * len(offsets):
+                slots *= 2
+            table = bytearray(slots * cls.__SLOT.size)
+            for key, offset in offsets.items():
+                slot = key & (slots - 1)
+                while cls.__SLOT.unpack_from(table, slot * cls.__SLOT.size)[1]:
+                    slot = (slot + 1) & (slots - 1)
+                cls.__SLOT.pack_into(table, slot * cls.__SLOT.size, key, offset)
+
+            table_offset = f.tell()
+            f.write(table)
+            sets_offset = f.tell()
+            f.write(json.dumps(sets).encode("utf-8"))
+            f.seek(0)
+            f.write(cls.__HEADER.pack(cls.MAGIC, cls.__VERSION, len(offsets), table_offset, slots, sets_offset))
+
+        # Atomic, so that concurrent builders and readers never see a partial file
+        os.replace(tmp, path)
+        return cls(path)
+
+    @classmethod
+    def default(cls):
+        """The index of game.json, rebuilt when game.json is newer; opened once per process."""
+        if cls._default is None:
+            if not os.path.exists(GAME_INDEX) or os.path.getmtime(GAME_INDEX) < os.path.getmtime(GAME_JSON):
+                cls._default = cls.compile([GAME_JSON], GAME_INDEX)
+            else:
+                try:
+                    cls._default = cls(GAME_INDEX)
+                except ValueError:
+                    cls._default = cls.compile([GAME_JSON], GAME_INDEX)
+        return cls._default
+
+    def close(self):
+        self._map.close()
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, key):
+        return self.get(*key) is not None
+
+    def sets(self):
+        return dict(self._sets)
+
+    def get(self, game_set, game_level):
+        """The stored level, or None."""
+        key = _name_hash(game_set, game_level)
+        mask = self._slots - 1
+        slot = key & mask
+        while True:
+            stored, offset = self.__SLOT.unpack_from(self._map, self._table + slot * self.__SLOT.size)
+            if not offset:
+                return None
+            if stored == key:
+                level, _ = self._read(offset)
+                if level.game_set == game_set and level.game_level == game_level:
+                    return level
+            slot = (slot + 1) & mask
+
+    def levels(self, game_set = None):
+        """Every stored level (of one set, if given), in file order."""
+        offset = self.__HEADER.size
+        while offset < self._table:
+            level, offset = self._read(offset)
+            if game_set is None or level.game_set == game_set:
+                yield level
+
+    def _read(self, offset):
+        name_len, rows, cols = self.__RECORD.unpack_from(self._map, offset)
+        start = offset + self.__RECORD.size
+        game_set, game_level = self._map[start:start + name_len].decode("utf-8").split("\0")
+        start += name_len
+        end = start + rows * cols
+        return StoredLevel(game_set, game_level, rows, cols, self._map[start:end]), end
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Compile level files into a memory-mapped level index.")
+    parser.add_argument("sources", nargs="*", default=[GAME_JSON],
+                        help="game.json or XSB/.sok files; SET=FILE names the set of an XSB file")
+    parser.add_argument("--output", default=GAME_INDEX)
+    args = parser.parse_args(argv)
+
+    sources = [tuple(source.split("=", 1)) if "=" in source else source for source in args.sources]
+    store = LevelStore.compile(sources, args.output)
+    for game_set, count in store.sets().items():
+        print(f"{game_set}: {count} levels")
+    print(f"{len(store)} levels written to {args.output}")
+
+if __name__ == "__main__":
+    main()
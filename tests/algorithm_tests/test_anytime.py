@@ -0,0 +1,124 @@
+from src.utils.generator import Generator
+from src.algorithm.solver import SokobanAlgorithm
+from src.algorithm.anytime import AnytimeSearch
+from tests.utils.move_cache import Cache
+from tests.utils.timeout import timeout, TimeoutError
+from tests.utils.validate import check_solution
+
+import sys
+import time
+
+DEADLINE_MS = 5000
+SLACK = 0.5  # seconds the search may overrun its deadline (clock checks, path building)
+# Levels that need a solution by the deadline, by first search (None: the whole set). The
+# greedy search must solve these picoCosmos levels, whose crates start on targets; on one
+# CPU its first solution takes about 0.5 s (01), 1.5 s (03) and 2.5 to 3.5 s (04).
+REQUIRED = {
+    None: {"miniCosmos": None, "microCosmos": None, "naboCosmos": None, "picoCosmos": ("level_01", "level_03", "level_04")},
+    10: {"miniCosmos": None, "microCosmos": None},
+}
+
+@timeout(120)
+def test(game_set, game_level, beam_width = None):
+    try:
+        cache = Cache()
+        generator = Generator(game_set, game_level)
+        state = generator.gen_state()
+        solver = SokobanAlgorithm(state)
+
+        stime = time.time()
+        search = AnytimeSearch(solver, deadline_ms=DEADLINE_MS, beam_width=beam_width)
+        search.run()
+        moves = search.moves()
+        etime = time.time() - stime
+
+        if etime > DEADLINE_MS / 1000 + SLACK:
+            raise Exception(f"ran {etime:.2f}s past a {DEADLINE_MS} ms deadline")
+        required = REQUIRED[beam_width].get(game_set, ())
+        if not moves and (required is None or game_level in required):
+            raise Exception(f"no solution within {DEADLINE_MS} ms")
+        if moves:
+            check_solution(game_set, game_level, moves)
+            if len(moves) != search.pushes or search.lower_bound > len(moves):
+                raise Exception(f"{len(moves)} pushes for a best of {search.pushes} and a bound of {search.lower_bound}")
+            if [pushes for _, pushes in search.solutions] != sorted({pushes for _, pushes in search.solutions}, reverse=True):
+                raise Exception(f"solutions do not improve: {search.solutions}")
+            solver.lower_bound = search.lower_bound
+            cache.remember(solver, "anytime", moves)
+
+        return etime, search
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level} (beam_width={beam_width}): {e}")
+
+@timeout(120)
+def test_deadline(game_set, game_level, beam_width):
+    # The deadline falls on the first expansion of the repair phase: the bound left must
+    # still be proven, at most the optimum
+    try:
+        generator = Generator(game_set, game_level)
+        search = AnytimeSearch(SokobanAlgorithm(generator.gen_state()), deadline_ms=60000, beam_width=beam_width)
+        search.CHECK_EVERY = 1
+        repairing = search._repairing
+
+        def expiring(*args):
+            search._deadline = 0
+            repairing(*args)
+
+        search._repairing = expiring
+        search.run()
+
+        _, optimal = SokobanAlgorithm(generator.gen_state()).bidirectional_bfs()
+        if search.lower_bound > len(optimal) or (search.optimal and search.pushes != len(optimal)):
+            raise Exception(f"bound {search.lower_bound} and {search.pushes} pushes for an optimum of {len(optimal)}")
+        return search.lower_bound, len(optimal)
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level} (deadline, beam_width={beam_width}): {e}")
+
+def test_all():
+    game_sets = ["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"]
+    game_levels = [f"level_{i:02d}" for i in range(1, 41)]
+
+    failures = 0
+    for game_set in game_sets:
+        for i, game_level in enumerate(game_levels):
+            if game_set == "picoCosmos" and i >= 20:
+                break
+
+            print(f"{game_set}, {game_level}")
+            for beam_width in (None, 10):
+                label = f"beam {beam_width}" if beam_width else "greedy"
+                try:
+                    result = test(game_set, game_level, beam_width)
+                except TimeoutError as e:
+                    print(f"  {label:<10} {e}")
+                    continue
+
+                if result:
+                    etime, search = result
+                    first = f"{search.solutions[0][0]:.4f}" if search.solutions else "-"
+                    print(f"  {label:<10} time: {etime:.4f}, first: {first}, pushes: {search.pushes if search.best else '-'}, "
+                          f"gap: {search.gap if search.best else '-'}")
+                else:
+                    failures += 1
+
+            if game_set in ("miniCosmos", "microCosmos"):
+                for beam_width in (None, 1):
+                    label = f"cut beam {beam_width}" if beam_width else "cut greedy"
+                    try:
+                        result = test_deadline(game_set, game_level, beam_width)
+                    except TimeoutError as e:
+                        print(f"  {label:<10} {e}")
+                        continue
+
+                    if result:
+                        bound, optimum = result
+                        print(f"  {label:<10} bound: {bound}, optimum: {optimum}")
+                    else:
+                        failures += 1
+
+    if failures:
+        sys.exit(f"{failures} checks failed")
+
+test_all()
@@ -0,0 +1,72 @@
+from src.utils.generator import Generator
+from src.algorithm.solver import SokobanAlgorithm
+from tests.utils.move_cache import Cache
+from tests.utils.timeout import timeout, TimeoutError
+from tests.utils.validate import check_solution
+
+import sys
+import time
+
+@timeout(120)
+def optimum(game_set, game_level):
+    # Push count of the plain BFS solution, one push per layer: the optimum
+    _, moves = SokobanAlgorithm(Generator(game_set, game_level).gen_state()).bfs()
+    return len(moves)
+
+@timeout(120)
+def test(game_set, game_level, optimal_pushes):
+    try:
+        cache = Cache()
+        generator = Generator(game_set, game_level)
+        state = generator.gen_state()
+        solver = SokobanAlgorithm(state)
+
+        stime = time.time()
+        _, moves = solver.bidirectional_bfs()
+        etime = time.time() - stime
+
+        if not moves:
+            raise Exception("no solution found")
+        check_solution(game_set, game_level, moves)
+        if optimal_pushes is not None and len(moves) != optimal_pushes:
+            raise Exception(f"{len(moves)} pushes, BFS found {optimal_pushes}")
+
+        cache.save_move(game_set, game_level, "bidirectional_bfs", moves)
+        return etime, solver.expanded, len(moves)
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level}: {e}")
+
+def test_all():
+    game_sets = ["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"]
+    game_levels = [f"level_{i:02d}" for i in range(1, 41)]
+
+    failures = 0
+    for game_set in game_sets:
+        for i, game_level in enumerate(game_levels):
+            if game_set == "picoCosmos" and i >= 20:
+                break
+
+            # Without the BFS optimum, only the solution itself is checked
+            try:
+                optimal_pushes = optimum(game_set, game_level)
+            except TimeoutError:
+                optimal_pushes = None
+
+            try:
+                result = test(game_set, game_level, optimal_pushes)
+            except TimeoutError as e:
+                print(f"{game_set}, {game_level}: {e}")
+                continue
+
+            if result:
+                etime, expanded, pushes = result
+                print(f"{game_set}, {game_level}: time: {etime:.4f}, expanded: {expanded}, pushes: {pushes}, "
+                      f"bfs: {optimal_pushes if optimal_pushes is not None else 'timed out'}")
+            else:
+                failures += 1
+
+    if failures:
+        sys.exit(f"{failures} checks failed")
+
+test_all()
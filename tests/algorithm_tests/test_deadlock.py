@@ -0,0 +1,101 @@
+from src.utils.generator import Generator
+from src.core.level import iter_bits
+from src.algorithm.solver import SokobanAlgorithm
+from src.algorithm.deadlock import DeadlockDetector
+from tests.utils.timeout import timeout, TimeoutError
+
+import random
+import sys
+import time
+
+WALKS = 50
+PUSHES = 200
+
+def blocked_block(state):
+    # Reference 2x2 check over (r, c) tuples: a block of walls and crates, one crate off target
+    crates, walls, targets = state.crates, state.obstacles, state.targets
+    for r, c in crates:
+        for br in (r - 1, r):
+            for bc in (c - 1, c):
+                block = ((br, bc), (br + 1, bc), (br, bc + 1), (br + 1, bc + 1))
+                if all(pos in crates or pos in walls or pos not in state.level.index for pos in block):
+                    if any(pos in crates and pos not in targets for pos in block):
+                        return True
+    return False
+
+@timeout(120)
+def test(game_set, game_level):
+    try:
+        generator = Generator(game_set, game_level)
+        state = generator.gen_state()
+        solver = SokobanAlgorithm(state)
+
+        stime = time.time()
+        # No state of a solution may be pruned
+        states, moves = solver.bidirectional_bfs()
+        if not moves:
+            raise Exception("no solution found")
+        detector = DeadlockDetector(state)
+        for pushes_done, current in enumerate(states):
+            if detector.is_deadlock(current):
+                raise Exception(f"solvable state after {pushes_done} pushes was pruned ({detector.pruned})")
+
+        # Random walks: memoized local results must match a fresh check, and local deadlocks
+        # must be real ones when looked for over the whole level
+        rng = random.Random(f"{game_set}/{game_level}")
+        detector = DeadlockDetector(state)
+        level = state.level
+        checked = 0
+        for _ in range(WALKS):
+            current = state
+            for _ in range(PUSHES):
+                pushes = current.get_all_moves()
+                if not pushes:
+                    break
+                current = current._get_next_state(rng.choice(pushes))
+                pushed = level.index[current.prev_move[2]]
+                mask = current.crate_mask
+
+                kind = detector.is_local_deadlock(mask, pushed)
+                fresh, _ = detector._local_deadlock(mask, pushed)
+                if kind != fresh:
+                    raise Exception(f"memoized local check gave {kind!r}, a fresh one {fresh!r}")
+                if kind == "pattern" and not blocked_block(current):
+                    raise Exception("2x2 pattern reported where there is none")
+                if kind == "freeze" and not any(detector.cannot_push(mask, crate, set()) for crate in iter_bits(mask & ~level.target_mask)):
+                    raise Exception("frozen crate reported where there is none")
+                checked += 1
+        etime = time.time() - stime
+
+        return etime, len(moves), checked, detector
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level}: {e}")
+
+def test_all():
+    game_sets = ["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"]
+    game_levels = [f"level_{i:02d}" for i in range(1, 41)]
+
+    failures = 0
+    for game_set in game_sets:
+        for i, game_level in enumerate(game_levels):
+            if game_set == "picoCosmos" and i >= 20:
+                break
+
+            try:
+                result = test(game_set, game_level)
+            except TimeoutError as e:
+                print(f"{game_set}, {game_level}: {e}")
+                continue
+
+            if result:
+                etime, pushes, checked, detector = result
+                print(f"{game_set}, {game_level}: time: {etime:.4f}, solution: {pushes}, walk states: {checked}, "
+                      f"cached: {len(detector._local_cache)}")
+            else:
+                failures += 1
+
+    if failures:
+        sys.exit(f"{failures} levels failed")
+
+test_all()
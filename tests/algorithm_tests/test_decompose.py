@@ -0,0 +1,183 @@
+from src.utils.generator import Generator
+from src.utils.level_store import LevelStore
+from src.algorithm.solver import SokobanAlgorithm
+from src.algorithm.decompose import DecomposedSearch
+from tests.utils.timeout import timeout, TimeoutError
+from tests.utils.validate import check_solution
+
+import os
+import sys
+import tempfile
+import time
+
+# Two rooms joined by a door, one crate to place in each
+ROOMS = """Two rooms
+###########
+#@  #   ###
+# $   $.  #
+# . #   ###
+###########
+"""
+
+@timeout(120)
+def test(game_set, game_level):
+    try:
+        generator = Generator(game_set, game_level)
+        state = generator.gen_state()
+        solver = SokobanAlgorithm(state)
+        search = DecomposedSearch(solver)
+
+        stime = time.time()
+        _, moves = solver.get_full_path(search.run())
+        etime = time.time() - stime
+
+        if not moves:
+            raise Exception("no solution found")
+        check_solution(game_set, game_level, moves)
+
+        # Every crate off target belongs to exactly one subproblem
+        decomposition = search.decomposition
+        unplaced = state.crate_mask & ~state.level.target_mask
+        covered = [sub.crate_mask & unplaced for sub in decomposition.subproblems]
+        if not decomposition.solvable or sum(covered) != unplaced or any(a & b for i, a in enumerate(covered) for b in covered[i + 1:]):
+            raise Exception(f"subproblems {decomposition.subproblems} do not split the crates off target")
+        if search.solved > len(decomposition):
+            raise Exception(f"{search.solved} of {len(decomposition)} subproblems solved apart")
+
+        return etime, solver.expanded, len(moves), search
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level}: {e}")
+
+def test_dead():
+    # One crate on a dead square: the decomposition proves the level unsolvable and searches
+    # nothing, returning no moves like the full searches do
+    generator = Generator("miniCosmos", "level_01")
+    level = generator.gen_state().level
+    dead = sorted(level.positions(level.tables.dead_mask) - {generator.player})
+    generator.crates = {dead[0]}
+    generator.targets = {min(generator.targets)}
+
+    solver = SokobanAlgorithm(generator.gen_state())
+    search = DecomposedSearch(solver)
+    _, moves = solver.get_full_path(search.run())
+    if moves or search.decomposition.solvable or search.fell_back or solver.expanded:
+        print(f"error: a dead level gave {len(moves)} pushes after {solver.expanded} expansions")
+        return False
+    for algorithm in ("bfs", "astar"):
+        _, moves = getattr(SokobanAlgorithm(generator.gen_state()), algorithm)()
+        if moves:
+            print(f"error: {algorithm} solved a dead level")
+            return False
+    return True
+
+BUDGET_MS = 400
+SLACK_MS = 1  # clock reads between handing out a budget and recording it
+
+def rooms_generator():
+    # The ROOMS level, compiled into a store of its own
+    with tempfile.TemporaryDirectory() as directory:
+        sok = os.path.join(directory, "rooms.sok")
+        with open(sok, "w", encoding="utf-8") as f:
+            f.write(ROOMS)
+        store = LevelStore.compile([sok], os.path.join(directory, "rooms.idx"))
+        generator = Generator("rooms", "level_01", store)
+        store.close()
+    return generator
+
+def solves_rooms(generator, moves):
+    game = generator.gen_game()
+    try:
+        for _ in game.steps(moves):
+            pass
+    except ValueError as e:
+        print(f"error: illegal solution of two rooms: {e}")
+        return False
+    if not game.is_solved():
+        print("error: moves do not solve two rooms")
+        return False
+    return True
+
+def test_rooms():
+    # Each room is solved on its own, the other crate fixed, and the joined moves are legal
+    generator = rooms_generator()
+    solver = SokobanAlgorithm(generator.gen_state())
+    search = DecomposedSearch(solver)
+    _, moves = solver.get_full_path(search.run())
+
+    if len(search.decomposition) != 2 or search.solved != 2 or search.fell_back or len(moves) != 2:
+        print(f"error: two rooms gave {search.decomposition.subproblems}, {search.solved} solved apart, "
+              f"fell back: {search.fell_back}, {len(moves)} pushes")
+        return False
+    return solves_rooms(generator, moves)
+
+def test_budget():
+    # A deadline covers the whole run: every search gets at most what is left of it, and a
+    # subproblem at most its share. Here the subproblem searches use up their share and
+    # fail, so the whole level is searched last, with what remains.
+    calls = []  # (ms since the start, deadline_ms given, whole level searched)
+    anytime = SokobanAlgorithm.anytime
+
+    def failing(solver, deadline_ms, **options):
+        calls.append(((time.perf_counter() - start) * 1000, deadline_ms, False))
+        time.sleep(deadline_ms / 1000)
+        return [], []
+
+    def whole(solver, deadline_ms, **options):
+        calls.append(((time.perf_counter() - start) * 1000, deadline_ms, True))
+        return anytime.__wrapped__(solver, deadline_ms=deadline_ms, **options)
+
+    failing.__wrapped__ = whole  # what the fallback calls, past the stats wrapper
+    generator = rooms_generator()
+    solver = SokobanAlgorithm(generator.gen_state())
+    SokobanAlgorithm.anytime = failing
+    try:
+        search = DecomposedSearch(solver, "anytime", deadline_ms=BUDGET_MS)
+        start = time.perf_counter()
+        _, moves = solver.get_full_path(search.run())
+    finally:
+        SokobanAlgorithm.anytime = anytime
+
+    if not calls or not calls[-1][2] or not search.fell_back or any(whole for *_, whole in calls[:-1]):
+        print(f"error: searches under a deadline: {calls}, fell back: {search.fell_back}")
+        return False
+    for elapsed, deadline_ms, whole in calls:
+        left = BUDGET_MS - elapsed + SLACK_MS
+        if deadline_ms > left or not whole and deadline_ms > left / len(search.decomposition):
+            print(f"error: {deadline_ms:.1f} ms given {elapsed:.1f} ms into a {BUDGET_MS} ms deadline (whole level: {whole})")
+            return False
+    return solves_rooms(generator, moves)
+
+def test_all():
+    game_sets = ["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"]
+    game_levels = [f"level_{i:02d}" for i in range(1, 41)]
+
+    failures = 0
+    for check in (test_dead, test_rooms, test_budget):
+        if not check():
+            failures += 1
+
+    for game_set in game_sets:
+        for i, game_level in enumerate(game_levels):
+            if game_set == "picoCosmos" and i >= 20:
+                break
+
+            try:
+                result = test(game_set, game_level)
+            except TimeoutError as e:
+                print(f"{game_set}, {game_level}: {e}")
+                continue
+
+            if result:
+                etime, expanded, pushes, search = result
+                decomposition = search.decomposition
+                print(f"{game_set}, {game_level}: rooms: {len(decomposition.rooms)}, subproblems: {len(decomposition)}, "
+                      f"solved apart: {search.solved}, fell back: {search.fell_back}, "
+                      f"time: {etime:.4f}, expanded: {expanded}, pushes: {pushes}")
+            else:
+                failures += 1
+
+    if failures:
+        sys.exit(f"{failures} checks failed")
+
+test_all()
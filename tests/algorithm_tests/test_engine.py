@@ -0,0 +1,145 @@
+import asyncio
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.generator import Generator
+from src.algorithm.solver import SokobanAlgorithm
+from src.algorithm.engine import CancelToken, SearchEngine, solve_async
+from tests.utils.move_cache import Cache
+from tests.utils.timeout import timeout, TimeoutError
+from tests.utils.validate import check_solution
+
+import time
+
+STEP_NODES = 500
+BUDGET = 50  # expansions allowed by the node budget check
+
+def as_moves(moves):
+    return [tuple(move) for move in moves]
+
+@timeout(120)
+def test(game_set, game_level, algorithm, checkpoint):
+    try:
+        cache = Cache()
+        generator = Generator(game_set, game_level)
+        blocking = SokobanAlgorithm(generator.gen_state())
+        _, expected = getattr(blocking, algorithm)()
+        if not expected:
+            raise Exception("no solution found by the blocking search")
+
+        # Save after the first step and finish from the checkpoint, in a fresh solver
+        stime = time.time()
+        engine = SearchEngine(SokobanAlgorithm(generator.gen_state()), algorithm, step_nodes=STEP_NODES)
+        engine.step()
+        resumed = not engine.done
+        if resumed:
+            engine.save(checkpoint)
+            engine = SearchEngine.load(checkpoint, SokobanAlgorithm(generator.gen_state()))
+            for _ in engine:
+                pass
+        etime = time.time() - stime
+
+        _, moves = engine.result()
+        if engine.status != "solved" or not moves:
+            raise Exception(f"no solution found ({engine.status})")
+        check_solution(game_set, game_level, moves)
+        # The engine is the blocking search cut into steps: the same pushes, the same expansions
+        if as_moves(moves) != as_moves(expected) or engine.expanded != blocking.expanded:
+            raise Exception(f"resumed run: {len(moves)} pushes, {engine.expanded} expanded; "
+                            f"blocking: {len(expected)} pushes, {blocking.expanded} expanded")
+
+        cache.save_move(game_set, game_level, f"engine_{algorithm}", moves)
+        return etime, engine.expanded, len(moves), resumed
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level} ({algorithm}): {e}")
+
+@timeout(120)
+def test_controls(game_set, game_level):
+    # Budgets, cancellation and the async runner stop or finish the search as documented
+    try:
+        generator = Generator(game_set, game_level)
+        _, expected = SokobanAlgorithm(generator.gen_state()).hybrid_heuristic()
+
+        # A node budget stops the search after exactly that many expansions, unless it solves first
+        engine = SearchEngine(SokobanAlgorithm(generator.gen_state()), max_nodes=BUDGET, step_nodes=STEP_NODES)
+        for _ in engine:
+            pass
+        if (engine.status, engine.expanded) != ("budget", BUDGET) and not (engine.status == "solved" and engine.expanded <= BUDGET):
+            raise Exception(f"node budget {BUDGET}: {engine.status} after {engine.expanded} expansions")
+
+        # A cancelled token stops the next step before any expansion, with no solution
+        token = CancelToken()
+        engine = SearchEngine(SokobanAlgorithm(generator.gen_state()), token=token, step_nodes=1)
+        engine.step()
+        token.cancel()
+        engine.step()
+        if engine.status != "solved" and (engine.status, engine.expanded, engine.result()[1]) != ("cancelled", 1, []):
+            raise Exception(f"cancel: {engine.status} after {engine.expanded} expansions")
+
+        engine = SearchEngine(SokobanAlgorithm(generator.gen_state()), time_limit=0)
+        engine.step()
+        if (engine.status, engine.expanded) != ("budget", 0):
+            raise Exception(f"time budget 0: {engine.status} after {engine.expanded} expansions")
+
+        # In the event loop and in a thread pool, solve_async finds the blocking solution
+        steps = []
+        for executor in (None, ThreadPoolExecutor(1)):
+            engine = SearchEngine(SokobanAlgorithm(generator.gen_state()), step_nodes=STEP_NODES)
+            _, moves = asyncio.run(solve_async(engine, executor, on_progress=steps.append))
+            if executor is not None:
+                executor.shutdown()
+            if as_moves(moves) != as_moves(expected) or steps[-1].status != "solved":
+                raise Exception(f"solve_async (executor={executor is not None}): {len(moves)} pushes ({engine.status}), "
+                                f"blocking: {len(expected)}")
+
+        return len(steps)
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level} (controls): {e}")
+
+def test_all():
+    game_sets = ["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"]
+    game_levels = [f"level_{i:02d}" for i in range(1, 41)]
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint = os.path.join(directory, "engine.ckpt")
+        for game_set in game_sets:
+            for i, game_level in enumerate(game_levels):
+                if game_set == "picoCosmos" and i >= 20:
+                    break
+
+                print(f"{game_set}, {game_level}")
+                # Plain BFS is only fast enough on the smallest set
+                algorithms = ("hybrid_heuristic", "bfs") if game_set == "miniCosmos" else ("hybrid_heuristic",)
+                for algorithm in algorithms:
+                    try:
+                        result = test(game_set, game_level, algorithm, checkpoint)
+                    except TimeoutError as e:
+                        print(f"  {algorithm:<17} {e}")
+                        continue
+
+                    if result:
+                        etime, expanded, pushes, resumed = result
+                        print(f"  {algorithm:<17} time: {etime:.4f}, expanded: {expanded}, pushes: {pushes}, resumed: {resumed}")
+                    else:
+                        failures += 1
+
+                try:
+                    steps = test_controls(game_set, game_level)
+                except TimeoutError as e:
+                    print(f"  {'controls':<17} {e}")
+                    continue
+
+                if steps:
+                    print(f"  {'controls':<17} budgets and cancel stop, solve_async in {steps} steps")
+                else:
+                    failures += 1
+
+    if failures:
+        sys.exit(f"{failures} checks failed")
+
+test_all()
@@ -0,0 +1,168 @@
+from src.utils.generator import Generator
+from src.algorithm.solver import SokobanAlgorithm
+from src.core.level import iter_bits
+from src.algorithm.heuristic import INF, MatchingHeuristic, hungarian, push_matching_cost
+from tests.utils.timeout import timeout, TimeoutError
+from tests.utils.validate import check_solution
+
+import itertools
+import random
+import sys
+import time
+
+SAMPLE = 500  # cached matchings compared with a full solve, per level
+MATRICES = 2000  # random rectangular cost matrices
+WALKS = 20
+PUSHES = 50
+
+@timeout(120)
+def test(game_set, game_level, heuristic):
+    try:
+        generator = Generator(game_set, game_level)
+        state = generator.gen_state()
+        solver = SokobanAlgorithm(state, heuristic=heuristic)
+
+        stime = time.time()
+        _, moves = solver.hybrid_heuristic()
+        etime = time.time() - stime
+
+        if not moves:
+            raise Exception("no solution found")
+        check_solution(game_set, game_level, moves)
+
+        if heuristic == "matching":
+            # Most cached matchings were repaired from their parent's: they must equal a full solve
+            matching = solver.matching
+            for crate_mask, entry in itertools.islice(matching._cache.items(), SAMPLE):
+                if entry[4] != push_matching_cost(solver.tables, crate_mask, solver.target_cells):
+                    raise Exception(f"incremental matching {entry[4]} differs from a full solve")
+
+        return etime, solver.expanded, len(moves)
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level} ({heuristic}): {e}")
+
+@timeout(120)
+def test_bound(game_set, game_level):
+    # The matching bound is admissible: A*, which uses it, finds as few pushes as the
+    # uninformed bidirectional BFS, and no state of that solution is overestimated
+    try:
+        generator = Generator(game_set, game_level)
+        solver = SokobanAlgorithm(generator.gen_state())
+        states, moves = solver.bidirectional_bfs()
+        if not moves:
+            raise Exception("no solution found")
+
+        for pushes_done, state in enumerate(states):
+            bound = push_matching_cost(solver.tables, state.crate_mask, solver.target_cells)
+            if bound > len(moves) - pushes_done:
+                raise Exception(f"bound {bound} above the {len(moves) - pushes_done} pushes left")
+
+        _, astar_moves = SokobanAlgorithm(generator.gen_state()).astar()
+        if len(astar_moves) != len(moves):
+            raise Exception(f"A* found {len(astar_moves)} pushes, bidirectional BFS {len(moves)}")
+
+        return len(moves)
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level} (bound): {e}")
+
+def brute_force(costs):
+    if not costs:
+        return 0
+    return min(sum(row[j] for row, j in zip(costs, columns)) for columns in itertools.permutations(range(len(costs[0])), len(costs)))
+
+def test_rectangular():
+    # Fewer rows than columns, as with fewer crates than targets: full solves, and repairs
+    # after one row changes, equal a brute-force minimum
+    rng = random.Random(5)
+    for _ in range(MATRICES):
+        m = rng.randint(2, 6)
+        n = rng.randint(1, m)
+        costs = [[rng.randint(0, 9) for _ in range(m)] for _ in range(n)]
+        if hungarian(costs)[0] != brute_force(costs):
+            print(f"error: hungarian gives {hungarian(costs)[0]} for {costs}, the minimum is {brute_force(costs)}")
+            return False
+    return True
+
+@timeout(120)
+def test_fewer_crates(game_set, game_level):
+    # One crate removed: along random walks, every repaired matching is a minimum
+    try:
+        generator = Generator(game_set, game_level)
+        generator.crates.remove(min(generator.crates))
+        state = generator.gen_state()
+        tables = state.level.tables
+        targets = tuple(iter_bits(state.level.target_mask))
+        matching = MatchingHeuristic(tables, targets)
+
+        rng = random.Random(f"{game_set}/{game_level}")
+        for _ in range(WALKS):
+            current = state
+            for _ in range(PUSHES):
+                estimate = matching.estimate(current)
+                costs = [list(matching.rows[crate]) for crate in iter_bits(current.crate_mask)]
+                if estimate != min(brute_force(costs), INF):
+                    raise Exception(f"matching {estimate}, the minimum is {brute_force(costs)}")
+                moves = current.get_all_moves()
+                if not moves:
+                    break
+                current = current._get_next_state(rng.choice(moves))
+        return matching.incremental_solves
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level} (fewer crates): {e}")
+
+def test_all():
+    game_sets = ["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"]
+    game_levels = [f"level_{i:02d}" for i in range(1, 41)]
+
+    failures = 0
+    if not test_rectangular():
+        failures += 1
+
+    for game_set in game_sets:
+        for i, game_level in enumerate(game_levels):
+            if game_set == "picoCosmos" and i >= 20:
+                break
+
+            print(f"{game_set}, {game_level}")
+            for heuristic in ("manhattan", "matching"):
+                try:
+                    result = test(game_set, game_level, heuristic)
+                except TimeoutError as e:
+                    print(f"  {heuristic:<10} {e}")
+                    continue
+
+                if result:
+                    etime, expanded, pushes = result
+                    print(f"  {heuristic:<10} time: {etime:.4f}, expanded: {expanded}, pushes: {pushes}")
+                else:
+                    failures += 1
+
+            try:
+                optimum = test_bound(game_set, game_level)
+            except TimeoutError as e:
+                print(f"  {'bound':<10} {e}")
+                continue
+
+            if optimum:
+                print(f"  {'bound':<10} admissible, optimum: {optimum}")
+            else:
+                failures += 1
+
+            try:
+                repairs = test_fewer_crates(game_set, game_level)
+            except TimeoutError as e:
+                print(f"  {'fewer':<10} {e}")
+                continue
+
+            if repairs is not None:
+                print(f"  {'fewer':<10} minimal with one crate less, repairs: {repairs}")
+            else:
+                failures += 1
+
+    if failures:
+        sys.exit(f"{failures} checks failed")
+
+test_all()
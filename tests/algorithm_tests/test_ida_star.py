@@ -0,0 +1,79 @@
+from src.utils.generator import Generator
+from src.algorithm.solver import SokobanAlgorithm
+from tests.utils.move_cache import Cache
+from tests.utils.timeout import timeout, TimeoutError
+from tests.utils.validate import check_solution
+
+import sys
+import time
+
+@timeout(120)
+def optimum(game_set, game_level):
+    # Push count of the bidirectional BFS solution, the reference optimum
+    _, moves = SokobanAlgorithm(Generator(game_set, game_level).gen_state()).bidirectional_bfs()
+    return len(moves)
+
+@timeout(120)
+def test(game_set, game_level, optimal_pushes, warm):
+    try:
+        cache = Cache()
+        generator = Generator(game_set, game_level)
+        state = generator.gen_state()
+        solver = SokobanAlgorithm(state)
+        if warm:
+            # Start from the bounds and dead corrals proven by earlier runs
+            cache.warm_start(solver)
+
+        stime = time.time()
+        _, moves = solver.ida_star()
+        etime = time.time() - stime
+
+        if not moves:
+            raise Exception("no solution found")
+        check_solution(game_set, game_level, moves)
+        if len(moves) != optimal_pushes:
+            raise Exception(f"{len(moves)} pushes, the optimum is {optimal_pushes}")
+
+        cache.remember(solver, "ida_star", moves)
+        return etime, solver.expanded, len(moves)
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level} ({'warm' if warm else 'cold'}): {e}")
+
+def test_all():
+    game_sets = ["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"]
+    game_levels = [f"level_{i:02d}" for i in range(1, 41)]
+
+    failures = 0
+    for game_set in game_sets:
+        for i, game_level in enumerate(game_levels):
+            if game_set == "picoCosmos" and i >= 20:
+                break
+
+            print(f"{game_set}, {game_level}")
+            try:
+                optimal_pushes = optimum(game_set, game_level)
+            except TimeoutError as e:
+                print(f"  {'optimum':<8} {e}")
+                continue
+
+            # Cold first: its proven bound is what the warm start then reads back. From scratch,
+            # IDA* takes minutes on picoCosmos, past a timeout that cannot stop it
+            runs = (("cold", False), ("warm", True)) if game_set != "picoCosmos" else (("warm", True),)
+            for label, warm in runs:
+                try:
+                    result = test(game_set, game_level, optimal_pushes, warm)
+                except TimeoutError as e:
+                    print(f"  {label:<8} {e}")
+                    continue
+
+                if result:
+                    etime, expanded, pushes = result
+                    print(f"  {label:<8} time: {etime:.4f}, expanded: {expanded}, pushes: {pushes}")
+                else:
+                    failures += 1
+
+    if failures:
+        sys.exit(f"{failures} checks failed")
+
+test_all()
@@ -0,0 +1,70 @@
+from src.utils.generator import Generator
+from src.core.state import MacroMove
+from src.algorithm.solver import SokobanAlgorithm
+from tests.utils.timeout import timeout, TimeoutError
+from tests.utils.validate import check_solution
+
+import sys
+import time
+
+@timeout(120)
+def test(game_set, game_level, macros):
+    try:
+        generator = Generator(game_set, game_level)
+        state = generator.gen_state()
+        solver = SokobanAlgorithm(state, macros=macros)
+
+        stime = time.time()
+        states, moves = solver.astar()
+        etime = time.time() - stime
+
+        if not moves:
+            raise Exception("no solution found")
+
+        # Macros are expanded back into single pushes, one state after each
+        if any(type(move) is MacroMove or len(move) != 3 for move in moves):
+            raise Exception("solution holds macro moves")
+        if len(states) != len(moves) + 1:
+            raise Exception(f"{len(states)} states for {len(moves)} pushes")
+        check_solution(game_set, game_level, moves)
+
+        return etime, solver.expanded, len(moves)
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level} (macros={macros}): {e}")
+
+def test_all():
+    game_sets = ["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"]
+    game_levels = [f"level_{i:02d}" for i in range(1, 41)]
+
+    failures = 0
+    for game_set in game_sets:
+        for i, game_level in enumerate(game_levels):
+            if game_set == "picoCosmos" and i >= 20:
+                break
+
+            print(f"{game_set}, {game_level}")
+            pushes = {}
+            for macros in (False, True):
+                label = "macros" if macros else "single"
+                try:
+                    result = test(game_set, game_level, macros)
+                except TimeoutError as e:
+                    print(f"  {label:<10} {e}")
+                    continue
+
+                if result:
+                    etime, expanded, pushes[label] = result
+                    print(f"  {label:<10} time: {etime:.4f}, expanded: {expanded}, pushes: {pushes[label]}")
+                else:
+                    failures += 1
+
+            # A* stays push-optimal without macros; with them it may only need more pushes
+            if len(pushes) == 2 and pushes["macros"] < pushes["single"]:
+                print(f"error in {game_set}, {game_level}: {pushes['macros']} pushes with macros, below the optimum {pushes['single']}")
+                failures += 1
+
+    if failures:
+        sys.exit(f"{failures} checks failed")
+
+test_all()
@@ -0,0 +1,69 @@
+from src.utils.generator import Generator
+from src.algorithm.solver import SokobanAlgorithm
+from src.algorithm.optimizer import SolutionOptimizer
+from tests.utils.timeout import timeout, TimeoutError
+from tests.utils.validate import check_solution
+
+import sys
+
+@timeout(120)
+def test(game_set, game_level):
+    try:
+        generator = Generator(game_set, game_level)
+        state = generator.gen_state()
+        _, moves = SokobanAlgorithm(state).hybrid_heuristic()
+        if not moves:
+            raise Exception("no solution found")
+
+        optimizer = SolutionOptimizer(state, window=10, time_limit=5)
+        optimized = optimizer.optimize(moves)
+
+        states = optimizer.replay(optimized)
+        if states is None or not states[-1].is_solved():
+            raise Exception("optimized moves do not solve the level")
+
+        # Legal in the game, counted as the game counts them, and never longer
+        report = optimizer.report
+        steps_before = check_solution(game_set, game_level, moves)
+        steps_after = check_solution(game_set, game_level, optimized)
+        if (steps_before, steps_after) != (report["moves_before"], report["moves_after"]):
+            raise Exception(f"{steps_before} -> {steps_after} player moves, reported {report['moves_before']} -> {report['moves_after']}")
+        if len(optimized) != report["pushes_after"]:
+            raise Exception(f"{len(optimized)} pushes, reported {report['pushes_after']}")
+        if report["pushes_after"] > report["pushes_before"] or report["moves_after"] > report["moves_before"]:
+            raise Exception(f"pushes: {report['pushes_before']} -> {report['pushes_after']}, "
+                            f"moves: {report['moves_before']} -> {report['moves_after']}")
+
+        return report
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level}: {e}")
+
+def test_all():
+    game_sets = ["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"]
+    game_levels = [f"level_{i:02d}" for i in range(1, 41)]
+
+    failures = 0
+    for game_set in game_sets:
+        for i, game_level in enumerate(game_levels):
+            if game_set == "picoCosmos" and i >= 20:
+                break
+
+            try:
+                report = test(game_set, game_level)
+            except TimeoutError as e:
+                print(f"{game_set}, {game_level}: {e}")
+                continue
+
+            if report:
+                print(f"{game_set}, {game_level}: pushes: {report['pushes_before']} -> {report['pushes_after']}, "
+                      f"moves: {report['moves_before']} -> {report['moves_after']}, "
+                      f"windows: {report['windows']}, reorders: {report['reorders']}, "
+                      f"time: {report['time']:.4f}, complete: {report['complete']}")
+            else:
+                failures += 1
+
+    if failures:
+        sys.exit(f"{failures} checks failed")
+
+test_all()
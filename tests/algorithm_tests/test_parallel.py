@@ -0,0 +1,74 @@
+from src.utils.generator import Generator
+from src.algorithm.solver import SokobanAlgorithm
+from tests.utils.move_cache import Cache
+from tests.utils.timeout import timeout, TimeoutError
+from tests.utils.validate import check_solution
+
+import os
+import sys
+import time
+
+WORKERS = (1, 2, 4)
+
+@timeout(120)
+def test(game_set, game_level, workers):
+    try:
+        cache = Cache()
+        generator = Generator(game_set, game_level)
+        state = generator.gen_state()
+        solver = SokobanAlgorithm(state)
+
+        stime = time.time()
+        _, moves = solver.parallel_hybrid_heuristic(workers=workers)
+        etime = time.time() - stime
+
+        if not moves:
+            raise Exception("no solution found")
+        check_solution(game_set, game_level, moves)
+
+        cache.save_move(game_set, game_level, "parallel_hybrid_heuristic", moves)
+        return etime, solver.expanded, len(moves)
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level} (workers={workers}): {e}")
+
+def test_all():
+    game_sets = ["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"]
+    game_levels = [f"level_{i:02d}" for i in range(1, 41)]
+
+    # Workers are processes: past the core count they share cores and only add messages
+    cores = os.cpu_count()
+    print(f"cores: {cores}")
+    totals = {workers: [0, 0.0] for workers in WORKERS}  # workers -> [expanded, seconds]
+
+    failures = 0
+    for game_set in game_sets:
+        for i, game_level in enumerate(game_levels):
+            if game_set == "picoCosmos" and i >= 20:
+                break
+
+            print(f"{game_set}, {game_level}")
+            for workers in WORKERS:
+                try:
+                    result = test(game_set, game_level, workers)
+                except TimeoutError as e:
+                    print(f"  workers: {workers}, {e}")
+                    continue
+
+                if result:
+                    etime, expanded, pushes = result
+                    totals[workers][0] += expanded
+                    totals[workers][1] += etime
+                    print(f"  workers: {workers}, time: {etime:.4f}, expanded: {expanded}, "
+                          f"expanded/s: {expanded / etime:.0f}, pushes: {pushes}")
+                else:
+                    failures += 1
+
+    for workers, (expanded, seconds) in totals.items():
+        print(f"workers: {workers}, cores: {cores}, expanded: {expanded}, time: {seconds:.4f}, "
+              f"expanded/s: {expanded / seconds if seconds else 0:.0f}")
+
+    if failures:
+        sys.exit(f"{failures} checks failed")
+
+test_all()
@@ -0,0 +1,89 @@
+from src.utils.generator import Generator
+from src.algorithm.solver import SokobanAlgorithm
+from src.algorithm.pdb import PatternDatabase
+from tests.utils.timeout import timeout, TimeoutError
+from tests.utils.validate import check_solution
+
+import sys
+import time
+
+@timeout(120)
+def test(game_set, game_level, pdb, optimum):
+    try:
+        generator = Generator(game_set, game_level)
+        state = generator.gen_state()
+        solver = SokobanAlgorithm(state, pdb=pdb)
+
+        stime = time.time()
+        _, moves = solver.astar()
+        etime = time.time() - stime
+
+        if not moves:
+            raise Exception("no solution found")
+        check_solution(game_set, game_level, moves)
+        if len(moves) != optimum:
+            raise Exception(f"{len(moves)} pushes, the optimum is {optimum}")
+
+        return etime, solver.expanded, len(moves)
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level} (pdb={pdb is not None}): {e}")
+
+@timeout(120)
+def test_bound(game_set, game_level, pdb):
+    # The bound never exceeds the pushes left on an optimal solution, from any of its states
+    try:
+        states, moves = SokobanAlgorithm(Generator(game_set, game_level).gen_state()).bidirectional_bfs()
+        if not moves:
+            raise Exception("no solution found")
+        for pushes_left, state in enumerate(reversed(states)):
+            if pdb.estimate(state) > pushes_left:
+                raise Exception(f"bound {pdb.estimate(state)} above the optimum {pushes_left}, {len(moves) - pushes_left} pushes in")
+        return len(moves), pdb.estimate(states[0])
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level} (bound): {e}")
+
+def test_all():
+    game_sets = ["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"]
+    game_levels = [f"level_{i:02d}" for i in range(1, 41)]
+
+    failures = 0
+    for game_set in game_sets:
+        for i, game_level in enumerate(game_levels):
+            if game_set == "picoCosmos" and i >= 20:
+                break
+
+            print(f"{game_set}, {game_level}")
+            stime = time.time()
+            database = PatternDatabase.cached(Generator(game_set, game_level).gen_state().level)
+            print(f"  {'database':<10} time: {time.time() - stime:.4f}, groups: {len(database.groups)}, size: {database.nbytes}")
+
+            try:
+                result = test_bound(game_set, game_level, database)
+            except TimeoutError as e:
+                print(f"  {'bound':<10} {e}")
+                continue
+            if not result:
+                failures += 1
+                continue
+            optimum, bound = result
+            print(f"  {'bound':<10} optimum: {optimum}, start bound: {bound}")
+
+            for label, pdb in (("matching", None), ("pdb", database)):
+                try:
+                    result = test(game_set, game_level, pdb, optimum)
+                except TimeoutError as e:
+                    print(f"  {label:<10} {e}")
+                    continue
+
+                if result:
+                    etime, expanded, pushes = result
+                    print(f"  {label:<10} time: {etime:.4f}, expanded: {expanded}, pushes: {pushes}")
+                else:
+                    failures += 1
+
+    if failures:
+        sys.exit(f"{failures} checks failed")
+
+test_all()
@@ -0,0 +1,89 @@
+import json
+import os
+import sys
+import tempfile
+
+from src.utils.generator import Generator
+from src.algorithm.solver import SokobanAlgorithm
+from src.algorithm.stats import SearchStats
+from tests.utils.timeout import timeout, TimeoutError
+
+@timeout(120)
+def test(game_set, game_level, directory):
+    try:
+        generator = Generator(game_set, game_level)
+        plain = SokobanAlgorithm(generator.gen_state())
+        _, expected = plain.hybrid_heuristic()
+        if not expected:
+            raise Exception("no solution found")
+
+        calls = []
+        timed = SearchStats()
+        for stats in (timed, SearchStats(timing=False, progress=calls.append, interval=0)):
+            solver = SokobanAlgorithm(generator.gen_state(), stats=stats)
+            _, moves = solver.hybrid_heuristic()
+
+            # Recording changes nothing in the search, and the wrappers are gone afterwards
+            if moves != expected or solver.expanded != plain.expanded:
+                raise Exception(f"search differs with stats (timing={stats.timing})")
+            if any(name in solver.__dict__ for name in ("expand", "greedy_cost", "push_lower_bound")) or "is_deadlock" in solver.deadlock_detector.__dict__:
+                raise Exception("stats wrappers left on the solver")
+
+            run = stats.runs[-1]
+            if run["expanded"] != solver.expanded or run["pruned"] != {**solver.deadlock_detector.pruned, "unreachable": run["pruned"]["unreachable"]}:
+                raise Exception(f"counters differ from the solver's: {run}")
+            if run["generated"] < run["expanded"] + run["duplicates"] + sum(run["pruned"].values()):
+                raise Exception(f"generated states do not add up: {run}")
+            if stats.timing and (min(run["phases"].values()) < 0 or sum(run["phases"].values()) > run["time"] + 1e-3):
+                raise Exception(f"phase times do not add up to the run time: {run['phases']}")
+
+        # interval=0: the progress callback runs after every expansion
+        if len(calls) != plain.expanded:
+            raise Exception(f"progress called {len(calls)} times for {plain.expanded} expansions")
+
+        # Exports round trip
+        path = os.path.join(directory, "stats.json")
+        timed.to_json(path)
+        with open(path, encoding="utf-8") as f:
+            if json.load(f) != timed.runs:
+                raise Exception("JSON export differs from the runs")
+        path = os.path.join(directory, "trace.json")
+        timed.to_chrome_trace(path)
+        with open(path, encoding="utf-8") as f:
+            events = json.load(f)["traceEvents"]
+        if [event["name"] for event in events if event["ph"] == "X"] != ["hybrid_heuristic", *SearchStats.PHASES]:
+            raise Exception("Chrome trace does not hold the run and its phases")
+
+        return plain.expanded, timed.runs[-1]
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level}: {e}")
+
+def test_all():
+    game_sets = ["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"]
+    game_levels = [f"level_{i:02d}" for i in range(1, 41)]
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for game_set in game_sets:
+            for i, game_level in enumerate(game_levels):
+                if game_set == "picoCosmos" and i >= 20:
+                    break
+
+                try:
+                    result = test(game_set, game_level, directory)
+                except TimeoutError as e:
+                    print(f"{game_set}, {game_level}: {e}")
+                    continue
+
+                if result:
+                    expanded, run = result
+                    print(f"{game_set}, {game_level}: expanded: {expanded}, generated: {run['generated']}, "
+                          f"duplicates: {run['duplicates']}, pruned: {sum(run['pruned'].values())}")
+                else:
+                    failures += 1
+
+    if failures:
+        sys.exit(f"{failures} levels failed")
+
+test_all()
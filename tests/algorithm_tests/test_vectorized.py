@@ -0,0 +1,129 @@
+from src.utils.generator import Generator
+from src.algorithm.solver import SokobanAlgorithm
+from src.algorithm.vectorized import BatchExpander
+from tests.utils.timeout import timeout, TimeoutError
+from tests.utils.validate import check_solution
+
+import random
+import sys
+import time
+
+WALKS = 20
+PUSHES = 100
+
+@timeout(120)
+def test(game_set, game_level, batch_size):
+    try:
+        generator = Generator(game_set, game_level)
+        state = generator.gen_state()
+        solver = SokobanAlgorithm(state)
+
+        stime = time.time()
+        _, moves = solver.hybrid_heuristic(batch_size=batch_size)
+        etime = time.time() - stime
+
+        if not moves:
+            raise Exception("no solution found")
+        check_solution(game_set, game_level, moves)
+
+        return etime, solver.expanded, len(moves)
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level} (batch_size={batch_size}): {e}")
+
+@timeout(120)
+def test_expander(game_set, game_level):
+    # On random walks, a batch yields exactly the children that survive the detector's dead
+    # square and 2x2 checks, each with the solver's Manhattan cost
+    try:
+        state = Generator(game_set, game_level).gen_state()
+        solver = SokobanAlgorithm(state)
+        detector = solver.deadlock_detector
+        expander = BatchExpander(state.level, solver.df)
+        level = state.level
+
+        rng = random.Random(f"{game_set}/{game_level}")
+        checked = 0
+        for _ in range(WALKS):
+            walk = [state]
+            for _ in range(PUSHES):
+                moves = walk[-1].get_all_moves()
+                if not moves:
+                    break
+                walk.append(walk[-1]._get_next_state(rng.choice(moves)))
+
+            expected = {}
+            for current in walk:
+                for child in current.get_all_next_states():
+                    pushed = level.index[child.prev_move[2]]
+                    if not detector.dead[pushed] and detector._local_deadlock(child.crate_mask, pushed)[0] != "pattern":
+                        expected[(current, child.prev_move)] = solver.greedy_cost(child)
+            found = {(child.parent, child.prev_move): cost for child, cost in expander.expand(walk)}
+            if found != expected:
+                raise Exception(f"batch gives {len(found)} children, the single expansion {len(expected)}")
+            checked += len(walk)
+
+        return checked, expander.pruned
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level} (expander): {e}")
+
+@timeout(120)
+def test_bfs(game_set, game_level):
+    # Batched BFS only drops pushes that cannot be part of a solution: it stays push-optimal
+    try:
+        generator = Generator(game_set, game_level)
+        _, moves = SokobanAlgorithm(generator.gen_state()).bfs(batch_size=1024)
+        _, optimal = SokobanAlgorithm(generator.gen_state()).bidirectional_bfs()
+        if not moves or len(moves) != len(optimal):
+            raise Exception(f"batched BFS found {len(moves)} pushes, the optimum is {len(optimal)}")
+        check_solution(game_set, game_level, moves)
+        return len(moves)
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level} (bfs): {e}")
+
+def test_all():
+    game_sets = ["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"]
+    game_levels = [f"level_{i:02d}" for i in range(1, 41)]
+
+    failures = 0
+    for game_set in game_sets:
+        for i, game_level in enumerate(game_levels):
+            if game_set == "picoCosmos" and i >= 20:
+                break
+
+            print(f"{game_set}, {game_level}")
+            for batch_size in (None, 64):
+                label = f"batch {batch_size}" if batch_size else "single"
+                try:
+                    result = test(game_set, game_level, batch_size)
+                except TimeoutError as e:
+                    print(f"  {label:<10} {e}")
+                    continue
+
+                if result:
+                    etime, expanded, pushes = result
+                    print(f"  {label:<10} time: {etime:.4f}, expanded: {expanded}, pushes: {pushes}, rate: {expanded / max(etime, 1e-9):.0f}/s")
+                else:
+                    failures += 1
+
+            for label, check in (("expander", test_expander), ("bfs", test_bfs)):
+                try:
+                    result = check(game_set, game_level)
+                except TimeoutError as e:
+                    print(f"  {label:<10} {e}")
+                    continue
+
+                if not result:
+                    failures += 1
+                elif label == "expander":
+                    checked, pruned = result
+                    print(f"  {label:<10} states: {checked}, pruned: {pruned}")
+                else:
+                    print(f"  {label:<10} optimal, pushes: {result}")
+
+    if failures:
+        sys.exit(f"{failures} checks failed")
+
+test_all()
@@ -0,0 +1,236 @@
+import argparse
+import datetime
+import functools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+from src.utils.generator import Generator
+from src.algorithm.solver import SokobanAlgorithm
+from tests.utils.batch import ALGORITHMS, BatchRunner, limit_memory, list_jobs
+
+RESULTS_VERSION = 1
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def bench_job(game_set, game_level, algorithm, memory_limit, conn, warmup = 1, repeat = 3):
+    # Runs in the worker process: `warmup` untimed solves, then `repeat` timed ones
+    limit_memory(memory_limit)
+
+    result = {"status": "error"}
+    try:
+        times = []
+        for run in range(warmup + repeat):
+            state = Generator(game_set, game_level).gen_state()
+            solver = SokobanAlgorithm(state)
+
+            stime = time.perf_counter()
+            _, moves = getattr(solver, algorithm)()
+            etime = time.perf_counter() - stime
+
+            if run >= warmup:
+                times.append(etime)
+
+        result = {
+            "status": "solved" if moves else "unsolved",
+            "time": round(min(times), 4),
+            "time_median": round(statistics.median(times), 4),
+            "expanded": solver.expanded,
+            "pushes": len(moves),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+    except MemoryError:
+        result = {"status": "memory"}
+    except Exception as e:
+        result = {"status": "error", "error": str(e)}
+
+    try:
+        conn.send(result)
+    finally:
+        conn.close()
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=BENCHMARK_DIR).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(jobs, workers = 1, time_limit = 300, memory_limit = None, warmup = 1, repeat = 3):
+    target = functools.partial(bench_job, warmup=warmup, repeat=repeat)
+    runner = BatchRunner(workers, time_limit, memory_limit, target=target)
+    results = []
+    for record in runner.run(jobs):
+        print(f"{record['game_set']}, {record['game_level']}, {record['algorithm']}: {record['status']}", flush=True)
+        results.append(record)
+
+    results.sort(key=result_key)
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"warmup": warmup, "repeat": repeat, "time_limit": time_limit, "memory_limit": memory_limit},
+        "results": results,
+    }
+
+def result_key(record):
+    return record["game_set"], record["game_level"], record["algorithm"]
+
+def save_results(report, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    if report.get("version") != RESULTS_VERSION:
+        raise ValueError(f"{path}: results version {report.get('version')}, expected {RESULTS_VERSION}")
+    return report
+
+def same_machine(report, baseline):
+    return (report["platform"], report["python"]) == (baseline.get("platform"), baseline.get("python"))
+
+def compare(report, baseline, time_threshold = 0.15, expanded_threshold = 0.05, rss_threshold = 0.25, min_time = 0.05,
+            timing = True):
+    """Returns {result key: [regressions]} for every result that is worse than the baseline.
+
+    Thresholds are relative increases; times below `min_time` seconds are too noisy to compare.
+    Without `timing` only the machine-independent counts are compared: status, expansions and pushes.
+    """
+    base = {result_key(record): record for record in baseline["results"]}
+    regressions = {}
+    for record in report["results"]:
+        old = base.get(result_key(record))
+        if old is None:
+            continue
+
+        found = []
+        if old["status"] == "solved" and record["status"] != "solved":
+            found.append(f"status {old['status']} -> {record['status']}")
+        elif old["status"] == "solved":
+            if timing and record["time"] > max(old["time"], min_time) * (1 + time_threshold):
+                found.append(f"time {old['time']} -> {record['time']}")
+            if record["expanded"] > old["expanded"] * (1 + expanded_threshold):
+                found.append(f"expanded {old['expanded']} -> {record['expanded']}")
+            if timing and old.get("peak_rss_mb") and record.get("peak_rss_mb") and record["peak_rss_mb"] > old["peak_rss_mb"] * (1 + rss_threshold):
+                found.append(f"peak RSS {old['peak_rss_mb']} -> {record['peak_rss_mb']} MB")
+            if record["pushes"] > old["pushes"]:
+                found.append(f"pushes {old['pushes']} -> {record['pushes']}")
+
+        if found:
+            regressions[result_key(record)] = found
+    return regressions
+
+def change(new, old):
+    if not old or new is None:
+        return ""
+    return f"{100 * (new - old) / old:+.0f}%"
+
+def print_summary(report, baseline = None, regressions = None):
+    base = {result_key(record): record for record in baseline["results"]} if baseline else {}
+    regressions = regressions or {}
+
+    header = f"{'set':<12} {'level':<9} {'algorithm':<18} {'status':<8} {'time':>9} {'expanded':>9} {'pushes':>6} {'rss MB':>7}"
+    if baseline:
+        header += f" {'d time':>7} {'d exp':>7}"
+    print(header)
+    print("-" * len(header))
+
+    for record in report["results"]:
+        solved = record["status"] == "solved"
+        line = (f"{record['game_set']:<12} {record['game_level']:<9} {record['algorithm']:<18} {record['status']:<8} "
+                f"{record.get('time', 0):>9.4f} {record.get('expanded', '') if solved else '':>9} "
+                f"{record.get('pushes', '') if solved else '':>6} {record.get('peak_rss_mb') or '':>7}")
+        old = base.get(result_key(record))
+        if baseline:
+            if old and solved and old["status"] == "solved":
+                line += f" {change(record['time'], old['time']):>7} {change(record['expanded'], old['expanded']):>7}"
+            else:
+                line += f" {'':>7} {'':>7}"
+        if result_key(record) in regressions:
+            line += "  REGRESSION: " + ", ".join(regressions[result_key(record)])
+        print(line)
+
+    solved = [record for record in report["results"] if record["status"] == "solved"]
+    total = sum(record["time"] for record in solved)
+    print("-" * len(header))
+    print(f"solved {len(solved)}/{len(report['results'])}, total time {total:.2f}s"
+          + (f", {len(regressions)} regressions" if baseline else ""))
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Benchmark solvers over the level sets and compare with a baseline.")
+    parser.add_argument("--sets", nargs="+", default=["miniCosmos", "microCosmos"])
+    parser.add_argument("--levels", nargs="+", help="restrict to these level names")
+    parser.add_argument("--algorithms", nargs="+", default=["hybrid_heuristic", "astar"], choices=ALGORITHMS)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs before timing")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs; the fastest is kept")
+    parser.add_argument("--workers", type=int, default=1, help="levels run at once (more is faster but noisier)")
+    parser.add_argument("--time-limit", type=float, default=300, help="wall-clock seconds per level, all runs included")
+    parser.add_argument("--memory-limit", type=int, default=None, help="address-space MB per level")
+    parser.add_argument("--output", help="results file (default: tests/benchmark/results/<date>.json)")
+    parser.add_argument("--baseline", default=BASELINE, help="results file to compare with ('' to only record results)")
+    parser.add_argument("--save-baseline", action="store_true", help="also store these results as the baseline")
+    parser.add_argument("--time-threshold", type=float, default=0.15, help="allowed relative time increase")
+    parser.add_argument("--expanded-threshold", type=float, default=0.05, help="allowed relative expansion increase")
+    parser.add_argument("--rss-threshold", type=float, default=0.25, help="allowed relative peak RSS increase")
+    parser.add_argument("--min-time", type=float, default=0.05, help="times below this many seconds are not compared")
+    args = parser.parse_args(argv)
+
+    # Comparing is the default: without a baseline the gate would pass on anything
+    baseline = None
+    if args.baseline and not args.save_baseline:
+        if not os.path.exists(args.baseline):
+            parser.error(f"baseline {args.baseline} not found: record one with --save-baseline, "
+                         "or pass --baseline '' to only record results")
+        try:
+            baseline = load_results(args.baseline)
+        except ValueError as e:
+            parser.error(str(e))
+
+    jobs = list_jobs(args.sets, args.algorithms, args.levels)
+    report = run_benchmark(jobs, args.workers, args.time_limit, args.memory_limit, args.warmup, args.repeat)
+
+    output = args.output or os.path.join(RESULTS_DIR, datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    save_results(report, output)
+    if args.save_baseline:
+        save_results(report, args.baseline)
+
+    # Times and RSS of another machine say nothing about this tree
+    timing = bool(baseline) and same_machine(report, baseline)
+    regressions = compare(report, baseline, args.time_threshold, args.expanded_threshold,
+                          args.rss_threshold, args.min_time, timing) if baseline else {}
+    print()
+    print_summary(report, baseline, regressions)
+    if baseline:
+        if not timing:
+            print(f"note: baseline recorded on {baseline.get('platform')} (Python {baseline.get('python')}), "
+                  "only status, expansions and pushes were compared")
+        known = {result_key(record) for record in baseline["results"]}
+        missing = sum(result_key(record) not in known for record in report["results"])
+        if missing:
+            print(f"warning: {missing} results have no baseline entry and were not compared")
+    print(f"results written to {output}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+import json
+import os
+import sys
+import tempfile
+
+from src.algorithm.solver import SokobanAlgorithm
+from tests.utils.batch import BatchRunner, main, resource, solve_job
+from tests.utils.validate import check_solution
+
+import time
+
+TIME_LIMIT = 2  # seconds per job
+MEMORY_LIMIT = 512  # MB per job, well above a worker's own footprint
+SLEEP = 60  # seconds slept by the sleeping job, far over the time limit
+
+def sleep(solver):
+    time.sleep(SLEEP)
+
+def allocate(solver):
+    # Twice the address space allowed: fails only with the limit in place
+    return bytearray(2 * MEMORY_LIMIT * 1024 * 1024)
+
+def fake_job(game_set, game_level, algorithm, memory_limit, conn):
+    # solve_job, with searches that sleep or allocate in place of a real one (worker process only)
+    SokobanAlgorithm.sleep = sleep
+    SokobanAlgorithm.allocate = allocate
+    solve_job(game_set, game_level, algorithm, memory_limit, conn)
+
+def test_statuses():
+    # A job past the time limit is killed, a job past the memory limit fails on its own, and
+    # the job beside them is solved
+    jobs = [("miniCosmos", "level_01", "sleep"), ("miniCosmos", "level_01", "hybrid_heuristic")]
+    if resource is not None:
+        jobs.append(("miniCosmos", "level_01", "allocate"))
+    expected = {"sleep": "timeout", "allocate": "memory", "hybrid_heuristic": "solved"}
+
+    runner = BatchRunner(workers=len(jobs), time_limit=TIME_LIMIT, memory_limit=MEMORY_LIMIT, target=fake_job)
+    stime = time.time()
+    records = list(runner.run(jobs))
+    etime = time.time() - stime
+
+    statuses = {record["algorithm"]: record["status"] for record in records}
+    if len(records) != len(jobs) or any(statuses.get(algorithm) != expected[algorithm] for _, _, algorithm in jobs):
+        print(f"error: statuses {statuses}, expected {expected}")
+        return False
+    if etime >= SLEEP:
+        print(f"error: the sleeping job was not killed ({etime:.1f} s)")
+        return False
+    solved = next(record for record in records if record["status"] == "solved")
+    try:
+        check_solution("miniCosmos", "level_01", solved["moves"])
+    except Exception as e:
+        print(f"error: batch solution of miniCosmos, level_01: {e}")
+        return False
+    print(f"statuses: {statuses}, time: {etime:.4f}")
+    return True
+
+def test_output():
+    # Every job, timed out or not, is written as one JSON line, without its moves
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "results.jsonl")
+        levels = ["level_01", "level_02"]
+        algorithms = ["hybrid_heuristic", "bfs"]
+        main(["--sets", "miniCosmos", "picoCosmos", "--levels", *levels, "--algorithms", *algorithms,
+              "--workers", "2", "--time-limit", str(TIME_LIMIT), "--output", path])
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+    try:
+        records = [json.loads(line) for line in lines]
+    except ValueError as e:
+        print(f"error: a result line is not JSON: {e}")
+        return False
+    jobs = sorted((record["game_set"], record["game_level"], record["algorithm"]) for record in records)
+    expected = sorted((game_set, level, algorithm) for game_set in ("miniCosmos", "picoCosmos")
+                      for level in levels for algorithm in algorithms)
+    if jobs != expected:
+        print(f"error: {len(records)} result lines for {len(expected)} jobs")
+        return False
+    if any("moves" in record or record["status"] not in ("solved", "timeout") for record in records):
+        print(f"error: unexpected result lines {records}")
+        return False
+    print(f"lines: {len(lines)}, statuses: {sorted(record['status'] for record in records)}")
+    return True
+
+def test_all():
+    failures = 0
+    for check in (test_statuses, test_output):
+        if not check():
+            failures += 1
+
+    if failures:
+        sys.exit(f"{failures} checks failed")
+
+test_all()
@@ -0,0 +1,187 @@
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+
+from src.utils.generator import Generator
+from src.utils.level_store import GAME_JSON, LevelStore, read_levels
+from src.algorithm.solver import SokobanAlgorithm
+from tests.utils.move_cache import Cache, puzzle_key
+from tests.utils.timeout import timeout, TimeoutError
+
+import time
+
+WRITERS = 4
+WRITES = 25
+
+def as_moves(moves):
+    return tuple(tuple(tuple(pos) for pos in move) for move in moves)
+
+@timeout(120)
+def test(game_set, game_level, path):
+    try:
+        generator = Generator(game_set, game_level)
+        state = generator.gen_state()
+        solver = SokobanAlgorithm(state)
+
+        stime = time.time()
+        states, moves = solver.bidirectional_bfs()
+        etime = time.time() - stime
+        if not moves:
+            raise Exception("no solution found")
+
+        with Cache(path, legacy=None) as cache:
+            cache.remember(solver, "bidirectional_bfs", moves)
+            _, hybrid = SokobanAlgorithm(generator.gen_state()).hybrid_heuristic()
+            cache.save_move(game_set, game_level, "hybrid_heuristic", hybrid)
+
+        # A new connection reads back what was stored, by name or by content
+        with Cache(path, legacy=None) as cache:
+            if cache.load_move(game_set, game_level, "bidirectional_bfs") != as_moves(moves):
+                raise Exception("stored moves differ from the solution")
+            if cache.load_solutions(state) != {"bidirectional_bfs": as_moves(moves), "hybrid_heuristic": as_moves(hybrid)}:
+                raise Exception("load_solutions does not hold both solutions")
+            if cache.load_move(game_set, game_level) != as_moves(min((moves, hybrid), key=len)):
+                raise Exception("the solution with the fewest pushes is not returned first")
+
+            # The player's region, not its cell, is part of the key; another puzzle misses
+            if cache.load_solution(states[1]) or puzzle_key(states[1]) == puzzle_key(state):
+                raise Exception("a puzzle one push further hits the cache")
+            if cache.load_lower_bound(state) != len(moves):
+                raise Exception(f"bound {cache.load_lower_bound(state)} stored for an optimum of {len(moves)}")
+            cache.save_lower_bound(state, len(moves) - 1)
+            if cache.load_lower_bound(state) != len(moves):
+                raise Exception("a smaller bound replaced the stored one")
+
+            # Warm start: the bound and the dead corrals come back into a fresh solver
+            warm = SokobanAlgorithm(generator.gen_state())
+            cache.warm_start(warm)
+            if warm.lower_bound != len(moves):
+                raise Exception("warm start did not load the bound")
+            if warm.deadlock_detector.known_dead != solver.deadlock_detector.dead_patterns():
+                raise Exception("warm start did not load the dead corrals")
+
+        if game_set == "miniCosmos":
+            # IDA* starts from the stored bound and finds an optimal solution in one iteration
+            _, warm_moves = warm.ida_star()
+            cold = SokobanAlgorithm(generator.gen_state())
+            cold.ida_star()
+            if len(warm_moves) != len(moves) or warm.expanded > cold.expanded:
+                raise Exception(f"warm IDA*: {len(warm_moves)} pushes, {warm.expanded} expanded; cold: {cold.expanded}")
+
+        return etime, len(moves), len(solver.deadlock_detector.dead_patterns())
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level}: {e}")
+
+def test_content(directory):
+    # The same level under another name hits the cache; an edited level misses it
+    path = os.path.join(directory, "content.db")
+    generator = Generator("miniCosmos", "level_01")
+    _, moves = SokobanAlgorithm(generator.gen_state()).bidirectional_bfs()
+    with Cache(path, legacy=None) as cache:
+        cache.save_move("miniCosmos", "level_01", "bidirectional_bfs", moves)
+
+        rows = next(rows for _, name, rows in read_levels(GAME_JSON, "miniCosmos") if name == "level_01")
+        sok = os.path.join(directory, "copy.sok")
+        with open(sok, "w", encoding="utf-8") as f:
+            f.write("Copy of miniCosmos level_01\n" + "\n".join(rows) + "\n")
+        store = LevelStore.compile([sok], os.path.join(directory, "copy.idx"))
+        copy = Generator("copy", "level_01", store)
+        if cache.load_solution(copy.gen_state()) != as_moves(moves):
+            print("error: the same level under another name misses the cache")
+            return False
+
+        # A wall on a floor cell the solution never uses makes another level
+        used = {pos for move in moves for pos in move}
+        free = next(pos for pos in sorted(copy.gen_state().level.cells)
+                    if pos not in used and pos not in copy.crates and pos not in copy.targets and pos != copy.player)
+        copy.obstacles.add(free)
+        edited = copy.gen_state()
+        if edited.level.key == generator.gen_state().level.key or cache.load_solution(edited):
+            print("error: an edited level hits the cache")
+            return False
+        store.close()
+    return True
+
+def write_solutions(path, worker):
+    state = Generator("miniCosmos", "level_01").gen_state()
+    with Cache(path, legacy=None, timeout=60) as cache:
+        for n in range(WRITES):
+            cache.save_solution(state, f"writer_{worker}_{n}", [((0, 0), (0, 1), (0, 2))] * (n + 1))
+            cache.save_lower_bound(state, worker * WRITES + n)
+
+def test_concurrent(directory):
+    # Concurrent writers all land, none overwrites another
+    path = os.path.join(directory, "concurrent.db")
+    with Cache(path, legacy=None) as cache:
+        cache.conn  # schema and WAL mode before the writers start
+    workers = [multiprocessing.Process(target=write_solutions, args=(path, worker)) for worker in range(WRITERS)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if any(worker.exitcode for worker in workers):
+        print("error: a concurrent writer failed")
+        return False
+
+    state = Generator("miniCosmos", "level_01").gen_state()
+    with Cache(path, legacy=None) as cache:
+        solutions = cache.load_solutions(state)
+        if len(solutions) != WRITERS * WRITES or cache.load_lower_bound(state) != WRITERS * WRITES - 1:
+            print(f"error: {len(solutions)} of {WRITERS * WRITES} concurrent writes stored")
+            return False
+    return True
+
+def test_legacy(directory):
+    # An old move_cache.json is imported once, by whichever connection opens the database first
+    path = os.path.join(directory, "legacy.db")
+    legacy = os.path.join(directory, "move_cache.json")
+    _, moves = SokobanAlgorithm(Generator("miniCosmos", "level_02").gen_state()).hybrid_heuristic()
+    with open(legacy, "w", encoding="utf-8") as f:
+        json.dump({"miniCosmos": {"level_02": {"hybrid_heuristic": moves}}, "missingSet": {"level_01": {"bfs": []}}}, f)
+
+    with Cache(path, legacy) as cache:
+        if cache.load_move("miniCosmos", "level_02", "hybrid_heuristic") != as_moves(moves):
+            print("error: legacy solutions were not imported")
+            return False
+        cache.save_move("miniCosmos", "level_02", "hybrid_heuristic", moves[:1])
+    with Cache(path, legacy) as cache:
+        if cache.load_move("miniCosmos", "level_02", "hybrid_heuristic") != as_moves(moves[:1]):
+            print("error: legacy solutions were imported twice")
+            return False
+    return True
+
+def test_all():
+    game_sets = ["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"]
+    game_levels = [f"level_{i:02d}" for i in range(1, 41)]
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for check in (test_content, test_concurrent, test_legacy):
+            if not check(directory):
+                failures += 1
+
+        path = os.path.join(directory, "move_cache.db")
+        for game_set in game_sets:
+            for i, game_level in enumerate(game_levels):
+                if game_set == "picoCosmos" and i >= 20:
+                    break
+
+                try:
+                    result = test(game_set, game_level, path)
+                except TimeoutError as e:
+                    print(f"{game_set}, {game_level}: {e}")
+                    continue
+
+                if result:
+                    etime, pushes, dead = result
+                    print(f"{game_set}, {game_level}: time: {etime:.4f}, pushes: {pushes}, dead corrals: {dead}")
+                else:
+                    failures += 1
+
+    if failures:
+        sys.exit(f"{failures} checks failed")
+
+test_all()
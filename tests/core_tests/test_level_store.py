@@ -0,0 +1,130 @@
+import json
+import os
+import re
+import sys
+import tempfile
+
+from src.utils.generator import Generator
+from src.utils.level_store import GAME_JSON, LevelStore, WALL, TARGET, CRATE, PLAYER
+from tests.utils.timeout import timeout, TimeoutError
+
+import time
+
+def parse_level(level_str):
+    # Reference: the character-by-character parsing Generator did before the index
+    player, crates, obstacles, targets = None, set(), set(), set()
+    lines = level_str.splitlines()
+    for r, line in enumerate(lines):
+        for c, ch in enumerate(line):
+            pos = (r, c)
+            if ch == '#':
+                obstacles.add(pos)
+            if ch == '$':
+                crates.add(pos)
+            if ch == '.':
+                targets.add(pos)
+            if ch in '@+':
+                player = pos
+            if ch == '+':
+                targets.add(pos)
+            if ch == '*':
+                crates.add(pos)
+                targets.add(pos)
+    return player, crates, obstacles, targets, (len(lines), max(len(line) for line in lines))
+
+@timeout(120)
+def test(game_set, game_level, level_str):
+    try:
+        stime = time.time()
+        generator = Generator(game_set, game_level)
+        etime = time.time() - stime
+
+        loaded = (generator.player, generator.crates, generator.obstacles, generator.targets, generator.bound)
+        if loaded != parse_level(level_str):
+            raise Exception("indexed level differs from game.json")
+        return etime
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level}: {e}")
+
+def to_xsb(level_str):
+    # Run-length encoded rows, the first two joined by "|", the way XSB collections write them
+    rows = [re.sub(r"(.)\1{2,}", lambda m: f"{len(m.group(0))}{m.group(1)}", row) for row in level_str.splitlines()]
+    return ["|".join(rows[:2])] + rows[2:]
+
+def test_xsb(data, directory):
+    # Each set written as an XSB file, with titles and comments between the boards, compiles
+    # to the same grids as game.json
+    sources = []
+    for game_set, levels in data.items():
+        path = os.path.join(directory, f"{game_set}.sok")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"; {game_set}\n\n")
+            for game_level, level_str in levels.items():
+                f.write(f"Title: {game_level}\n" + "\n".join(to_xsb(level_str)) + "\n\n")
+        sources.append((f"xsb_{game_set}", path))
+
+    store = LevelStore.compile(sources, os.path.join(directory, "xsb.idx"))
+    default = LevelStore.default()
+    if store.sets() != {f"xsb_{game_set}": len(levels) for game_set, levels in data.items()}:
+        print(f"error: XSB sets {store.sets()}")
+        return False
+    for game_set, levels in data.items():
+        for n, game_level in enumerate(levels, 1):
+            level = store.get(f"xsb_{game_set}", f"level_{n:02d}")
+            expected = default.get(game_set, game_level)
+            if level is None or any(level.positions(flag) != expected.positions(flag) for flag in (WALL, TARGET, CRATE, PLAYER)):
+                print(f"error: XSB level {game_set}, {game_level} differs from game.json")
+                return False
+    store.close()
+    return True
+
+def test_lookup(data):
+    store = LevelStore.default()
+    if len(store) != sum(len(levels) for levels in data.values()) or store.sets() != {game_set: len(levels) for game_set, levels in data.items()}:
+        print("error: the index does not hold every level of game.json")
+        return False
+    if store.get("miniCosmos", "level_99") is not None or ("noSuchSet", "level_01") in store or ("miniCosmos", "level_01") not in store:
+        print("error: lookup of a missing level")
+        return False
+    if [level.game_level for level in store.levels("miniCosmos")] != list(data["miniCosmos"]):
+        print("error: levels are not listed in file order")
+        return False
+    try:
+        Generator("miniCosmos", "level_99")
+        print("error: a missing level was generated")
+        return False
+    except Exception as e:
+        if str(e) != "Level not found":
+            print(f"error: a missing level raised {e}")
+            return False
+    return True
+
+def test_all():
+    with open(GAME_JSON, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    failures = 0
+    if not test_lookup(data):
+        failures += 1
+    with tempfile.TemporaryDirectory() as directory:
+        if not test_xsb(data, directory):
+            failures += 1
+
+    for game_set, levels in data.items():
+        for game_level, level_str in levels.items():
+            try:
+                result = test(game_set, game_level, level_str)
+            except TimeoutError as e:
+                print(f"{game_set}, {game_level}: {e}")
+                continue
+
+            if result is not None:
+                print(f"{game_set}, {game_level}: load: {result:.6f}")
+            else:
+                failures += 1
+
+    if failures:
+        sys.exit(f"{failures} checks failed")
+
+test_all()
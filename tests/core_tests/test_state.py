@@ -0,0 +1,119 @@
+from src.utils.generator import Generator
+from src.core.state import SokobanState
+from tests.utils.timeout import timeout, TimeoutError
+
+import random
+from collections import deque
+import sys
+import time
+
+WALKS = 50
+PUSHES = 200
+
+def random_walks(state, seed):
+    # Walks of random legal pushes from the start, as lists of (move, state)
+    rng = random.Random(seed)
+    for _ in range(WALKS):
+        walk = []
+        current = state
+        for _ in range(PUSHES):
+            moves = current.get_all_moves()
+            if not moves:
+                break
+            move = rng.choice(moves)
+            current = current._get_next_state(move)
+            walk.append((move, current))
+        yield walk
+
+def region(player, crates, obstacles):
+    # Reference flood fill over (r, c) tuples
+    seen = {player}
+    queue = deque([player])
+    while queue:
+        r, c = queue.popleft()
+        for next_pos in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+            if next_pos not in seen and next_pos not in obstacles and next_pos not in crates:
+                seen.add(next_pos)
+                queue.append(next_pos)
+    return seen
+
+@timeout(120)
+def test(game_set, game_level):
+    try:
+        generator = Generator(game_set, game_level)
+        state = generator.gen_state()
+        level = state.level
+
+        rng = random.Random(f"{game_set}/{game_level}")
+        stime = time.time()
+        checked = 0
+        repaired = 0
+        for walk in random_walks(state, f"{game_set}/{game_level}"):
+            # Reference model: crate positions as a set of tuples
+            crates = set(generator.crates)
+            for move, current in walk:
+                _, crate, new_crate = move
+                crates.remove(crate)
+                crates.add(new_crate)
+
+                if current.crates != crates:
+                    raise Exception(f"crates {sorted(current.crates)} after {move}, expected {sorted(crates)}")
+                if current.crate_key != level.crate_hash(current.crate_mask):
+                    raise Exception(f"incremental crate key differs from the full hash after {move}")
+                if current.is_solved() != (crates == generator.targets):
+                    raise Exception(f"is_solved() is {current.is_solved()} after {move}")
+
+                # Canonical state: the same crates with the player anywhere in its region
+                reachable = region(current.player, crates, level.obstacles)
+                if current.get_reachable() != reachable:
+                    raise Exception(f"reachable cells differ from a full flood after {move}")
+                if current.normalized_player() != level.index[min(reachable)]:
+                    raise Exception(f"region id {current.normalized_player()} is not the top-left reachable cell")
+                moved = SokobanState(level, rng.choice(sorted(reachable)), current.crate_mask)
+                if moved != current or moved.fingerprint() != current.fingerprint() or moved.canonical_key() != current.canonical_key():
+                    raise Exception(f"player moved within its region gives another state after {move}")
+                elsewhere = [pos for pos in level.cells if pos not in reachable and pos not in crates]
+                if elsewhere:
+                    other = SokobanState(level, rng.choice(elsewhere), current.crate_mask)
+                    if other == current or other.canonical_key() == current.canonical_key():
+                        raise Exception(f"player in another region gives the same state after {move}")
+
+                # Every child's region is repaired from this one: it must equal a flood from scratch
+                for child in current.get_all_next_states():
+                    if child.reachable_mask() != SokobanState(level, child.player, child.crate_mask).reachable_mask():
+                        raise Exception(f"repaired region differs from a full flood after {move}, {child.prev_move}")
+                    repaired += 1
+                checked += 1
+        etime = time.time() - stime
+
+        return etime, checked, repaired
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level}: {e}")
+
+def test_all():
+    game_sets = ["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"]
+    game_levels = [f"level_{i:02d}" for i in range(1, 41)]
+
+    failures = 0
+    for game_set in game_sets:
+        for i, game_level in enumerate(game_levels):
+            if game_set == "picoCosmos" and i >= 20:
+                break
+
+            try:
+                result = test(game_set, game_level)
+            except TimeoutError as e:
+                print(f"{game_set}, {game_level}: {e}")
+                continue
+
+            if result:
+                etime, checked, repaired = result
+                print(f"{game_set}, {game_level}: states: {checked}, repaired: {repaired}, time: {etime:.4f}")
+            else:
+                failures += 1
+
+    if failures:
+        sys.exit(f"{failures} levels failed")
+
+test_all()
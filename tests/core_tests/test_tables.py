@@ -0,0 +1,99 @@
+import os
+import sys
+import tempfile
+
+from src.utils.generator import Generator
+from src.core.tables import LevelTables
+from src.algorithm.solver import SokobanAlgorithm
+from tests.utils.timeout import timeout, TimeoutError
+
+import time
+
+FIELDS = ("key", "size", "neighbors", "behind", "adjacent", "ring", "dead", "dead_mask",
+          "push_distance", "target_distance", "nearest_manhattan")
+
+@timeout(120)
+def test(game_set, game_level, directory):
+    try:
+        generator = Generator(game_set, game_level)
+        level = generator.gen_state().level
+
+        stime = time.time()
+        built = LevelTables(level)
+        build_time = time.time() - stime
+
+        # First use builds and saves, the second one loads the file
+        LevelTables.cached(level, directory)
+        if not os.path.exists(LevelTables.path(level, directory)):
+            raise Exception("cached() did not save the tables")
+        stime = time.time()
+        loaded = LevelTables.load(level, LevelTables.path(level, directory))
+        load_time = time.time() - stime
+        for name in FIELDS:
+            if getattr(loaded, name) != getattr(built, name):
+                raise Exception(f"loaded tables differ in {name}")
+
+        # The solver takes the directory and shares the loaded tables with every state
+        state = generator.gen_state()
+        solver = SokobanAlgorithm(state, tables=directory)
+        if state.level.tables is not solver.tables or solver.tables.push_distance != built.push_distance:
+            raise Exception("the solver does not use the cached tables")
+        states, moves = solver.hybrid_heuristic()
+        if not moves or not states[-1].is_solved():
+            raise Exception("no solution found with the cached tables")
+
+        return build_time, load_time, len(moves)
+
+    except Exception as e:
+        print(f"error in {game_set}, {game_level}: {e}")
+
+def test_stale(directory):
+    # A file of another level, or a damaged one, is rebuilt rather than used
+    first = Generator("miniCosmos", "level_01").gen_state().level
+    second = Generator("miniCosmos", "level_02").gen_state().level
+    path = LevelTables.path(second, directory)
+    LevelTables(first).save(path)
+    try:
+        LevelTables.load(second, path)
+        print("error: tables of another level were loaded")
+        return False
+    except ValueError:
+        pass
+
+    with open(path, "wb") as f:
+        f.write(b"damaged")
+    if LevelTables.cached(second, directory).push_distance != LevelTables(second).push_distance:
+        print("error: damaged tables were not rebuilt")
+        return False
+    return True
+
+def test_all():
+    game_sets = ["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"]
+    game_levels = [f"level_{i:02d}" for i in range(1, 41)]
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        if not test_stale(directory):
+            failures += 1
+
+        for game_set in game_sets:
+            for i, game_level in enumerate(game_levels):
+                if game_set == "picoCosmos" and i >= 20:
+                    break
+
+                try:
+                    result = test(game_set, game_level, directory)
+                except TimeoutError as e:
+                    print(f"{game_set}, {game_level}: {e}")
+                    continue
+
+                if result:
+                    build_time, load_time, pushes = result
+                    print(f"{game_set}, {game_level}: build: {build_time:.4f}, load: {load_time:.4f}, pushes: {pushes}")
+                else:
+                    failures += 1
+
+    if failures:
+        sys.exit(f"{failures} levels failed")
+
+test_all()
@@ -0,0 +1,73 @@
+import argparse
+import multiprocessing
+import os
+import time
+
+from src.utils.generator import Generator
+from src.utils.level_store import LevelStore
+from tests.utils.move_cache import Cache
+
+def replay_job(job):
+    # Runs in a pool worker: replays one cached solution off screen and exports it
+    game_set, game_level, algorithm, output, fmt, tile_size, frame_every = job
+    result = {"game_set": game_set, "game_level": game_level}
+    try:
+        moves = Cache().load_move(game_set, game_level, algorithm)
+        if not moves:
+            result["status"] = "missing"
+            return result
+
+        game = Generator(game_set, game_level).gen_game()
+        target = os.path.join(output, f"{game_set}_{game_level}" + ("" if fmt == "frames" else f".{fmt}"))
+        stime = time.time()
+        frames = game.export(moves, target, tile_size, frame_every)
+        result["time"] = round(time.time() - stime, 4)
+        result["frames"] = frames
+
+        # export() leaves the game in its initial position: play it through to check it
+        for _ in game.steps(moves):
+            pass
+        result["status"] = "valid" if game.is_solved() else "unsolved"
+    except ValueError as e:
+        result["status"] = "invalid"
+        result["error"] = str(e)
+    except ImportError as e:
+        # GIF and WebP need Pillow, an optional dependency: report it for this level and go on
+        result["status"] = "skipped"
+        result["error"] = f"{e}; use --format png or frames without it"
+    return result
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Replay cached solutions headless and export them.")
+    parser.add_argument("--sets", nargs="+", default=["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"])
+    parser.add_argument("--levels", nargs="+", help="restrict to these level names")
+    parser.add_argument("--algorithm", help="cached solution to replay (default: the one with the fewest pushes)")
+    parser.add_argument("--output", default="replays", help="output directory")
+    parser.add_argument("--format", default="png", choices=("gif", "webp", "png", "frames"),
+                        help="final board (default), animation (needs Pillow), or a directory of PNG frames")
+    parser.add_argument("--tile-size", type=int, default=32)
+    parser.add_argument("--frame-every", type=int, default=1, help="keep one frame every N player steps")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output, exist_ok=True)
+    store = LevelStore.default()
+    jobs = [
+        (level.game_set, level.game_level, args.algorithm, args.output, args.format, args.tile_size, args.frame_every)
+        for game_set in args.sets
+        for level in store.levels(game_set)
+        if not args.levels or level.game_level in args.levels
+    ]
+
+    counts = {}
+    with multiprocessing.Pool(args.workers) as pool:
+        for result in pool.imap_unordered(replay_job, jobs):
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            print(f"{result['game_set']}, {result['game_level']}: {result['status']}"
+                  + (f", {result['frames']} frames, {result['time']:.2f}s" if "frames" in result else "")
+                  + (f" ({result['error']})" if "error" in result else ""), flush=True)
+
+    print(", ".join(f"{status}: {count}" for status, count in sorted(counts.items())))
+
+if __name__ == "__main__":
+    main()
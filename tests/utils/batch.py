@@ -0,0 +1,158 @@
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from multiprocessing.connection import wait
+
+try:
+    import resource
+except ImportError:  # Windows: no address-space limit, wall-clock limit still applies
+    resource = None
+
+from src.utils.generator import Generator
+from src.utils.level_store import LevelStore
+from src.algorithm.solver import SokobanAlgorithm
+from tests.utils.move_cache import Cache
+
+ALGORITHMS = ("bfs", "bidirectional_bfs", "hybrid_heuristic", "astar", "ida_star", "anytime", "decomposed")
+
+def limit_memory(memory_limit):
+    # Address-space limit in MB for the current (worker) process
+    if memory_limit and resource is not None:
+        limit = memory_limit * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def solve_job(game_set, game_level, algorithm, memory_limit, conn):
+    # Runs in the worker process; the result is sent back through conn
+    limit_memory(memory_limit)
+
+    result = {"status": "error"}
+    try:
+        state = Generator(game_set, game_level).gen_state()
+        solver = SokobanAlgorithm(state)
+
+        stime = time.time()
+        _, moves = getattr(solver, algorithm)()
+        etime = time.time() - stime
+
+        result = {
+            "status": "solved" if moves else "unsolved",
+            "time": round(etime, 4),
+            "expanded": solver.expanded,
+            "pushes": len(moves),
+            "moves": [list(move) for move in moves],
+        }
+    except MemoryError:
+        result = {"status": "memory"}
+    except Exception as e:
+        result = {"status": "error", "error": str(e)}
+
+    try:
+        conn.send(result)
+    finally:
+        conn.close()
+
+class BatchRunner:
+    """Solves (game_set, game_level, algorithm) jobs in separate worker processes.
+
+    Each job gets its own process so that a job over the wall-clock limit can be
+    killed and a job over the memory limit fails on its own, without affecting
+    the other workers. `target` runs one job in the worker process, with the same
+    arguments as `solve_job`.
+    """
+    def __init__(self, workers = None, time_limit = 120, memory_limit = None, target = solve_job):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.time_limit = time_limit
+        self.memory_limit = memory_limit
+        self.target = target
+
+    def run(self, jobs):
+        """Yields one result dict per job, in completion order."""
+        pending = list(jobs)
+        pending.reverse()
+        running = {}  # reader -> (job, process, start time)
+
+        while pending or running:
+            while pending and len(running) < self.workers:
+                job = pending.pop()
+                reader, writer = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(target=self.target, args=(*job, self.memory_limit, writer), daemon=True)
+                process.start()
+                writer.close()
+                running[reader] = (job, process, time.time())
+
+            now = time.time()
+            next_deadline = min(start + self.time_limit for _, _, start in running.values())
+            ready = wait(list(running), timeout=max(0, next_deadline - now))
+
+            for reader in ready:
+                job, process, start = running.pop(reader)
+                try:
+                    result = reader.recv()
+                except EOFError:
+                    # Worker died without answering (killed by the OS, hard crash...)
+                    process.join()
+                    result = {"status": "crashed", "exitcode": process.exitcode}
+                reader.close()
+                process.join()
+                yield self._record(job, start, result)
+
+            now = time.time()
+            for reader, (job, process, start) in list(running.items()):
+                if now - start >= self.time_limit:
+                    process.kill()
+                    process.join()
+                    reader.close()
+                    del running[reader]
+                    yield self._record(job, start, {"status": "timeout"})
+
+    def _record(self, job, start, result):
+        game_set, game_level, algorithm = job
+        record = {"game_set": game_set, "game_level": game_level, "algorithm": algorithm}
+        record.update(result)
+        record.setdefault("time", round(time.time() - start, 4))
+        return record
+
+def list_jobs(game_sets, algorithms, levels = None):
+    store = LevelStore.default()
+
+    jobs = []
+    for game_set in game_sets:
+        for game_level in sorted(level.game_level for level in store.levels(game_set)):
+            if levels and game_level not in levels:
+                continue
+            for algorithm in algorithms:
+                jobs.append((game_set, game_level, algorithm))
+    return jobs
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Solve many levels in parallel worker processes.")
+    parser.add_argument("--sets", nargs="+", default=["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"])
+    parser.add_argument("--levels", nargs="+", help="restrict to these level names")
+    parser.add_argument("--algorithms", nargs="+", default=["hybrid_heuristic"], choices=ALGORITHMS)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--time-limit", type=float, default=120, help="wall-clock seconds per job")
+    parser.add_argument("--memory-limit", type=int, default=None, help="address-space MB per job")
+    parser.add_argument("--output", help="JSON lines file (default: stdout)")
+    parser.add_argument("--save-cache", action="store_true", help="store solutions in the move cache")
+    args = parser.parse_args(argv)
+
+    runner = BatchRunner(args.workers, args.time_limit, args.memory_limit)
+    jobs = list_jobs(args.sets, args.algorithms, args.levels)
+    cache = Cache() if args.save_cache else None
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+
+    try:
+        for record in runner.run(jobs):
+            moves = record.pop("moves", None)
+            if cache is not None and moves:
+                cache.save_move(record["game_set"], record["game_level"], record["algorithm"], moves)
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,189 @@
+import hashlib
 import json
+import os
+import sqlite3
+import time
+
+from src.utils.generator import Generator
+
+CACHE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATH = os.path.join(CACHE_DIR, "move_cache.db")
+LEGACY_PATH = os.path.join(CACHE_DIR, "move_cache.json")
+
+# Algorithms whose solutions use the fewest pushes (when run without macros)
+PUSH_OPTIMAL = ("bfs", "bidirectional_bfs", "astar", "ida_star")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS solutions (
+    puzzle TEXT NOT NULL,
+    algorithm TEXT NOT NULL,
+    pushes INTEGER NOT NULL,
+    moves TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (puzzle, algorithm)
+);
+CREATE TABLE IF NOT EXISTS lower_bounds (
+    puzzle TEXT PRIMARY KEY,
+    pushes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dead (
+    layout TEXT NOT NULL,
+    crates TEXT NOT NULL,
+    player INTEGER NOT NULL,
+    PRIMARY KEY (layout, crates, player)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def puzzle_key(state):
+    """Content hash of a puzzle: walls, targets, crates and the player's region.
+
+    Level names play no part, so an edited level gets a new key instead of stale moves.
+    """
+    text = f"{state.level.key}:{state.crate_mask:x}:{state.normalized_player()}"
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
 
 class Cache:
-    def __init__(self, filepath = "tests/utils/move_cache.json"):
+    """Solutions and search results in an SQLite database, shared by concurrent processes.
+
+    - solutions: the moves found by each algorithm, keyed by `puzzle_key` and algorithm;
+    - lower_bounds: proven lower bounds on the pushes of a puzzle;
+    - dead: corral configurations proven dead, keyed by the walls and targets only
+      (`Level.key`), so they also apply to other puzzles with the same layout.
+
+    The database uses write-ahead logging, so readers never block and writers wait for
+    each other instead of overwriting. Nothing is loaded up front: every call runs its
+    own query. Solutions of the old `move_cache.json`, if present, are imported once.
+    """
+    def __init__(self, filepath = DEFAULT_PATH, legacy = LEGACY_PATH, timeout = 30.0):
         self.filepath = filepath
-        self.cache = self.load_cache()
+        self.legacy = legacy
+        self.timeout = timeout
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            # Autocommit: each statement is its own transaction unless one is opened
+            conn = sqlite3.connect(self.filepath, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            self._import_legacy()
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
 
-    def load_cache(self):
-        with open(self.filepath, "r", encoding="utf-8") as f:
-            return json.load(f)
-        
-    def save_cache(self):
-        with open(self.filepath, 'w', encoding='utf-8') as f:
-            json.dump(self.cache, f, indent=2, ensure_ascii=False)
+    def __exit__(self, *exc):
+        self.close()
 
     def load_move(self, game_set, game_level, algorithm = None):
+        """Moves stored for a named level; without an algorithm, the solution with the fewest pushes."""
+        return self.load_solution(Generator(game_set, game_level).gen_state(), algorithm)
+
+    def save_move(self, game_set, game_level, algorithm, moves):
+        self.save_solution(Generator(game_set, game_level).gen_state(), algorithm, moves)
+
+    def load_solution(self, state, algorithm = None):
         if algorithm:
-            moves = self.cache.get(game_set, {}).get(game_level, {}).get(algorithm, [])
+            row = self.conn.execute("SELECT moves FROM solutions WHERE puzzle = ? AND algorithm = ?",
+                                    (puzzle_key(state), algorithm)).fetchone()
         else:
-            if len(self.cache.get(game_set, {}).get(game_level, {})) > 0:
-                moves = next(iter(self.cache.get(game_set, {}).get(game_level, {}).values()))
-            else:
-                moves = []
-        
+            row = self.conn.execute("SELECT moves FROM solutions WHERE puzzle = ? ORDER BY pushes, created LIMIT 1",
+                                    (puzzle_key(state),)).fetchone()
+        moves = json.loads(row[0]) if row else []
         return tuple(tuple(tuple(pos) for pos in move) for move in moves)
-    
-    def save_move(self, game_set, game_level, algorithm, moves):
-        if game_set not in self.cache:
-            self.cache[game_set] = {}
-        
-        if game_level not in self.cache[game_set]:
-            self.cache[game_set][game_level] = {}
 
-        pmoves = []
+    def load_solutions(self, state):
+        """Every stored solution of the puzzle, by algorithm."""
+        rows = self.conn.execute("SELECT algorithm, moves FROM solutions WHERE puzzle = ?", (puzzle_key(state),))
+        return {algorithm: tuple(tuple(tuple(pos) for pos in move) for move in json.loads(moves)) for algorithm, moves in rows}
+
+    def save_solution(self, state, algorithm, moves):
+        moves = [[list(pos) for pos in move] for move in moves]
+        self.conn.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?)",
+                          (puzzle_key(state), algorithm, len(moves), json.dumps(moves), time.time()))
+
+    def load_lower_bound(self, state):
+        row = self.conn.execute("SELECT pushes FROM lower_bounds WHERE puzzle = ?", (puzzle_key(state),)).fetchone()
+        return row[0] if row else 0
+
+    def save_lower_bound(self, state, pushes):
+        # Bounds only ever grow: keep the larger of the stored and the new one
+        self.conn.execute("INSERT INTO lower_bounds VALUES (?, ?) "
+                          "ON CONFLICT(puzzle) DO UPDATE SET pushes = MAX(pushes, excluded.pushes)",
+                          (puzzle_key(state), pushes))
+
+    def load_dead(self, level):
+        """Proven-dead (crate mask, player region) pairs for this wall and target layout."""
+        rows = self.conn.execute("SELECT crates, player FROM dead WHERE layout = ?", (level.key,))
+        return {(int(crates, 16), player) for crates, player in rows}
+
+    def save_dead(self, level, patterns):
+        self.conn.executemany("INSERT OR IGNORE INTO dead VALUES (?, ?, ?)",
+                              ((level.key, f"{crates:x}", player) for crates, player in patterns))
+
+    def warm_start(self, solver):
+        """Hands what earlier solves proved about this puzzle and layout to `solver`."""
+        state = solver.state
+        solver.deadlock_detector.known_dead.update(self.load_dead(state.level))
+        # Bounds count single pushes, so they do not carry over to macro searches
+        if solver.macros is None:
+            solver.lower_bound = max(solver.lower_bound, self.load_lower_bound(state))
+
+    def remember(self, solver, algorithm, moves):
+        """Stores the solution, the proven lower bound and the dead corrals found by `solver`."""
+        state = solver.state
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if moves:
+                self.save_solution(state, algorithm, moves)
+            if solver.macros is None:
+                bound = len(moves) if moves and algorithm in PUSH_OPTIMAL else solver.lower_bound
+                if bound:
+                    self.save_lower_bound(state, bound)
+            self.save_dead(state.level, solver.deadlock_detector.dead_patterns())
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
 
-        for move in moves:
-            pmoves.append(list(move))
+    def _import_legacy(self):
+        conn = self._conn
+        if not self.legacy or not os.path.exists(self.legacy):
+            return
+        if conn.execute("SELECT 1 FROM meta WHERE name = 'legacy_imported'").fetchone():
+            return
 
-        self.cache[game_set][game_level][algorithm] = pmoves
+        with open(self.legacy, "r", encoding="utf-8") as f:
+            data = json.load(f)
 
-        self.save_cache()
-        
\ No newline at end of file
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have imported it while we waited for the lock
+            if not conn.execute("SELECT 1 FROM meta WHERE name = 'legacy_imported'").fetchone():
+                for game_set, levels in data.items():
+                    for game_level, solutions in levels.items():
+                        try:
+                            state = Generator(game_set, game_level).gen_state()
+                        except Exception:
+                            continue  # level no longer exists
+                        for algorithm, moves in solutions.items():
+                            conn.execute("INSERT OR IGNORE INTO solutions VALUES (?, ?, ?, ?, ?)",
+                                         (puzzle_key(state), algorithm, len(moves), json.dumps(moves), time.time()))
+                conn.execute("INSERT INTO meta VALUES ('legacy_imported', ?)", (self.legacy,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
@@ -0,0 +1,88 @@
+import argparse
+import multiprocessing
+import time
+
+from src.utils.generator import Generator
+from src.utils.level_store import LevelStore
+from src.algorithm.optimizer import SolutionOptimizer
+from tests.utils.move_cache import Cache
+
+def optimize_job(job):
+    # Runs in a pool worker: optimizes every cached solution of one level within its budget
+    game_set, game_level, time_limit, window = job
+    result = {"game_set": game_set, "game_level": game_level, "solutions": []}
+    state = Generator(game_set, game_level).gen_state()
+    with Cache() as cache:
+        solutions = cache.load_solutions(state)
+    if not solutions:
+        result["status"] = "missing"
+        return result
+
+    # Algorithms often find the same moves: each distinct solution is optimized once
+    by_moves = {}
+    for algorithm, moves in sorted(solutions.items()):
+        by_moves.setdefault(moves, []).append(algorithm)
+
+    deadline = time.time() + time_limit
+    for n, (moves, algorithms) in enumerate(by_moves.items()):
+        budget = max(0.0, deadline - time.time()) / (len(by_moves) - n)
+        optimizer = SolutionOptimizer(state, window, budget)
+        try:
+            optimized = optimizer.optimize(moves)
+        except ValueError as e:
+            result["solutions"].append({"algorithms": algorithms, "error": str(e)})
+            continue
+        report = dict(optimizer.report, algorithms=algorithms)
+        if (report["pushes_after"], report["moves_after"]) < (report["pushes_before"], report["moves_before"]):
+            report["moves"] = [[list(pos) for pos in move] for move in optimized]
+        result["solutions"].append(report)
+
+    result["status"] = "improved" if any("moves" in report for report in result["solutions"]) else "unchanged"
+    return result
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Optimize the cached solutions: fewer pushes, then less walking.")
+    parser.add_argument("--sets", nargs="+", default=["miniCosmos", "microCosmos", "naboCosmos", "picoCosmos"])
+    parser.add_argument("--levels", nargs="+", help="restrict to these level names")
+    parser.add_argument("--time-limit", type=float, default=30, help="seconds per level, shared by its solutions")
+    parser.add_argument("--window", type=int, default=10, help="pushes searched again at a time")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--dry-run", action="store_true", help="report only, leave the cache as it is")
+    args = parser.parse_args(argv)
+
+    store = LevelStore.default()
+    jobs = [
+        (level.game_set, level.game_level, args.time_limit, args.window)
+        for game_set in args.sets
+        for level in store.levels(game_set)
+        if not args.levels or level.game_level in args.levels
+    ]
+
+    totals = dict.fromkeys(("pushes_before", "pushes_after", "moves_before", "moves_after"), 0)
+    counts = {}
+    with Cache() as cache, multiprocessing.Pool(args.workers) as pool:
+        for result in pool.imap_unordered(optimize_job, jobs):
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            print(f"{result['game_set']}, {result['game_level']}: {result['status']}", flush=True)
+            state = None
+            for report in result["solutions"]:
+                names = ", ".join(report["algorithms"])
+                if "error" in report:
+                    print(f"  {names}: invalid ({report['error']})")
+                    continue
+                for name in totals:
+                    totals[name] += report[name] * len(report["algorithms"])
+                print(f"  {names}: pushes {report['pushes_before']} -> {report['pushes_after']}, "
+                      f"moves {report['moves_before']} -> {report['moves_after']}, {report['time']:.2f}s"
+                      + ("" if report["complete"] else " (time limit)"))
+                if "moves" in report and not args.dry_run:
+                    state = state or Generator(result["game_set"], result["game_level"]).gen_state()
+                    for algorithm in report["algorithms"]:
+                        cache.save_solution(state, algorithm, report["moves"])
+
+    print(", ".join(f"{status}: {count}" for status, count in sorted(counts.items())))
+    print(f"pushes: {totals['pushes_before']} -> {totals['pushes_after']}, "
+          f"moves: {totals['moves_before']} -> {totals['moves_after']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+from src.utils.generator import Generator
+
+def check_solution(game_set, game_level, moves):
+    """Replays `moves` the way `SokobanGame` renders them; returns the player moves.
+
+    Player moves are walking steps plus pushes. Raises an Exception when a push is
+    illegal or when the level is not solved at the end.
+    """
+    game = Generator(game_set, game_level).gen_game()
+    try:
+        steps = sum(1 for _ in game.steps(moves))
+    except ValueError as e:
+        raise Exception(f"illegal solution: {e}")
+    if not game.is_solved():
+        raise Exception("moves do not solve the level")
+    return steps